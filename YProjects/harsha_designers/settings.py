@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -84,6 +85,47 @@ DATABASES = {
 }
 
 
+# Caches
+# website.cache_backends.TwoTierCache keeps hot entries in process memory
+# in front of a cache shared by all workers. Rate limits, single-flight
+# locks and cache version bumps rely on that shared cache's add()/incr()
+# being atomic across processes, which only Redis provides here: set
+# CACHE_REDIS_URL (needs the redis package) whenever more than one worker
+# process serves the site. Without it the "shared" cache is per-process
+# memory, which is only correct for a single process (runserver, tests),
+# so it is refused when DEBUG is off. `manage.py check --deploy` also warns
+# when a TwoTierCache is configured over any other L2 (website.W001).
+
+if os.environ.get('CACHE_REDIS_URL'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_REDIS_URL'],
+    }
+elif not DEBUG:
+    raise ImproperlyConfigured(
+        'Set CACHE_REDIS_URL when DEBUG is off: without it each worker process '
+        'keeps its own cache, so invalidations and rate limits are not shared.'
+    )
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'harsha_designers_shared',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'website.cache_backends.TwoTierCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 300,
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -127,6 +169,16 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per distinct content (see website.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'website.storage.DedupStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -136,6 +188,14 @@ EMAIL_HOST_USER = 'your-email@gmail.com'  # Replace with actual email
 EMAIL_HOST_PASSWORD = 'your-app-password'  # Replace with actual app password
 DEFAULT_FROM_EMAIL = 'Harsha Designers <your-email@gmail.com>'
 
+# Site emails are queued in the EmailOutbox and sent by `manage.py run_mail_worker`
+# (see website.outbox); failed sends are retried after 1, 2, 4... minutes
+MAIL_OUTBOX_MAX_ATTEMPTS = 6
+MAIL_OUTBOX_RETRY_DELAY = 60
+MAIL_OUTBOX_MAX_RETRY_DELAY = 6 * 60 * 60
+# A claimed email is retried if its worker hasn't finished with it by then
+MAIL_OUTBOX_LEASE = 5 * 60
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -185,6 +245,38 @@ X_FRAME_OPTIONS = 'DENY'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 
+# Chunked gallery uploads (/api/uploads/): each chunk stays under the
+# in-memory limit above and is streamed to FILE_UPLOAD_TEMP_DIR
+CHUNKED_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+CHUNKED_UPLOAD_MAX_SIZE = 50 * 1024 * 1024  # 50MB
+# Unfinished uploads older than this are removed by `manage.py expire_uploads`
+CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Resize uploaded project/banner images on a background thread after the
+# save commits (see website.images); False processes them on commit instead
+IMAGE_PROCESSING_ASYNC = True
+
+# Public pages are cached until the content they show changes (see website.page_cache)
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Browser/proxy freshness for pages and APIs that send ETags; they revalidate
+# (cheaply, usually a 304) once this many seconds have passed
+HTTP_CACHE_MAX_AGE = 0
+
+# Project typeahead (/api/search-projects/)
+AUTOCOMPLETE_MAX_RESULTS = 10
+
+# Neighbours stored per project for related/similar projects
+SIMILAR_PROJECTS_TOP_K = 6
+
+# Recompute similar-project lists on a background thread after a project
+# save commits (see website.similarity); False recomputes them on commit instead
+SIMILAR_PROJECTS_ASYNC = True
+
+# Projects a price statistics cell needs before /api/price-estimate/ stops
+# falling back to a coarser cell
+PRICE_ESTIMATE_MIN_SAMPLES = 3
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -2,7 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Project, Banner, Contact, AboutUs, CompanyInfo, ProjectImage, Newsletter, SEOSettings
+from django.utils import timezone
+from .models import Project, Banner, Contact, AboutUs, CompanyInfo, ProjectImage, Newsletter, SEOSettings, Amenity, EmailOutbox
+from .utils import bump_cache_version_on_commit, ProjectCache, CATALOG_VERSION, CONTACTS_VERSION
+from . import renditions
 
 class ProjectImageInline(admin.TabularInline):
     model = ProjectImage
@@ -37,17 +40,25 @@ class ProjectAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" style="border-radius: 5px;" />', obj.image.url)
+            return format_html('<img src="{}" width="50" height="50" style="border-radius: 5px;" />', renditions.url(obj, 'thumb'))
         return "No Image"
     image_preview.short_description = "Preview"
     
     def make_featured(self, request, queryset):
-        queryset.update(is_featured=True)
+        # update() skips the post_save receivers; moving updated_at retires the
+        # project's pre-encoded JSON fragments
+        queryset.update(is_featured=True, updated_at=timezone.now())
+        ProjectCache.invalidate('featured', *(f'project:{pk}' for pk in queryset.values_list('pk', flat=True)))
+        bump_cache_version_on_commit(CATALOG_VERSION)
         self.message_user(request, f"{queryset.count()} projects marked as featured.")
     make_featured.short_description = "Mark selected projects as featured"
     
     def remove_featured(self, request, queryset):
-        queryset.update(is_featured=False)
+        # update() skips the post_save receivers; moving updated_at retires the
+        # project's pre-encoded JSON fragments
+        queryset.update(is_featured=False, updated_at=timezone.now())
+        ProjectCache.invalidate('featured', *(f'project:{pk}' for pk in queryset.values_list('pk', flat=True)))
+        bump_cache_version_on_commit(CATALOG_VERSION)
         self.message_user(request, f"{queryset.count()} projects removed from featured.")
     remove_featured.short_description = "Remove selected projects from featured"
 
@@ -60,10 +71,25 @@ class ProjectImageAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" style="border-radius: 5px;" />', obj.image.url)
+            return format_html('<img src="{}" width="50" height="50" style="border-radius: 5px;" />', renditions.url(obj, 'thumb'))
         return "No Image"
     image_preview.short_description = "Preview"
 
+@admin.register(Amenity)
+class AmenityAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'project_count']
+    search_fields = ['name', 'slug']
+    prepopulated_fields = {'slug': ('name',)}
+    
+    def get_queryset(self, request):
+        from django.db.models import Count
+        return super().get_queryset(request).annotate(num_projects=Count('project_amenities'))
+    
+    def project_count(self, obj):
+        return obj.num_projects
+    project_count.short_description = "Projects"
+    project_count.admin_order_field = 'num_projects'
+
 @admin.register(Banner)
 class BannerAdmin(admin.ModelAdmin):
     list_display = ['title', 'subtitle', 'is_active', 'order', 'image_preview', 'created_at']
@@ -84,7 +110,7 @@ class BannerAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="80" height="40" style="border-radius: 5px;" />', obj.image.url)
+            return format_html('<img src="{}" width="80" height="40" style="border-radius: 5px;" />', renditions.url(obj, 'thumb'))
         return "No Image"
     image_preview.short_description = "Preview"
 
@@ -119,11 +145,13 @@ class ContactAdmin(admin.ModelAdmin):
     
     def mark_as_read(self, request, queryset):
         queryset.update(is_read=True)
+        bump_cache_version_on_commit(CONTACTS_VERSION)
         self.message_user(request, f"{queryset.count()} contacts marked as read.")
     mark_as_read.short_description = "Mark selected contacts as read"
     
     def mark_as_unread(self, request, queryset):
         queryset.update(is_read=False)
+        bump_cache_version_on_commit(CONTACTS_VERSION)
         self.message_user(request, f"{queryset.count()} contacts marked as unread.")
     mark_as_unread.short_description = "Mark selected contacts as unread"
 
@@ -146,6 +174,18 @@ class NewsletterAdmin(admin.ModelAdmin):
         self.message_user(request, f"{queryset.count()} subscribers deactivated.")
     deactivate_subscribers.short_description = "Deactivate selected subscribers"
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['kind', 'payload', 'attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} emails queued for another attempt.")
+    retry_now.short_description = "Retry selected emails now"
+
 @admin.register(AboutUs)
 class AboutUsAdmin(admin.ModelAdmin):
     list_display = ['title', 'subtitle', 'happy_families', 'completed_projects', 'landmarks', 'years_experience', 'updated_at']
@@ -2,24 +2,33 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Q, Min, Max, Count, Avg
+from django.db.models import F, Min, Max, Count, Avg
 from django.utils import timezone
 import json
 import logging
-from .models import Project, Contact, Newsletter, AboutUs, CompanyInfo
+import uuid
+from .models import Project, Contact, Newsletter, ChunkedUpload
+from .site_config import get_site_config
+from .utils import ProjectCache
+from .parsing import parse_area
+from . import search, facets, similarity, price_stats, renditions, uploads
+from .pagination import clamp_per_page, wants_cursor, paginate_by_cursor
+from .http_cache import conditional, catalog_etag, project_etag
+from .serializers import fragments, fragment_response, splice, KEY_FIELDS, FULL, CARD
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional(catalog_etag, public=True)
 def api_projects(request):
     """API endpoint to get projects with filtering and pagination"""
     try:
         # Get query parameters
         page = int(request.GET.get('page', 1))
-        per_page = int(request.GET.get('per_page', 10))
+        per_page = clamp_per_page(request.GET.get('per_page'), default=10)
         project_type = request.GET.get('type')
         location = request.GET.get('location')
         featured_only = request.GET.get('featured') == 'true'
-        search = request.GET.get('search')
+        search_query = request.GET.get('search')
         
         # Build queryset
         projects = Project.objects.all()
@@ -33,51 +42,35 @@ def api_projects(request):
         if featured_only:
             projects = projects.filter(is_featured=True)
             
-        if search:
-            projects = projects.filter(
-                Q(title__icontains=search) | 
-                Q(description__icontains=search) |
-                Q(location__icontains=search)
-            )
+        if search_query:
+            projects = search.search_projects(projects, search_query)
+        else:
+            projects = projects.order_by('-created_at')
         
-        projects = projects.order_by('-created_at')
-        
-        # Pagination
-        paginator = Paginator(projects, per_page)
-        page_obj = paginator.get_page(page)
-        
-        # Serialize data
-        projects_data = []
-        for project in page_obj:
-            project_data = {
-                'id': project.id,
-                'title': project.title,
-                'description': project.description,
-                'location': project.location,
-                'price': project.price,
-                'project_type': project.project_type,
-                'area_sqft': project.area_sqft,
-                'bedrooms': project.bedrooms,
-                'bathrooms': project.bathrooms,
-                'parking': project.parking,
-                'amenities': project.get_amenities_list(),
-                'is_featured': project.is_featured,
-                'status': project.status,
-                'image_url': project.image.url if project.image else None,
-                'created_at': project.created_at.isoformat(),
-            }
-            projects_data.append(project_data)
+        # Only the fragment keys are loaded; the JSON comes from the fragment cache
+        projects = projects.only(*KEY_FIELDS)
         
-        return JsonResponse({
-            'success': True,
-            'data': projects_data,
-            'pagination': {
+        # Pagination (keyset mode skips COUNT/OFFSET and orders by newest first)
+        if wants_cursor(request):
+            page_items, pagination = paginate_by_cursor(
+                projects, request.GET.get('cursor'), per_page
+            )
+        else:
+            paginator = Paginator(projects, per_page)
+            page_obj = paginator.get_page(page)
+            page_items = page_obj
+            pagination = {
                 'current_page': page_obj.number,
                 'total_pages': paginator.num_pages,
                 'total_items': paginator.count,
                 'has_next': page_obj.has_next(),
                 'has_previous': page_obj.has_previous(),
             }
+        
+        return fragment_response({
+            'success': True,
+            'data': fragments(list(page_items), FULL),
+            'pagination': pagination,
         })
         
     except Exception as e:
@@ -174,8 +167,9 @@ def api_newsletter_subscribe(request):
 def api_company_info(request):
     """API endpoint to get company information"""
     try:
-        company_info = CompanyInfo.objects.first()
-        about_us = AboutUs.objects.first()
+        config = get_site_config()
+        company_info = config.company_info
+        about_us = config.about_us
         
         data = {}
         
@@ -225,52 +219,32 @@ def api_company_info(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional(project_etag, public=True)
 def api_project_detail(request, project_id):
     """API endpoint to get detailed project information"""
     try:
-        project = Project.objects.get(id=project_id)
+        project = ProjectCache.get_project(project_id)
+        if project is None:
+            raise Project.DoesNotExist
+        
+        # Get related projects (precomputed nearest neighbours)
+        related_projects = [related for related, _ in similarity.get_similar_projects(project.id, limit=3)]
         
-        # Get related projects
-        related_projects = Project.objects.filter(
-            project_type=project.project_type
-        ).exclude(id=project.id)[:3]
-        
-        project_data = {
-            'id': project.id,
-            'title': project.title,
-            'description': project.description,
-            'location': project.location,
-            'price': project.price,
-            'project_type': project.project_type,
-            'area_sqft': project.area_sqft,
-            'bedrooms': project.bedrooms,
-            'bathrooms': project.bathrooms,
-            'parking': project.parking,
-            'amenities': project.get_amenities_list(),
-            'is_featured': project.is_featured,
-            'status': project.status,
-            'image_url': project.image.url if project.image else None,
-            'images': [
+        project_data = splice(
+            fragments([project], FULL)[0],
+            images=[
                 {
                     'url': img.image.url,
-                    'caption': img.caption
+                    'caption': img.caption,
+                    'renditions': renditions.rendition_set(img),
                 } for img in project.images.all()
             ],
-            'meta_title': project.meta_title,
-            'meta_description': project.meta_description,
-            'created_at': project.created_at.isoformat(),
-            'related_projects': [
-                {
-                    'id': rp.id,
-                    'title': rp.title,
-                    'location': rp.location,
-                    'price': rp.price,
-                    'image_url': rp.image.url if rp.image else None,
-                } for rp in related_projects
-            ]
-        }
+            meta_title=project.meta_title,
+            meta_description=project.meta_description,
+            related_projects=fragments(related_projects, CARD),
+        )
         
-        return JsonResponse({
+        return fragment_response({
             'success': True,
             'data': project_data
         })
@@ -300,28 +274,31 @@ def api_advanced_search(request):
         min_bedrooms = request.GET.get('min_bedrooms')
         max_bedrooms = request.GET.get('max_bedrooms')
         amenities = request.GET.getlist('amenities')
-        sort_by = request.GET.get('sort', 'created_at')
+        use_cursor = wants_cursor(request)
+        # Cursor pages follow (created_at, id), so they cannot keep BM25 order
+        sort_by = request.GET.get('sort', 'relevance' if query and not use_cursor else 'created_at')
         sort_order = request.GET.get('order', 'desc')
         page = int(request.GET.get('page', 1))
-        per_page = min(int(request.GET.get('per_page', 12)), 50)  # Max 50 per page
+        per_page = clamp_per_page(request.GET.get('per_page'), default=12)  # Max 50 per page
+        
+        if use_cursor and sort_by != 'created_at':
+            return JsonResponse({
+                'success': False,
+                'error': 'Cursor pagination is only available when sorting by created_at'
+            }, status=400)
         
         # Start with all projects
         projects = Project.objects.all()
         
         # Apply filters
         if query:
-            projects = projects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(location__icontains=query) |
-                Q(amenities__icontains=query)
-            )
+            projects = search.search_projects(projects, query)
         
         if min_price:
-            projects = projects.filter(price__gte=float(min_price))
+            projects = projects.filter(price_inr__gte=float(min_price))
         
         if max_price:
-            projects = projects.filter(price__lte=float(max_price))
+            projects = projects.filter(price_inr__lte=float(max_price))
             
         if project_type:
             projects = projects.filter(project_type=project_type)
@@ -330,75 +307,70 @@ def api_advanced_search(request):
             projects = projects.filter(location__icontains=location)
             
         if min_bedrooms:
-            projects = projects.filter(bedrooms__gte=int(min_bedrooms))
+            projects = projects.filter(bedroom_count__gte=int(min_bedrooms))
             
         if max_bedrooms:
-            projects = projects.filter(bedrooms__lte=int(max_bedrooms))
+            projects = projects.filter(bedroom_count__lte=int(max_bedrooms))
             
         if amenities:
-            for amenity in amenities:
-                projects = projects.filter(amenities__icontains=amenity)
-        
-        # Apply sorting
-        valid_sort_fields = ['created_at', 'price', 'title', 'bedrooms', 'area_sqft']
-        if sort_by in valid_sort_fields:
+            projects = projects.with_all_amenities(amenities)
+        
+        # Apply sorting (numeric fields sort on their parsed, indexed columns)
+        sort_fields = {
+            'created_at': 'created_at',
+            'price': 'price_inr',
+            'title': 'title',
+            'bedrooms': 'bedroom_count',
+            'area_sqft': 'area_sqft_value',
+        }
+        if sort_by in sort_fields:
+            sort_field = F(sort_fields[sort_by])
             if sort_order == 'desc':
-                projects = projects.order_by(f'-{sort_by}')
+                projects = projects.order_by(sort_field.desc(nulls_last=True))
             else:
-                projects = projects.order_by(sort_by)
+                projects = projects.order_by(sort_field.asc(nulls_last=True))
+        elif sort_by == 'relevance' and query:
+            pass  # already ordered by search rank
         else:
             projects = projects.order_by('-created_at')
         
-        # Pagination
-        paginator = Paginator(projects, per_page)
-        page_obj = paginator.get_page(page)
-        
-        # Serialize results
-        results = []
-        for project in page_obj:
-            results.append({
-                'id': project.id,
-                'title': project.title,
-                'description': project.description[:200] + '...' if len(project.description) > 200 else project.description,
-                'location': project.location,
-                'price': project.price,
-                'project_type': project.project_type,
-                'bedrooms': project.bedrooms,
-                'bathrooms': project.bathrooms,
-                'area_sqft': project.area_sqft,
-                'amenities': project.get_amenities_list()[:5],  # First 5 amenities
-                'image_url': project.image.url if project.image else None,
-                'is_featured': project.is_featured,
-                'status': project.status,
-            })
-        
-        # Get filter options for frontend
-        filter_options = {
-            'project_types': list(Project.objects.values_list('project_type', flat=True).distinct()),
-            'locations': list(Project.objects.values_list('location', flat=True).distinct()),
-            'price_range': {
-                'min': Project.objects.aggregate(min_price=Min('price'))['min_price'] or 0,
-                'max': Project.objects.aggregate(max_price=Max('price'))['max_price'] or 0,
-            },
-            'bedroom_range': {
-                'min': Project.objects.aggregate(min_br=Min('bedrooms'))['min_br'] or 0,
-                'max': Project.objects.aggregate(max_br=Max('bedrooms'))['max_br'] or 0,
+        # Pagination (only fragment keys are loaded for the page)
+        if use_cursor:
+            page_items, pagination = paginate_by_cursor(
+                projects.only(*KEY_FIELDS), request.GET.get('cursor'), per_page,
+                descending=sort_order == 'desc',
+            )
+        else:
+            paginator = Paginator(projects.only(*KEY_FIELDS), per_page)
+            page_obj = paginator.get_page(page)
+            page_items = page_obj
+            pagination = {
+                'current_page': page_obj.number,
+                'total_pages': paginator.num_pages,
+                'total_items': paginator.count,
+                'has_next': page_obj.has_next(),
+                'has_previous': page_obj.has_previous(),
+                'per_page': per_page,
             }
-        }
         
-        return JsonResponse({
+        # Pre-encoded card fragments, spliced into the response
+        results = fragments(list(page_items), CARD)
+        
+        # Get filter options for frontend (precomputed, no queries on a warm cache)
+        filter_options = facets.filter_options()
+        
+        # Facet counts under the current filters (one grouped query when filtered)
+        is_filtered = any([query, min_price, max_price, project_type, location,
+                           min_bedrooms, max_bedrooms, amenities])
+        facet_counts = facets.facet_counts(projects if is_filtered else None)
+        
+        return fragment_response({
             'success': True,
             'data': {
                 'results': results,
-                'pagination': {
-                    'current_page': page_obj.number,
-                    'total_pages': paginator.num_pages,
-                    'total_items': paginator.count,
-                    'has_next': page_obj.has_next(),
-                    'has_previous': page_obj.has_previous(),
-                    'per_page': per_page,
-                },
+                'pagination': pagination,
                 'filters': filter_options,
+                'facet_counts': facet_counts,
                 'applied_filters': {
                     'query': query,
                     'min_price': min_price,
@@ -425,13 +397,12 @@ def api_advanced_search(request):
 def api_statistics(request):
     """API endpoint for dashboard statistics"""
     try:
-        from .utils import calculate_project_stats
         from django.db.models import Count, Avg
         from django.utils import timezone
         from datetime import timedelta
         
         # Basic stats
-        stats = calculate_project_stats()
+        stats = ProjectCache.get_project_stats()
         
         # Recent activity (last 30 days)
         thirty_days_ago = timezone.now() - timedelta(days=30)
@@ -445,7 +416,7 @@ def api_statistics(request):
         
         # Average project price by type
         price_by_type = Project.objects.values('project_type').annotate(
-            avg_price=Avg('price'),
+            avg_price=Avg('price_inr'),
             count=Count('id')
         ).order_by('-avg_price')
         
@@ -520,28 +491,15 @@ def api_track_analytics(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional(catalog_etag, public=True)
 def api_featured_projects(request):
     """Get featured projects for homepage"""
     try:
-        featured_projects = Project.objects.filter(is_featured=True)[:6]
-        
-        projects_data = []
-        for project in featured_projects:
-            projects_data.append({
-                'id': project.id,
-                'title': project.title,
-                'location': project.location,
-                'price': project.price,
-                'project_type': project.project_type,
-                'bedrooms': project.bedrooms,
-                'area_sqft': project.area_sqft,
-                'image_url': project.image.url if project.image else None,
-                'status': project.status,
-            })
+        featured_projects = ProjectCache.get_featured_projects(limit=6)
         
-        return JsonResponse({
+        return fragment_response({
             'success': True,
-            'data': projects_data
+            'data': fragments(featured_projects, CARD)
         })
         
     except Exception as e:
@@ -557,7 +515,7 @@ def api_project_types(request):
     try:
         project_types = Project.objects.values('project_type').annotate(
             count=Count('id'),
-            avg_price=Avg('price')
+            avg_price=Avg('price_inr')
         ).order_by('project_type')
         
         return JsonResponse({
@@ -578,9 +536,9 @@ def api_locations(request):
     try:
         locations = Project.objects.values('location').annotate(
             count=Count('id'),
-            avg_price=Avg('price'),
-            min_price=Min('price'),
-            max_price=Max('price')
+            avg_price=Avg('price_inr'),
+            min_price=Min('price_inr'),
+            max_price=Max('price_inr')
         ).order_by('location')
         
         return JsonResponse({
@@ -648,36 +606,19 @@ def api_quick_inquiry(request):
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_similar_projects(request, project_id):
-    """Get similar projects based on location and type"""
+    """Get similar projects based on type, location, price band, bedrooms and area"""
     try:
-        project = Project.objects.get(id=project_id)
-        
-        # Find similar projects
-        similar_projects = Project.objects.filter(
-            Q(location__icontains=project.location.split(',')[0]) |  # Same city
-            Q(project_type=project.project_type)
-        ).exclude(id=project.id).order_by('-is_featured', '-created_at')[:6]
-        
-        projects_data = []
-        for proj in similar_projects:
-            projects_data.append({
-                'id': proj.id,
-                'title': proj.title,
-                'location': proj.location,
-                'price': proj.price,
-                'project_type': proj.project_type,
-                'bedrooms': proj.bedrooms,
-                'image_url': proj.image.url if proj.image else None,
-                'similarity_score': (
-                    (2 if proj.project_type == project.project_type else 0) +
-                    (1 if project.location.split(',')[0] in proj.location else 0)
-                )
-            })
+        if not Project.objects.filter(id=project_id).exists():
+            raise Project.DoesNotExist
         
-        # Sort by similarity score
-        projects_data.sort(key=lambda x: x['similarity_score'], reverse=True)
+        # Precomputed top-k neighbours, best match first
+        similar = similarity.get_similar_projects(project_id)
+        projects_data = [
+            splice(fragment, similarity_score=round(score, 3))
+            for fragment, (_, score) in zip(fragments([proj for proj, _ in similar], CARD), similar)
+        ]
         
-        return JsonResponse({
+        return fragment_response({
             'success': True,
             'data': projects_data
         })
@@ -705,35 +646,14 @@ def api_price_estimate(request):
         location = data.get('location')
         project_type = data.get('project_type')
         
-        # Build filter for similar projects
-        filters = Q()
-        if bedrooms:
-            filters &= Q(bedrooms=bedrooms)
-        if project_type:
-            filters &= Q(project_type=project_type)
-        if location:
-            filters &= Q(location__icontains=location)
-        
-        similar_projects = Project.objects.filter(filters)
+        stats = price_stats.estimate(
+            location=location,
+            project_type=project_type,
+            bedrooms=bedrooms,
+            area=parse_area(area_sqft),
+        )
         
-        if similar_projects.exists():
-            stats = similar_projects.aggregate(
-                avg_price=Avg('price'),
-                min_price=Min('price'),
-                max_price=Max('price'),
-                count=Count('id')
-            )
-            
-            # Calculate price per sqft if area provided
-            price_per_sqft = None
-            if area_sqft and stats['avg_price']:
-                avg_area = similar_projects.aggregate(avg_area=Avg('area_sqft'))['avg_area']
-                if avg_area:
-                    price_per_sqft = stats['avg_price'] / avg_area
-                    estimated_price = price_per_sqft * float(area_sqft)
-                    stats['estimated_price'] = estimated_price
-                    stats['price_per_sqft'] = price_per_sqft
-            
+        if stats:
             return JsonResponse({
                 'success': True,
                 'data': {
@@ -768,6 +688,139 @@ def api_price_estimate(request):
             'error': str(e)
         }, status=400)
 
+def _staff_only(request):
+    """403 response for anyone but logged-in staff, else None"""
+    if request.user.is_authenticated and request.user.is_staff:
+        return None
+    return JsonResponse({
+        'success': False,
+        'error': 'Staff login required'
+    }, status=403)
+
+def _upload_data(upload):
+    return {
+        'upload_id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.size,
+        'received': upload.received,
+        'complete': upload.complete,
+        'chunk_size': uploads.chunk_size(),
+    }
+
+@require_http_methods(["POST"])
+def api_upload_start(request):
+    """Start a chunked upload: {"filename": ..., "size": ...}"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    try:
+        data = json.loads(request.body)
+        upload = uploads.start(request.user, data.get('filename'), int(data.get('size') or 0))
+        
+        return JsonResponse({
+            'success': True,
+            'data': _upload_data(upload)
+        }, status=201)
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+@require_http_methods(["GET", "PUT"])
+def api_upload_chunk(request, upload_id):
+    """GET: upload progress (where to resume). PUT: next chunk as the raw body, with Content-Range"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    upload = ChunkedUpload.objects.filter(pk=upload_id, user=request.user).first()
+    if upload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Upload not found'
+        }, status=404)
+    
+    if request.method == 'GET':
+        return JsonResponse({
+            'success': True,
+            'data': _upload_data(upload)
+        })
+    
+    try:
+        first, length = uploads.parse_content_range(request.headers.get('Content-Range'), upload)
+        # Read from the request stream; request.body would load the chunk into memory
+        uploads.append_chunk(upload, request, first, length)
+        
+        return JsonResponse({
+            'success': True,
+            'data': _upload_data(upload)
+        })
+        
+    except uploads.UploadError as e:
+        upload.refresh_from_db()
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'data': _upload_data(upload)
+        }, status=409)
+
+@require_http_methods(["POST"])
+def api_project_add_images(request, project_id):
+    """Add finished uploads to a project's gallery: {"images": [{"upload_id": ..., "caption": ...}]}"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    try:
+        project = Project.objects.get(id=project_id)
+        data = json.loads(request.body)
+        entries = data.get('images') or []
+        
+        upload_ids = [entry.get('upload_id') for entry in entries]
+        found = ChunkedUpload.objects.filter(pk__in=upload_ids, user=request.user).in_bulk()
+        if not entries or len(found) != len(set(upload_ids)):
+            return JsonResponse({
+                'success': False,
+                'error': 'Unknown upload_id'
+            }, status=400)
+        
+        created = uploads.add_gallery_images(project, [
+            (found[uuid.UUID(str(entry['upload_id']))], entry.get('caption', '')) for entry in entries
+        ])
+        
+        return JsonResponse({
+            'success': True,
+            'data': [
+                {
+                    'id': image.id,
+                    'url': image.image.url,
+                    'caption': image.caption,
+                    'order': image.order,
+                } for image in created
+            ]
+        }, status=201)
+        
+    except Project.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Project not found'
+        }, status=404)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_health_check(request):
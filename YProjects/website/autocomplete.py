@@ -0,0 +1,134 @@
+"""
+In-process prefix index for project typeahead.
+
+The index is a sorted array of lowercase tokens (from project titles,
+locations and project types) with a posting set of project ids per token.
+A prefix lookup is two bisects plus set unions, so answering a keystroke
+never touches the database. The index is built lazily and rebuilt whenever
+the catalog cache version changes.
+"""
+import re
+import threading
+from bisect import bisect_left
+from django.conf import settings
+from .models import Project
+from .utils import get_cache_version, CATALOG_VERSION
+from . import renditions
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Fields returned for each suggestion, matching /api/search-projects/
+RESULT_FIELDS = ('id', 'title', 'location', 'price', 'image_url', 'image_thumb_url', 'project_type')
+
+SORT_FEATURED = 'featured'
+SORT_RECENT = 'recent'
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class PrefixIndex:
+    """Immutable prefix index over a snapshot of the project catalog"""
+
+    def __init__(self, entries):
+        self.entries = {entry['id']: entry for entry in entries}
+
+        postings = {}
+        type_labels = dict(Project.PROPERTY_TYPES)
+        for entry in entries:
+            words = (
+                tokenize(entry['title'])
+                + tokenize(entry['location'])
+                + tokenize(entry['project_type'])
+                + tokenize(type_labels.get(entry['project_type'], ''))
+            )
+            for word in words:
+                postings.setdefault(word, set()).add(entry['id'])
+
+        self.tokens = sorted(postings)
+        self.postings = [frozenset(postings[token]) for token in self.tokens]
+
+        # Precomputed positions so lookups sort by integer rank only
+        by_recent = sorted(entries, key=lambda e: (e['created_at'], e['id']), reverse=True)
+        by_featured = sorted(by_recent, key=lambda e: not e['is_featured'])
+        self.rank = {
+            SORT_RECENT: {entry['id']: pos for pos, entry in enumerate(by_recent)},
+            SORT_FEATURED: {entry['id']: pos for pos, entry in enumerate(by_featured)},
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _match_prefix(self, prefix):
+        start = bisect_left(self.tokens, prefix)
+        end = bisect_left(self.tokens, prefix + '\U0010ffff', lo=start)
+        if end - start == 1:
+            return self.postings[start]
+        matched = set()
+        for posting in self.postings[start:end]:
+            matched |= posting
+        return matched
+
+    def lookup(self, query, limit=10, sort=SORT_FEATURED):
+        """Return up to `limit` projects in which every query word prefixes a token"""
+        words = tokenize(query)
+        if not words:
+            return []
+
+        matched = None
+        for word in sorted(set(words), key=len, reverse=True):
+            ids = self._match_prefix(word)
+            matched = set(ids) if matched is None else matched & ids
+            if not matched:
+                return []
+
+        rank = self.rank.get(sort, self.rank[SORT_FEATURED])
+        ordered = sorted(matched, key=rank.__getitem__)[:limit]
+        return [
+            {field: self.entries[project_id][field] for field in RESULT_FIELDS}
+            for project_id in ordered
+        ]
+
+
+def build_index():
+    """Load the catalog in one query and build a fresh PrefixIndex"""
+    storage = Project._meta.get_field('image').storage
+    rows = Project.objects.values(
+        'id', 'title', 'location', 'price', 'image', 'image_hash', 'project_type', 'is_featured', 'created_at'
+    )
+    entries = []
+    for row in rows:
+        image = row.pop('image')
+        digest = row.pop('image_hash')
+        row['image_url'] = storage.url(image) if image else ''
+        row['image_thumb_url'] = renditions.rendition_url('project', row['id'], image, digest, 'thumb', storage=storage) or ''
+        entries.append(row)
+    return PrefixIndex(entries)
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the current index, rebuilding it if the catalog has changed"""
+    global _index, _index_version
+
+    version = get_cache_version(CATALOG_VERSION)
+    if _index is not None and _index_version == version:
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = build_index()
+            _index_version = version
+    return _index
+
+
+def suggest(query, limit=None, sort=SORT_FEATURED):
+    """Typeahead suggestions for `query`, capped at AUTOCOMPLETE_MAX_RESULTS"""
+    max_results = getattr(settings, 'AUTOCOMPLETE_MAX_RESULTS', 10)
+    limit = max_results if limit is None else max(1, min(limit, max_results))
+    return get_index().lookup(query, limit=limit, sort=sort)
@@ -0,0 +1,207 @@
+"""
+Two-tier cache backend.
+
+TwoTierCache keeps a bounded, TTL-aware LRU of recently read entries in
+process memory (L1) in front of a shared cache (L2, any configured cache
+alias, Redis in production). Writes go to both tiers; atomic operations
+(add, incr, decr) always go to L2, so L2 must implement them atomically
+across processes (Redis does; locmem does only within one process, and
+the file-based and database caches' incr() is read-then-write).
+
+Coherence between processes relies on version stamps: invalidation in this
+project moves a `cache_version:*` key, and every cached value that can
+change is stored under a key embedding those versions. The version keys
+themselves (and other keys that are updated in place, listed in
+L1_BYPASS_PREFIXES) are never kept in L1, so a process always sees the
+current version and therefore only ever reads immutable entries from L1.
+L1_TIMEOUT bounds how long anything else can be served stale.
+
+Settings example::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'website.cache_backends.TwoTierCache',
+            'OPTIONS': {'L2': 'shared', 'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 300},
+        },
+        'shared': {...},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+DEFAULT_BYPASS_PREFIXES = (
+    'cache_version:',  # version stamps (website.utils.get_cache_version)
+    'facets:',  # facet summary, updated in place
+    'ratelimit:',
+)
+
+
+class TwoTierCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options.get('L2', 'shared')
+        self._max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 300))
+        self._bypass = tuple(options.get('L1_BYPASS_PREFIXES', DEFAULT_BYPASS_PREFIXES))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _local(self, key):
+        return not key.startswith(self._bypass) and not key.endswith(':lock')
+
+    def _l1_get(self, local_key):
+        with self._lock:
+            entry = self._l1.get(local_key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._l1[local_key]
+                return None
+            self._l1.move_to_end(local_key)
+        return pickle.loads(payload)
+
+    def _l1_set(self, local_key, value, timeout):
+        timeout = self._l1_timeout if timeout is None else min(timeout, self._l1_timeout)
+        if timeout <= 0:
+            self._l1_delete(local_key)
+            return
+        payload = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._l1[local_key] = (time.monotonic() + timeout, payload)
+            self._l1.move_to_end(local_key)
+            while len(self._l1) > self._max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, local_key):
+        with self._lock:
+            self._l1.pop(local_key, None)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        local = self._local(key)
+        if local:
+            value = self._l1_get(local_key)
+            if value is not None:
+                return value
+
+        value = self.l2.get(key, _MISSING if local else default, version=version)
+        if local:
+            if value is _MISSING:
+                return default
+            # The remaining TTL in L2 is unknown; L1_TIMEOUT bounds it
+            self._l1_set(local_key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            local_key = self.make_and_validate_key(key, version=version)
+            value = self._l1_get(local_key) if self._local(key) else None
+            if value is not None:
+                found[key] = value
+            else:
+                remote.append(key)
+        if remote:
+            fetched = self.l2.get_many(remote, version=version)
+            for key, value in fetched.items():
+                if self._local(key):
+                    self._l1_set(self.make_and_validate_key(key, version=version), value, None)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        self.l2.set(key, value, timeout, version=version)
+        if self._local(key):
+            self._l1_set(local_key, value, timeout)
+        else:
+            self._l1_delete(local_key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added and self._local(key):
+            self._l1_set(local_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, self._timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._local(key) and self._l1_get(local_key) is not None:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.decr(key, delta, version=version)
+
+    def clear(self):
+        """Clear L2 and this process's L1 (other processes age out via L1_TIMEOUT)"""
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
+
+    def clear_local(self):
+        with self._lock:
+            self._l1.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+# L2 backends whose add()/incr() are atomic across worker processes
+ATOMIC_L2_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django_redis.cache.RedisCache',
+)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn (in `check --deploy`) when a TwoTierCache sits on an L2 that isn't shared atomically"""
+    errors = []
+    for alias, config in settings.CACHES.items():
+        if config.get('BACKEND') != 'website.cache_backends.TwoTierCache':
+            continue
+        l2 = config.get('OPTIONS', {}).get('L2', 'shared')
+        if settings.CACHES.get(l2, {}).get('BACKEND') not in ATOMIC_L2_BACKENDS:
+            errors.append(checks.Warning(
+                f"The '{alias}' cache's L2 ('{l2}') is not Redis, so rate limits, locks and "
+                f"cache invalidation are not shared between worker processes.",
+                hint='Set CACHE_REDIS_URL, or serve the site from a single process.',
+                id='website.W001',
+            ))
+    return errors
@@ -1,31 +1,23 @@
-from .models import CompanyInfo, AboutUs, Project
+from .site_config import get_site_config
 
 def company_context(request):
     """Context processor to add company information to all templates"""
-    company_info = CompanyInfo.objects.first()
-    about_us = AboutUs.objects.first()
-    
-    # Get featured projects count for header/footer
-    featured_projects_count = Project.objects.filter(is_featured=True).count()
-    total_projects_count = Project.objects.count()
+    config = get_site_config()
     
     context = {
-        'company_info': company_info,
-        'about_us': about_us,
-        'featured_projects_count': featured_projects_count,
-        'total_projects_count': total_projects_count,
+        'company_info': config.company_info,
+        'about_us': config.about_us,
+        'featured_projects_count': config.featured_projects_count,
+        'total_projects_count': config.total_projects_count,
     }
     
     # Add social media links if company info exists
-    if company_info:
-        context.update({
-            'social_links': {
-                'facebook': company_info.facebook_url,
-                'instagram': company_info.instagram_url,
-                'twitter': company_info.twitter_url,
-                'youtube': company_info.youtube_url,
-                'linkedin': company_info.linkedin_url,
-            }
-        })
+    if config.social_links:
+        context['social_links'] = config.social_links
+    
+    # SEO overrides for the current page, keyed by URL name
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match:
+        context['seo_settings'] = config.seo_for(resolver_match.url_name)
     
-    return context
\ No newline at end of file
+    return context
@@ -0,0 +1,195 @@
+"""
+Facet summary for the advanced project search.
+
+The catalog-wide summary (counts per project type, location and status,
+price and bedroom histograms, min/max ranges) is built with one grouped
+query, stored in the cache and then maintained incrementally from the
+Project post_save/post_delete receivers. A warm request therefore builds
+its `filter_options` block without touching the database.
+
+Incremental updates are read-modify-write on the cache, so concurrent
+writers in different processes can race; the summary expires after
+FACET_SUMMARY_TIMEOUT and is rebuilt from the database to correct drift.
+"""
+from django.core.cache import cache
+from django.db.models import Case, When, Value, IntegerField, Count
+from .models import Project
+
+FACET_SUMMARY_KEY = 'facets:summary'
+FACET_SUMMARY_TIMEOUT = 60 * 60 * 6
+
+LAKH = 100000
+CRORE = 100 * LAKH
+
+# (label, lower bound inclusive, upper bound exclusive) in rupees
+PRICE_BUCKETS = [
+    ('Under 25 Lakhs', 0, 25 * LAKH),
+    ('25 - 50 Lakhs', 25 * LAKH, 50 * LAKH),
+    ('50 Lakhs - 1 Crore', 50 * LAKH, CRORE),
+    ('1 - 2 Crores', CRORE, 2 * CRORE),
+    ('Above 2 Crores', 2 * CRORE, None),
+]
+
+# Project columns that feed the facets
+FACET_FIELDS = ('project_type', 'location', 'status', 'price_inr', 'bedroom_count')
+
+COUNTERS = ('project_types', 'locations', 'statuses', 'prices', 'bedrooms', 'price_buckets')
+
+
+def price_bucket(price):
+    """Index into PRICE_BUCKETS for a price in rupees, or None if unknown"""
+    if price is None:
+        return None
+    for index, (_, lower, upper) in enumerate(PRICE_BUCKETS):
+        if price >= lower and (upper is None or price < upper):
+            return index
+    return None
+
+
+def _price_bucket_expression():
+    whens = [
+        When(price_inr__gte=lower, price_inr__lt=upper, then=Value(index))
+        if upper is not None else When(price_inr__gte=lower, then=Value(index))
+        for index, (_, lower, upper) in enumerate(PRICE_BUCKETS)
+    ]
+    return Case(*whens, default=Value(None), output_field=IntegerField())
+
+
+def _empty_summary():
+    return {name: {} for name in COUNTERS}
+
+
+def _apply(summary, values, delta):
+    """Add (delta=1) or remove (delta=-1) one project's facet values"""
+    price = values['price_inr']
+    keys = {
+        'project_types': values['project_type'],
+        'locations': values['location'],
+        'statuses': values['status'],
+        'prices': price,
+        'bedrooms': values['bedroom_count'],
+        'price_buckets': price_bucket(price),
+    }
+    for counter, key in keys.items():
+        if key is None:
+            continue
+        counts = summary[counter]
+        counts[key] = counts.get(key, 0) + delta
+        if counts[key] <= 0:
+            del counts[key]
+
+
+def build_summary():
+    """Compute the catalog-wide summary with a single grouped query"""
+    summary = _empty_summary()
+    rows = Project.objects.order_by().values(*FACET_FIELDS).annotate(total=Count('id'))
+    for row in rows:
+        _apply(summary, row, row['total'])
+    cache.set(FACET_SUMMARY_KEY, summary, FACET_SUMMARY_TIMEOUT)
+    return summary
+
+
+def get_summary():
+    summary = cache.get(FACET_SUMMARY_KEY)
+    if summary is None:
+        summary = build_summary()
+    return summary
+
+
+def project_changed(old_values, new_values):
+    """Apply one project's before/after facet values to the cached summary.
+
+    Pass None for old_values on create and for new_values on delete. When
+    the old values of an update are unknown the summary is dropped and
+    rebuilt on the next read.
+    """
+    summary = cache.get(FACET_SUMMARY_KEY)
+    if summary is None:
+        return
+    if old_values is not None and not all(field in old_values for field in FACET_FIELDS):
+        cache.delete(FACET_SUMMARY_KEY)
+        return
+    if old_values is not None and new_values is not None and all(
+        old_values[field] == new_values[field] for field in FACET_FIELDS
+    ):
+        return
+
+    if old_values is not None:
+        _apply(summary, old_values, -1)
+    if new_values is not None:
+        _apply(summary, new_values, 1)
+    cache.set(FACET_SUMMARY_KEY, summary, FACET_SUMMARY_TIMEOUT)
+
+
+def facet_values(project):
+    return {field: getattr(project, field) for field in FACET_FIELDS}
+
+
+def _histogram(bucket_counts):
+    return [
+        {
+            'label': label,
+            'min': lower,
+            'max': upper,
+            'count': bucket_counts.get(index, 0),
+        }
+        for index, (label, lower, upper) in enumerate(PRICE_BUCKETS)
+    ]
+
+
+def _counts(summary):
+    return {
+        'project_type': dict(sorted(summary['project_types'].items())),
+        'location': dict(sorted(summary['locations'].items())),
+        'status': dict(sorted(summary['statuses'].items())),
+        'bedrooms': dict(sorted(summary['bedrooms'].items())),
+        'price': _histogram(summary['price_buckets']),
+    }
+
+
+def filter_options():
+    """The `filters` block of the advanced search response"""
+    summary = get_summary()
+    prices = summary['prices']
+    bedrooms = summary['bedrooms']
+    return {
+        'project_types': sorted(summary['project_types']),
+        'locations': sorted(summary['locations']),
+        'price_range': {
+            'min': min(prices) if prices else 0,
+            'max': max(prices) if prices else 0,
+        },
+        'bedroom_range': {
+            'min': min(bedrooms) if bedrooms else 0,
+            'max': max(bedrooms) if bedrooms else 0,
+        },
+        'histograms': _counts(summary),
+    }
+
+
+def facet_counts(queryset=None):
+    """Facet counts for the projects in `queryset`.
+
+    Without a queryset (no filters applied) the cached summary is used;
+    otherwise counts come from one grouped query over the filtered rows.
+    """
+    if queryset is None:
+        return _counts(get_summary())
+
+    summary = _empty_summary()
+    rows = queryset.order_by().annotate(
+        price_bucket=_price_bucket_expression()
+    ).values(
+        'project_type', 'location', 'status', 'bedroom_count', 'price_bucket'
+    ).annotate(total=Count('id'))
+    for row in rows:
+        for counter, key in (
+            ('project_types', row['project_type']),
+            ('locations', row['location']),
+            ('statuses', row['status']),
+            ('bedrooms', row['bedroom_count']),
+            ('price_buckets', row['price_bucket']),
+        ):
+            if key is not None:
+                summary[counter][key] = summary[counter].get(key, 0) + row['total']
+    return _counts(summary)
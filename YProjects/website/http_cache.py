@@ -0,0 +1,57 @@
+"""
+Conditional GET support for project pages and APIs.
+
+ETags are derived from the catalog/site_config cache versions (plus,
+for a single project, its updated_at: one primary-key lookup), so a
+request carrying a matching If-None-Match is answered with 304 before
+the view runs any of its own queries. No Last-Modified is
+sent: the versions are counters, not times, and a project page also
+changes with site configuration and related projects, so no single
+timestamp can validate it exactly.
+"""
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .models import Project
+from .utils import get_cache_version, CATALOG_VERSION, SITE_CONFIG_VERSION
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def catalog_etag(request, *args, **kwargs):
+    """Changes whenever any project or site configuration changes"""
+    return _etag(get_cache_version(CATALOG_VERSION), get_cache_version(SITE_CONFIG_VERSION))
+
+
+def project_etag(request, project_id, *args, **kwargs):
+    # updated_at also catches edits that bypass the catalog bump (queryset
+    # update()); related projects and galleries are covered by the catalog version
+    updated_at = Project.objects.filter(pk=project_id).order_by().values_list('updated_at', flat=True).first()
+    return _etag(project_id, updated_at, catalog_etag(request))
+
+
+def conditional(etag_func, public=False):
+    """Answer conditional GETs with 304 and mark responses as revalidatable.
+
+    Responses get `Cache-Control: max-age=HTTP_CACHE_MAX_AGE, must-revalidate`
+    (plus `public` for API payloads) so browsers and the reverse proxy keep
+    them and revalidate with the ETags above.
+    """
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                options = {'max_age': getattr(settings, 'HTTP_CACHE_MAX_AGE', 0), 'must_revalidate': True}
+                if public:
+                    options['public'] = True
+                patch_cache_control(response, **options)
+            return response
+        return wrapper
+    return decorator
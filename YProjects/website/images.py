@@ -0,0 +1,203 @@
+"""
+Background processing of uploaded project, gallery and banner images.
+
+Saving a Project, ProjectImage or Banner never touches the image file.
+When the upload itself changed, the post_save receiver in signals.py
+schedules `process()` to run after the transaction commits, on a small
+worker pool. The job hashes the original's content and, only if the hash
+differs from the one recorded in `image_hash`, writes the srcset
+renditions (see website.renditions) and, for projects and banners, a
+size-bounded derived copy under content-addressed names. The original
+upload is never modified.
+
+Pages and APIs use `display_url()`, which points at the derived copy once
+it exists and at the original until then.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image
+from . import renditions
+
+logger = logging.getLogger(__name__)
+
+# Largest (width, height) of the derived display copy, per model
+MAX_SIZES = {
+    'website.project': (1200, 800),
+    'website.banner': (1920, 600),
+}
+
+DERIVED_DIR = 'derived'
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='images')
+
+
+def content_hash(field_file, chunk_size=64 * 1024):
+    """SHA-256 of a stored file, read in chunks"""
+    # Deduplicating storage already names files by their digest
+    digest_of = getattr(field_file.storage, 'digest', None)
+    known = digest_of(field_file.name) if digest_of else None
+    if known:
+        return known
+    digest = hashlib.sha256()
+    with field_file.storage.open(field_file.name, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derived_name(name, digest, max_size):
+    extension = os.path.splitext(name)[1].lower()
+    return f'{DERIVED_DIR}/{digest[:2]}/{digest}-{max_size[0]}x{max_size[1]}{extension}'
+
+
+def display_url(instance):
+    """URL of the image to show for `instance`, or None without an image"""
+    if not instance.image:
+        return None
+    if not instance.image_hash:
+        return instance.image.url
+    max_size = MAX_SIZES[instance._meta.label_lower]
+    return instance.image.storage.url(derived_name(instance.image.name, instance.image_hash, max_size))
+
+
+def upload_changed(instance, created, update_fields):
+    """Whether a save may have replaced the image file"""
+    if created:
+        return bool(instance.image)
+    if update_fields is not None and 'image' not in update_fields:
+        return False
+    loaded = instance.get_loaded_values() or {}
+    # A deferred image column is unknown here; process() checks the hash anyway
+    return 'image' not in loaded or loaded['image'] != instance.image.name
+
+
+def render_derived(field_file, max_size):
+    """Bytes of `field_file` shrunk to fit within `max_size`"""
+    with field_file.storage.open(field_file.name, 'rb') as handle:
+        img = Image.open(handle)
+        image_format = img.format or 'JPEG'
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        if image_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        output = BytesIO()
+        img.save(output, format=image_format, quality=85, optimize=True)
+    return output.getvalue()
+
+
+def write_derived(field_file, digest, label):
+    """Write the missing derived files of one image.
+
+    Returns the size in bytes of the copy pages now serve instead of the
+    original (the display copy, or the hero JPEG rendition).
+    """
+    storage = field_file.storage
+    max_size = MAX_SIZES.get(label)
+    if max_size:
+        served = derived_name(field_file.name, digest, max_size)
+        if not storage.exists(served):
+            storage.save(served, ContentFile(render_derived(field_file, max_size)))
+    else:
+        served = renditions.rendition_name(digest, 'hero', 'jpeg')
+    renditions.generate(field_file, digest)
+    return storage.size(served)
+
+
+def process(model, pk):
+    """Write the derived files of one instance's image if its content changed.
+
+    Returns True when a new hash was recorded.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return False
+
+    name = instance.image.name
+    if not instance.image.storage.exists(name):
+        # Missing uploads are reported by the media_scan command
+        return False
+    digest = content_hash(instance.image)
+    if digest == instance.image_hash:
+        return False
+
+    write_derived(instance.image, digest, model._meta.label_lower)
+
+    # The upload may have been replaced while this job ran
+    if not model.objects.filter(pk=pk, image=name).exists():
+        return False
+    instance.image_hash = digest
+    update_fields = ['image_hash']
+    if hasattr(instance, 'updated_at'):
+        update_fields.append('updated_at')
+    instance.save(update_fields=update_fields)
+    return True
+
+
+def _run(model, pk):
+    try:
+        process(model, pk)
+    except Exception as e:
+        logger.error(f'Image processing failed for {model._meta.label} {pk}: {e}')
+
+
+def _run_in_thread(model, pk):
+    try:
+        _run(model, pk)
+    finally:
+        connections.close_all()
+
+
+def schedule(instance):
+    """Process `instance`'s image once the current transaction commits"""
+    model, pk = type(instance), instance.pk
+    if getattr(settings, 'IMAGE_PROCESSING_ASYNC', True):
+        transaction.on_commit(lambda: _executor.submit(_run_in_thread, model, pk))
+    else:
+        transaction.on_commit(lambda: _run(model, pk))
+
+
+# Image columns walked by the optimize_images command: only models that
+# record an image_hash, since nothing else serves (or keeps) the renditions
+IMAGE_FIELDS = {
+    'website.project': 'image',
+    'website.projectimage': 'image',
+    'website.banner': 'image',
+}
+
+
+def init_worker():
+    """ProcessPoolExecutor initializer for spawned (not forked) workers"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def optimize_stored(job):
+    """Process-pool job: hash one stored image and write its derived files.
+
+    `job` is (model label, pk, file name). Runs without database access;
+    the caller records the returned hash.
+    """
+    from django.apps import apps
+    label, pk, name = job
+    model = apps.get_model(label)
+    field = model._meta.get_field(IMAGE_FIELDS[label])
+    field_file = field.attr_class(None, field, name)
+    result = {'model': label, 'pk': pk, 'name': name}
+    try:
+        original = field_file.storage.size(name)
+        digest = content_hash(field_file)
+        served = write_derived(field_file, digest, label)
+    except FileNotFoundError:
+        result['status'] = 'missing'
+    except Exception as e:
+        result.update(status='failed', error=str(e))
+    else:
+        result.update(status='optimized', hash=digest, original_bytes=original, served_bytes=served)
+    return result
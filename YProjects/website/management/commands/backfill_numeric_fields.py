@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from website.models import Project
+
+class Command(BaseCommand):
+    # Migration 0003 fills the columns once; this re-runs the parse, e.g. after
+    # bulk edits that bypass Project.save or changes to website.parsing
+    help = 'Parse price, area, bedrooms and bathrooms into the numeric Project columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of projects to update per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        source_fields = list(Project.NUMERIC_FIELDS.keys())
+        numeric_fields = list(Project.NUMERIC_FIELDS.values())
+        
+        projects = Project.objects.only('id', *source_fields, *numeric_fields).order_by('id')
+        
+        batch = []
+        updated = 0
+        unparsed_prices = 0
+        for project in projects.iterator(chunk_size=batch_size):
+            project.update_numeric_fields()
+            if project.price_inr is None:
+                unparsed_prices += 1
+            batch.append(project)
+            if len(batch) >= batch_size:
+                Project.objects.bulk_update(batch, numeric_fields)
+                updated += len(batch)
+                batch = []
+        
+        if batch:
+            Project.objects.bulk_update(batch, numeric_fields)
+            updated += len(batch)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Backfilled numeric fields for {updated} projects')
+        )
+        if unparsed_prices:
+            self.stdout.write(
+                self.style.WARNING(f'{unparsed_prices} projects have a price that could not be parsed')
+            )
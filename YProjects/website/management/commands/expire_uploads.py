@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from website import uploads
+
+
+class Command(BaseCommand):
+    help = 'Remove chunked uploads left unfinished for CHUNKED_UPLOAD_EXPIRY, and their temporary files'
+
+    def handle(self, *args, **options):
+        removed, freed = uploads.expire()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} expired uploads, freed {freed / 1024 / 1024:.1f} MB'
+        ))
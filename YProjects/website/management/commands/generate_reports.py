@@ -2,8 +2,8 @@ from django.core.management.base import BaseCommand
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
-from website.models import Contact, Newsletter, Project, ProjectImage
-import os
+from website.models import Contact, Newsletter, Project
+from website import media_scan
 
 class Command(BaseCommand):
     help = 'Generate various reports for the website'
@@ -52,7 +52,7 @@ class Command(BaseCommand):
         )
         
         total_contacts = contacts.count()
-        responded_contacts = contacts.filter(is_responded=True).count()
+        responded_contacts = contacts.filter(responded_at__isnull=False).count()
         
         # Group by inquiry type
         inquiry_types = contacts.values('inquiry_type').annotate(
@@ -130,26 +130,29 @@ class Command(BaseCommand):
             Q(image__isnull=True) | Q(image='')
         ).count()
         
-        # Find project images without files
-        missing_images = []
-        for img in ProjectImage.objects.all():
-            if img.image and not os.path.exists(img.image.path):
-                missing_images.append(img.id)
+        # Referenced files missing from disk and files nothing references
+        scan = media_scan.scan()
         
         # Find contacts older than 1 year without response
         old_contacts = Contact.objects.filter(
             created_at__lt=timezone.now() - timedelta(days=365),
-            is_responded=False
+            responded_at__isnull=True
         ).count()
         
         self.stdout.write(f'Projects without images: {projects_no_images}')
-        self.stdout.write(f'Missing image files: {len(missing_images)}')
+        self.stdout.write(f'Missing image files: {len(scan.missing)}')
+        self.stdout.write(
+            f'Orphaned media files: {len(scan.orphans)} '
+            f'({sum(orphan.size for orphan in scan.orphans) / 1024 / 1024:.1f} MB reclaimable)'
+        )
         self.stdout.write(f'Old unresponded contacts: {old_contacts}')
         
-        if missing_images:
-            self.stdout.write('\nMissing image IDs:')
-            for img_id in missing_images[:10]:  # Show first 10
-                self.stdout.write(f'  ProjectImage ID: {img_id}')
+        if scan.missing:
+            self.stdout.write('\nMissing image files:')
+            for entry in scan.missing[:10]:  # Show first 10
+                self.stdout.write(f'  {entry.model} ID {entry.pk} ({entry.field}): {entry.name}')
+        if scan.orphans:
+            self.stdout.write('\nRun media_scan --delete-orphans to remove orphaned files')
 
     def generate_analytics_report(self, start_date, end_date):
         """Generate analytics overview"""
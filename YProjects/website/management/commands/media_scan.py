@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from website import media_scan
+
+
+class Command(BaseCommand):
+    help = 'Find media files referenced but missing on disk, and files on disk nothing references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-orphans',
+            action='store_true',
+            help='Remove the orphaned files found'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Threads walking MEDIA_ROOT'
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help='Seconds a file must be unmodified before it counts as orphaned'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Number of missing and orphaned entries to list (0 lists all)'
+        )
+
+    def handle(self, *args, **options):
+        result = media_scan.scan(workers=options['workers'], grace=options['grace'])
+        limit = options['limit'] or None
+        reclaimable = sum(orphan.size for orphan in result.orphans)
+
+        self.stdout.write(f'{result.referenced} referenced files, {result.files} files on disk')
+
+        self.stdout.write(f'\nMissing files: {len(result.missing)}')
+        for entry in result.missing[:limit]:
+            self.stdout.write(f'  {entry.model} {entry.pk} {entry.field}: {entry.name}')
+
+        self.stdout.write(f'\nOrphaned files: {len(result.orphans)} ({reclaimable / 1024 / 1024:.1f} MB)')
+        for orphan in result.orphans[:limit]:
+            self.stdout.write(f'  {orphan.name} ({orphan.size} bytes)')
+
+        if options['delete_orphans'] and result.orphans:
+            removed, freed = media_scan.delete_orphans(result)
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {removed} orphaned files, freed {freed / 1024 / 1024:.1f} MB'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Scan complete: {len(result.missing)} missing, {len(result.orphans)} orphaned, '
+                f'{reclaimable / 1024 / 1024:.1f} MB reclaimable'
+            ))
@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from website import images
+from website.models import Project, ProjectImage
+from website.utils import ProjectCache, bump_cache_version, CATALOG_VERSION, SITE_CONFIG_VERSION
+
+
+class Command(BaseCommand):
+    help = (
+        'Hash every project, gallery and banner image and write its resized copy '
+        'and srcset renditions, in parallel and resumably'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (1 processes images in this process)'
+        )
+        parser.add_argument(
+            '--manifest',
+            default=os.path.join(settings.BASE_DIR, 'optimize_images.manifest'),
+            help='Progress file used to resume an interrupted run'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore (and truncate) the progress file'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Also reprocess images that already have a recorded hash (with --restart for a full rerun)'
+        )
+
+    def handle(self, *args, **options):
+        manifest_path = options['manifest']
+        if options['restart'] and os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        done = self.load_manifest(manifest_path)
+
+        jobs, skipped = self.collect_jobs(done, options['force'])
+        self.stdout.write(f'{len(jobs)} images to process, {skipped} already optimized')
+        if not jobs:
+            return
+
+        totals = {'optimized': 0, 'missing': 0, 'failed': 0, 'original_bytes': 0, 'served_bytes': 0}
+        touched_projects = set()
+        started = time.monotonic()
+
+        with open(manifest_path, 'a') as manifest:
+            for result in self.run(jobs, options['workers']):
+                totals[result['status']] += 1
+                if result['status'] == 'failed':
+                    self.stderr.write(f"{result['model']} {result['pk']} ({result['name']}): {result['error']}")
+                if result['status'] != 'optimized':
+                    # Not recorded, so the next run retries it
+                    continue
+                totals['original_bytes'] += result['original_bytes']
+                totals['served_bytes'] += result['served_bytes']
+                touched_projects.update(self.record_hash(result))
+                manifest.write(json.dumps(result) + '\n')
+                manifest.flush()
+
+        if touched_projects:
+            # Moving updated_at retires the cached JSON and HTML fragments
+            Project.objects.filter(pk__in=touched_projects).update(updated_at=timezone.now())
+        ProjectCache.invalidate_project_cache()
+        bump_cache_version(CATALOG_VERSION)
+        bump_cache_version(SITE_CONFIG_VERSION)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        processed = totals['optimized'] + totals['missing'] + totals['failed']
+        saved = totals['original_bytes'] - totals['served_bytes']
+        self.stdout.write(
+            f"Missing files: {totals['missing']}, failed: {totals['failed']}"
+        )
+        self.stdout.write(
+            f"Throughput: {processed / elapsed:.1f} images/s, "
+            f"{totals['original_bytes'] / elapsed / 1024 / 1024:.1f} MB/s read"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Optimized {totals['optimized']} images in {elapsed:.1f}s; pages now serve "
+            f"{totals['served_bytes'] / 1024 / 1024:.1f} MB instead of "
+            f"{totals['original_bytes'] / 1024 / 1024:.1f} MB ({saved / 1024 / 1024:.1f} MB saved)"
+        ))
+
+    def load_manifest(self, path):
+        """(model, pk, name) of images finished by earlier runs"""
+        done = set()
+        if not os.path.exists(path):
+            return done
+        with open(path) as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write leaves a partial last line
+                    continue
+                done.add((entry['model'], entry['pk'], entry['name']))
+        return done
+
+    def collect_jobs(self, done, force):
+        jobs = []
+        skipped = 0
+        for label, field_name in images.IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            for pk, name, image_hash in model.objects.exclude(**{field_name: ''}).values_list('pk', field_name, 'image_hash'):
+                if (label, pk, name) in done or (image_hash and not force):
+                    skipped += 1
+                else:
+                    jobs.append((label, pk, name))
+        return jobs, skipped
+
+    def run(self, jobs, workers):
+        if workers <= 1:
+            for job in jobs:
+                yield images.optimize_stored(job)
+            return
+        # Forked workers must not share this process's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=images.init_worker) as executor:
+            yield from executor.map(images.optimize_stored, jobs, chunksize=max(1, min(32, len(jobs) // (workers * 4))))
+
+    def record_hash(self, result):
+        """Store the hash of a processed image; returns the project ids whose pages changed"""
+        model = apps.get_model(result['model'])
+        field_name = images.IMAGE_FIELDS[result['model']]
+        # Skip rows whose image was replaced while this run was going
+        rows = model.objects.filter(pk=result['pk'], **{field_name: result['name']})
+        if not rows.update(image_hash=result['hash']):
+            return ()
+        if model is Project:
+            return (result['pk'],)
+        if model is ProjectImage:
+            return rows.values_list('project_id', flat=True)
+        return ()
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from website import price_stats
+
+class Command(BaseCommand):
+    help = 'Recompute the price statistics cube used by /api/price-estimate/'
+
+    def handle(self, *args, **options):
+        count = price_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} price statistics cells'))
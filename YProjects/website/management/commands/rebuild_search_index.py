@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from website import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the project full-text search index'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(
+                self.style.WARNING('Full-text index is only used on SQLite; nothing to rebuild')
+            )
+            return
+        
+        count = search.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {count} projects for full-text search')
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from website import similarity
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed similar-projects table for the whole catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only compute lists for projects that have none yet'
+        )
+
+    def handle(self, *args, **options):
+        if options['missing']:
+            count = similarity.rebuild_missing()
+        else:
+            count = similarity.rebuild_all()
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored top-{similarity.top_k()} similar projects for {count} projects')
+        )
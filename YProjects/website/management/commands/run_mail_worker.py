@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand
+from django.core import mail
+from django.db import close_old_connections
+from website import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued site emails from the EmailOutbox, retrying failures with exponential backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send what is due now and exit instead of polling'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls when the outbox is empty'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Emails claimed per poll'
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        # Kept open across polls; outbox.send() reconnects when it has gone stale
+        connection = mail.get_connection(fail_silently=False)
+        try:
+            while True:
+                sent, failed = outbox.drain(options['batch_size'], connection)
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} emails, {failed} failed')
+                if sent + failed < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                # Long-running, like a request loop: drop broken or expired connections
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            outbox.close(connection)
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails ({total_failed} failed attempts)'))
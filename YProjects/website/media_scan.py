@@ -0,0 +1,169 @@
+"""
+Single-pass media integrity scan.
+
+Collects every file name referenced by a FileField/ImageField column of
+the website models (one values_list() query per model), walks MEDIA_ROOT
+once with os.scandir (one thread per top-level directory) and diffs the
+two sets:
+
+* missing: referenced by a row but not on disk
+* orphans: on disk but referenced by nothing
+
+Display copies and renditions (derived/, renditions/) count as referenced
+while some row still records the content hash they were made from. Files
+modified within the grace period are never reported as orphans, since
+their row may not have been committed yet.
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.db.models import FileField
+from . import images, renditions, storage
+
+MissingFile = namedtuple('MissingFile', 'model pk field name')
+OrphanFile = namedtuple('OrphanFile', 'name size')
+ScanResult = namedtuple('ScanResult', 'referenced files missing orphans')
+
+# Directories whose files are keyed by the content hash of an upload
+HASHED_DIRS = (images.DERIVED_DIR, renditions.RENDITION_DIR)
+
+
+def referenced_files():
+    """({name: [(model label, pk, field name), ...]}, {content hashes in use})"""
+    references = {}
+    digests = set()
+    for model in apps.get_app_config('website').get_models():
+        file_fields = [field for field in model._meta.concrete_fields if isinstance(field, FileField)]
+        hash_field = 'image_hash' if any(field.name == 'image_hash' for field in model._meta.fields) else None
+        if not file_fields:
+            continue
+        columns = ['pk'] + [field.attname for field in file_fields] + ([hash_field] if hash_field else [])
+        for row in model.objects.values_list(*columns):
+            pk = row[0]
+            for field, name in zip(file_fields, row[1:1 + len(file_fields)]):
+                if name:
+                    references.setdefault(name, []).append((model._meta.label, pk, field.name))
+                    digest = field.storage.digest(name) if isinstance(field.storage, storage.DedupStorage) else None
+                    if digest:
+                        digests.add(digest)
+            if hash_field and row[-1]:
+                digests.add(row[-1])
+    return references, digests
+
+
+def _walk(root, relative):
+    """(name, (size, mtime)) of every file below root/relative, names relative to root"""
+    found = []
+    pending = [relative]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{current}/{entry.name}' if current else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    found.append((name, (stat.st_size, stat.st_mtime)))
+    return found
+
+
+def files_on_disk(root, workers=8):
+    """{name: (size, mtime)} of everything under `root`, one thread per top-level directory"""
+    files = {}
+    if not os.path.isdir(root):
+        return files
+    subdirs = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files[entry.name] = (stat.st_size, stat.st_mtime)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for found in executor.map(lambda subdir: _walk(root, subdir), subdirs):
+            files.update(found)
+    return files
+
+
+def _hash_of_derived(name):
+    """Content hash a derived/ or renditions/ file was made from, else None"""
+    parts = name.split('/')
+    if len(parts) < 3 or parts[0] not in HASHED_DIRS:
+        return None
+    # derived/<d2>/<digest>-<w>x<h>.<ext>, renditions/<d2>/<digest>/<variant>.<ext>
+    return parts[2].split('-', 1)[0].split('.', 1)[0]
+
+
+def scan(root=None, workers=8, grace=3600):
+    root = str(root or settings.MEDIA_ROOT)
+    # Disk first: a file saved after the walk cannot look orphaned
+    files = files_on_disk(root, workers)
+    references, digests = referenced_files()
+    recent = time.time() - grace
+
+    missing = [
+        MissingFile(label, pk, field, name)
+        for name, rows in references.items() if name not in files
+        for label, pk, field in rows
+    ]
+    orphans = [
+        OrphanFile(name, size)
+        for name, (size, mtime) in sorted(files.items())
+        if name not in references
+        and mtime < recent
+        and _hash_of_derived(name) not in digests
+        # In-progress DedupStorage writes
+        and not (name.startswith(storage.BLOB_DIR + '/') and name.endswith('.upload'))
+    ]
+    return ScanResult(len(references), len(files), missing, orphans)
+
+
+def in_use(name):
+    """Whether any row references `name` now (directly, or by the hash a derived file was made from)"""
+    digest = _hash_of_derived(name)
+    for model in apps.get_app_config('website').get_models():
+        if digest:
+            if any(field.name == 'image_hash' for field in model._meta.fields) and \
+                    model.objects.filter(image_hash=digest).exists():
+                return True
+            continue
+        for field in model._meta.concrete_fields:
+            if isinstance(field, FileField) and model.objects.filter(**{field.attname: name}).exists():
+                return True
+    return False
+
+
+def delete_orphans(result, root=None):
+    """Remove the orphaned files of a scan; returns (files removed, bytes freed)
+
+    Each file's references are looked up again just before it goes, since
+    rows may have been saved since the scan. Blobs are removed through
+    DedupStorage, with their MediaBlob row locked so a concurrent upload of
+    the same content keeps its file.
+    """
+    root = str(root or settings.MEDIA_ROOT)
+    blob_storage = storage.DedupStorage(location=root)
+    removed = freed = 0
+    for orphan in result.orphans:
+        if orphan.name.startswith(storage.BLOB_DIR + '/'):
+            if not blob_storage.remove_if_unreferenced(orphan.name, in_use):
+                continue
+        else:
+            if in_use(orphan.name):
+                continue
+            try:
+                os.remove(os.path.join(root, orphan.name))
+            except FileNotFoundError:
+                continue
+        removed += 1
+        freed += orphan.size
+    return removed, freed
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:15
+
+from django.db import migrations, models
+from website.parsing import parse_area, parse_count, parse_price
+
+NUMERIC_FIELDS = ('price_inr', 'area_sqft_value', 'bedroom_count', 'bathroom_count')
+BATCH_SIZE = 500
+
+
+def backfill_numeric_fields(apps, schema_editor):
+    Project = apps.get_model('website', 'Project')
+
+    batch = []
+    projects = Project.objects.only('id', 'price', 'area_sqft', 'bedrooms', 'bathrooms').order_by('id')
+    for project in projects.iterator(chunk_size=BATCH_SIZE):
+        project.price_inr = parse_price(project.price)
+        project.area_sqft_value = parse_area(project.area_sqft)
+        project.bedroom_count = parse_count(project.bedrooms)
+        project.bathroom_count = parse_count(project.bathrooms)
+        batch.append(project)
+        if len(batch) >= BATCH_SIZE:
+            Project.objects.bulk_update(batch, NUMERIC_FIELDS)
+            batch = []
+    if batch:
+        Project.objects.bulk_update(batch, NUMERIC_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_newsletter_seosettings_aboutus_mission_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='area_sqft_value',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bathroom_count',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bedroom_count',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='price_inr',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_numeric_fields, migrations.RunPython.noop),
+    ]
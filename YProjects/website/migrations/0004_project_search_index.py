@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:40
+
+from django.db import migrations
+
+FTS_TABLE = 'website_project_fts'
+FTS_COLUMNS = 'title, location, project_type, amenities, description'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{FTS_COLUMNS}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {FTS_COLUMNS}) "
+        f"SELECT id, {FTS_COLUMNS} FROM website_project"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0003_project_numeric_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0004_project_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Amenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=120, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Amenities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectAmenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+                ('amenity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_amenities', to='website.amenity')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_amenities', to='website.project')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='amenity_tags',
+            field=models.ManyToManyField(blank=True, related_name='projects', through='website.ProjectAmenity', to='website.amenity'),
+        ),
+        migrations.AddIndex(
+            model_name='projectamenity',
+            index=models.Index(fields=['amenity', 'project'], name='amenity_project_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectamenity',
+            constraint=models.UniqueConstraint(fields=('project', 'amenity'), name='unique_project_amenity'),
+        ),
+    ]
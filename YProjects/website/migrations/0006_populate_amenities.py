@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:10
+
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def populate_amenities(apps, schema_editor):
+    Project = apps.get_model('website', 'Project')
+    Amenity = apps.get_model('website', 'Amenity')
+    ProjectAmenity = apps.get_model('website', 'ProjectAmenity')
+
+    amenity_ids = {}
+    links = []
+    for project_id, text in Project.objects.values_list('id', 'amenities').iterator():
+        seen = set()
+        for name in (text or '').split(','):
+            name = name.strip()
+            slug = slugify(name)
+            if not slug or slug in seen:
+                continue
+            seen.add(slug)
+            if slug not in amenity_ids:
+                amenity_ids[slug] = Amenity.objects.get_or_create(slug=slug, defaults={'name': name})[0].id
+            links.append(ProjectAmenity(project_id=project_id, amenity_id=amenity_ids[slug], order=len(seen) - 1))
+
+    ProjectAmenity.objects.bulk_create(links, batch_size=500, ignore_conflicts=True)
+
+
+def clear_amenities(apps, schema_editor):
+    apps.get_model('website', 'ProjectAmenity').objects.all().delete()
+    apps.get_model('website', 'Amenity').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0005_amenity'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_amenities, clear_amenities),
+    ]
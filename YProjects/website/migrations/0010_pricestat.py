@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_similarproject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('project_type', models.CharField(blank=True, max_length=100)),
+                ('bedrooms', models.PositiveSmallIntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.FloatField(default=0)),
+                ('price_min', models.BigIntegerField(null=True)),
+                ('price_max', models.BigIntegerField(null=True)),
+                ('area_count', models.PositiveIntegerField(default=0)),
+                ('area_sum', models.FloatField(default=0)),
+                ('area_sq_sum', models.FloatField(default=0)),
+                ('area_price_sum', models.FloatField(default=0)),
+                ('area_cross_sum', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pricestat',
+            constraint=models.UniqueConstraint(fields=('location', 'project_type', 'bedrooms'), name='unique_price_stat_cell'),
+        ),
+    ]
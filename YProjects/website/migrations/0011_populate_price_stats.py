@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:55
+
+from itertools import product
+from django.db import migrations
+
+SUM_FIELDS = ('count', 'price_sum', 'area_count', 'area_sum', 'area_sq_sum', 'area_price_sum', 'area_cross_sum')
+
+
+def populate_price_stats(apps, schema_editor):
+    # The numeric columns read here are filled for existing rows by 0003
+    Project = apps.get_model('website', 'Project')
+    PriceStat = apps.get_model('website', 'PriceStat')
+
+    cells = {}
+    rows = Project.objects.filter(price_inr__isnull=False).values_list(
+        'location', 'project_type', 'bedroom_count', 'price_inr', 'area_sqft_value'
+    )
+    for location, project_type, bedrooms, price, area in rows.iterator():
+        area = float(area) if area else None
+        contribution = (
+            1, float(price), 1 if area else 0, area or 0.0,
+            area * area if area else 0.0, float(price) if area else 0.0, area * price if area else 0.0,
+        )
+        keys = product(
+            {(location or '').split(',')[0].strip().lower(), ''},
+            {project_type or '', ''},
+            {bedrooms or 0, 0},
+        )
+        for key in keys:
+            stat = cells.get(key)
+            if stat is None:
+                stat = cells[key] = PriceStat(
+                    location=key[0], project_type=key[1], bedrooms=key[2], price_min=price, price_max=price
+                )
+            for field, value in zip(SUM_FIELDS, contribution):
+                setattr(stat, field, getattr(stat, field) + value)
+            stat.price_min = min(stat.price_min, price)
+            stat.price_max = max(stat.price_max, price)
+
+    PriceStat.objects.bulk_create(cells.values(), batch_size=500)
+
+
+def clear_price_stats(apps, schema_editor):
+    apps.get_model('website', 'PriceStat').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_pricestat'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_price_stats, clear_price_stats),
+    ]
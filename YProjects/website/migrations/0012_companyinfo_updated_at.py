@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_populate_price_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyinfo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
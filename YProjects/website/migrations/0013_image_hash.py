@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0012_companyinfo_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banner',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0017_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='similarproject',
+            index=models.Index(fields=['rank', 'score'], name='similar_rank_score_idx'),
+        ),
+    ]
@@ -1,11 +1,87 @@
+from django.conf import settings
 from django.db import models
 from django.core.validators import RegexValidator
 from django.urls import reverse
 from django.utils import timezone
-from PIL import Image
+from django.utils.text import slugify
 import os
+import uuid
+from .parsing import parse_price, parse_area, parse_count
+from . import images
 
-class Project(models.Model):
+class LoadedValuesMixin:
+    """Remember the column values an instance was loaded with or last saved.
+
+    Receivers of post_save/post_delete can compare against
+    get_loaded_values() to see what a save actually changed.
+    """
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def get_loaded_values(self):
+        """Column values as of the last load/save, or None for unsaved instances"""
+        return getattr(self, '_loaded_values', None)
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        fields = [
+            field for field in self._meta.concrete_fields
+            if update_fields is None or field.name in update_fields or field.attname in update_fields
+        ]
+        loaded = dict(self.get_loaded_values() or {})
+        loaded.update((field.attname, getattr(self, field.attname)) for field in fields)
+        self._loaded_values = loaded
+
+class ProcessedImageMixin:
+    """For models whose `image` is processed by website.images.
+
+    Replacing the upload forgets the old content hash in the same save, so
+    nothing rendered from the saved row points at the old image's derived
+    files.
+    """
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.image_hash and not self._state.adding and (
+            not self.image._committed or images.upload_changed(self, False, update_fields)
+        ):
+            self.image_hash = ''
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'image_hash'}
+        super().save(*args, **kwargs)
+
+def parse_amenities(text):
+    """Split a comma-separated amenities string into clean names"""
+    return [amenity.strip() for amenity in (text or '').split(',') if amenity.strip()]
+
+class ProjectQuerySet(models.QuerySet):
+    def with_amenities(self):
+        """Prefetch normalized amenities in one query for get_amenities_list()"""
+        return self.prefetch_related(
+            models.Prefetch(
+                'project_amenities',
+                queryset=ProjectAmenity.objects.select_related('amenity'),
+            )
+        )
+    
+    def with_all_amenities(self, names):
+        """Projects that have every amenity in `names` (matched by slug)"""
+        slugs = {slugify(name) for name in names} - {''}
+        if not slugs:
+            return self
+        matching = ProjectAmenity.objects.filter(
+            amenity__slug__in=slugs
+        ).values('project_id').annotate(
+            matched=models.Count('amenity_id')
+        ).filter(matched=len(slugs)).values('project_id')
+        return self.filter(id__in=matching)
+
+class Project(ProcessedImageMixin, LoadedValuesMixin, models.Model):
     PROPERTY_TYPES = [
         ('apartments', '2/3 BHK Apartments'),
         ('villas', 'Villas'),
@@ -27,6 +103,7 @@ class Project(models.Model):
     location = models.CharField(max_length=200)
     price = models.CharField(max_length=100)
     image = models.ImageField(upload_to='projects/')
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
     project_type = models.CharField(max_length=100, choices=PROPERTY_TYPES, default='apartments')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='upcoming')
     area_sqft = models.CharField(max_length=50, blank=True)
@@ -34,42 +111,183 @@ class Project(models.Model):
     bathrooms = models.CharField(max_length=20, blank=True)
     parking = models.CharField(max_length=20, blank=True)
     amenities = models.TextField(blank=True, help_text="Comma-separated list of amenities")
+    amenity_tags = models.ManyToManyField('Amenity', through='ProjectAmenity', related_name='projects', blank=True)
+    # Numeric shadows of the free-text fields above, kept in sync by save()
+    price_inr = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
+    area_sqft_value = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    bedroom_count = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, db_index=True)
+    bathroom_count = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, db_index=True)
     is_featured = models.BooleanField(default=False)
     meta_title = models.CharField(max_length=60, blank=True)
     meta_description = models.CharField(max_length=160, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProjectQuerySet.as_manager()
+    
+    # Free-text source field -> numeric shadow field
+    NUMERIC_FIELDS = {
+        'price': 'price_inr',
+        'area_sqft': 'area_sqft_value',
+        'bedrooms': 'bedroom_count',
+        'bathrooms': 'bathroom_count',
+    }
+    
     def save(self, *args, **kwargs):
         if not self.slug:
-            from django.utils.text import slugify
             self.slug = slugify(self.title)
         
+        self.update_numeric_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            for source, target in self.NUMERIC_FIELDS.items():
+                if source in update_fields:
+                    update_fields.add(target)
+            kwargs['update_fields'] = update_fields
+        
         super().save(*args, **kwargs)
         
-        # Resize image if too large
-        if self.image:
-            img = Image.open(self.image.path)
-            if img.height > 800 or img.width > 1200:
-                output_size = (1200, 800)
-                img.thumbnail(output_size)
-                img.save(self.image.path)
+        if update_fields is None or 'amenities' in update_fields:
+            self.sync_amenity_tags()
+    
+    @property
+    def display_image_url(self):
+        """Resized copy of the image once processed, else the original"""
+        return images.display_url(self)
     
     def get_absolute_url(self):
         return reverse('project_detail', kwargs={'project_id': self.pk})
     
     def get_amenities_list(self):
-        return [amenity.strip() for amenity in self.amenities.split(',') if amenity.strip()]
+        if 'project_amenities' in getattr(self, '_prefetched_objects_cache', {}):
+            return [link.amenity.name for link in self.project_amenities.all()]
+        return parse_amenities(self.amenities)
+    
+    def sync_amenity_tags(self):
+        """Mirror the comma-separated amenities text into Amenity links"""
+        wanted = {}
+        for name in parse_amenities(self.amenities):
+            wanted.setdefault(slugify(name), name)
+        wanted.pop('', None)
+        
+        amenities = {a.slug: a for a in Amenity.objects.filter(slug__in=wanted)}
+        missing = [Amenity(name=name, slug=slug) for slug, name in wanted.items() if slug not in amenities]
+        if missing:
+            Amenity.objects.bulk_create(missing, ignore_conflicts=True)
+            amenities = {a.slug: a for a in Amenity.objects.filter(slug__in=wanted)}
+        
+        desired = [(amenities[slug].id, order) for order, slug in enumerate(wanted)]
+        current = list(self.project_amenities.order_by('order').values_list('amenity_id', 'order'))
+        if current == desired:
+            return
+        
+        self.project_amenities.all().delete()
+        ProjectAmenity.objects.bulk_create([
+            ProjectAmenity(project=self, amenity_id=amenity_id, order=order)
+            for amenity_id, order in desired
+        ])
+        getattr(self, '_prefetched_objects_cache', {}).pop('project_amenities', None)
+    
+    def update_numeric_fields(self):
+        """Re-parse price, area, bedrooms and bathrooms into their numeric columns"""
+        self.price_inr = parse_price(self.price)
+        self.area_sqft_value = parse_area(self.area_sqft)
+        self.bedroom_count = parse_count(self.bedrooms)
+        self.bathroom_count = parse_count(self.bathrooms)
     
     def __str__(self):
         return self.title
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Sort key for keyset pagination (website.pagination)
+            models.Index(fields=['created_at', 'id'], name='project_created_at_id_idx'),
+            models.Index(fields=['is_featured', 'created_at'], name='project_featured_created_idx'),
+            models.Index(fields=['project_type', 'created_at'], name='project_type_created_idx'),
+            models.Index(fields=['status'], name='project_status_idx'),
+        ]
 
-class ProjectImage(models.Model):
+class Amenity(models.Model):
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=120, unique=True)
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = "Amenities"
+
+class ProjectAmenity(models.Model):
+    project = models.ForeignKey(Project, related_name='project_amenities', on_delete=models.CASCADE)
+    amenity = models.ForeignKey(Amenity, related_name='project_amenities', on_delete=models.CASCADE)
+    order = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['order']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'amenity'], name='unique_project_amenity'),
+        ]
+        indexes = [
+            # Serves the grouped amenity intersection in with_all_amenities()
+            models.Index(fields=['amenity', 'project'], name='amenity_project_idx'),
+        ]
+
+class SimilarProject(models.Model):
+    """Precomputed top-k neighbours of a project (see website.similarity)"""
+    project = models.ForeignKey(Project, related_name='similar_links', on_delete=models.CASCADE)
+    similar = models.ForeignKey(Project, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    def __str__(self):
+        return f"{self.project} ~ {self.similar} ({self.score:.2f})"
+    
+    class Meta:
+        ordering = ['rank']
+        constraints = [
+            # Also the index behind the (project_id, rank) lookup
+            models.UniqueConstraint(fields=['project', 'rank'], name='unique_similar_project_rank'),
+        ]
+        indexes = [
+            # Weakest entries of full lists, read by similarity.refresh_project()
+            models.Index(fields=['rank', 'score'], name='similar_rank_score_idx'),
+        ]
+
+class PriceStat(models.Model):
+    """Price statistics for one (locality, project type, bedrooms) cell (see website.price_stats)
+
+    Blank location/project_type and bedrooms=0 are wildcards, so coarser
+    cells such as "all villas" are stored alongside the specific ones.
+    """
+    location = models.CharField(max_length=200, blank=True)
+    project_type = models.CharField(max_length=100, blank=True)
+    bedrooms = models.PositiveSmallIntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+    price_sum = models.FloatField(default=0)
+    price_min = models.BigIntegerField(null=True)
+    price_max = models.BigIntegerField(null=True)
+    # Sufficient statistics for the price ~ area fit, over projects with a known area
+    area_count = models.PositiveIntegerField(default=0)
+    area_sum = models.FloatField(default=0)
+    area_sq_sum = models.FloatField(default=0)
+    area_price_sum = models.FloatField(default=0)
+    area_cross_sum = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.location or '*'} / {self.project_type or '*'} / {self.bedrooms or '*'} BHK"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'project_type', 'bedrooms'], name='unique_price_stat_cell'),
+        ]
+
+class ProjectImage(ProcessedImageMixin, LoadedValuesMixin, models.Model):
     project = models.ForeignKey(Project, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='projects/gallery/')
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -77,7 +295,34 @@ class ProjectImage(models.Model):
     class Meta:
         ordering = ['order']
 
-class Banner(models.Model):
+class MediaBlob(models.Model):
+    """One stored file of DedupStorage, shared by every upload with the same content"""
+    digest = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+class ChunkedUpload(models.Model):
+    """A file being uploaded in chunks through /api/uploads/"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    @property
+    def complete(self):
+        return self.received == self.size
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} bytes)"
+
+class Banner(ProcessedImageMixin, LoadedValuesMixin, models.Model):
     title = models.CharField(max_length=200, blank=True)
     subtitle = models.CharField(max_length=300, blank=True)
     image = models.ImageField(upload_to='banners/')
@@ -85,18 +330,13 @@ class Banner(models.Model):
     button_text = models.CharField(max_length=50, blank=True)
     is_active = models.BooleanField(default=True)
     order = models.IntegerField(default=0)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Resize banner image
-        if self.image:
-            img = Image.open(self.image.path)
-            if img.height > 600 or img.width > 1920:
-                output_size = (1920, 600)
-                img.thumbnail(output_size)
-                img.save(self.image.path)
+    @property
+    def display_image_url(self):
+        """Resized copy of the image once processed, else the original"""
+        return images.display_url(self)
     
     def __str__(self):
         return self.title or f"Banner {self.id}"
@@ -133,6 +373,10 @@ class Contact(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='contact_created_idx'),
+            models.Index(fields=['is_read', 'created_at'], name='contact_read_created_idx'),
+        ]
 
 class Newsletter(models.Model):
     email = models.EmailField(unique=True)
@@ -141,8 +385,41 @@ class Newsletter(models.Model):
     
     def __str__(self):
         return self.email
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['subscribed_at'], name='newsletter_subscribed_idx'),
+        ]
 
-class AboutUs(models.Model):
+class EmailOutbox(models.Model):
+    """An email waiting to be sent by the run_mail_worker command (see website.outbox)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name_plural = "Email outbox"
+        indexes = [
+            # The worker's due-message scan
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+class AboutUs(LoadedValuesMixin, models.Model):
     title = models.CharField(max_length=200, default="About Harsha Designers")
     subtitle = models.CharField(max_length=200, default="Best Designers in India")
     description = models.TextField()
@@ -162,7 +439,7 @@ class AboutUs(models.Model):
         verbose_name = "About Us"
         verbose_name_plural = "About Us"
 
-class CompanyInfo(models.Model):
+class CompanyInfo(LoadedValuesMixin, models.Model):
     company_name = models.CharField(max_length=200, default="Harsha Designers")
     tagline = models.CharField(max_length=200, blank=True)
     email = models.EmailField(default="info.harshadesigners@mail.com")
@@ -179,6 +456,7 @@ class CompanyInfo(models.Model):
     logo = models.ImageField(upload_to='company/', blank=True)
     google_maps_embed = models.TextField(blank=True)
     whatsapp_number = models.CharField(max_length=20, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.company_name
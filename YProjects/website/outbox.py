@@ -0,0 +1,159 @@
+"""
+Durable outbox for site emails.
+
+Receivers never talk to the mail server. enqueue() inserts an EmailOutbox
+row (in the same transaction as the Contact or Newsletter that caused it)
+holding only the kind of email and the ids needed to build it; the
+run_mail_worker command renders and sends due rows. A row whose send
+fails is retried with exponential backoff, up to MAIL_OUTBOX_MAX_ATTEMPTS
+attempts.
+
+Claiming a row pushes its next_attempt_at past MAIL_OUTBOX_LEASE, so
+several workers can drain the outbox at once and a row claimed by a
+worker that died becomes due again on its own.
+
+Every message of a drain goes through one open SMTP connection, which the
+worker keeps across drains; a connection the server dropped (or one left
+in an unknown state by a failed send) is closed and opened again.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+from django.conf import settings
+from django.core import mail
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F
+from django.utils import timezone
+from .models import EmailOutbox
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+# kind -> function(**payload) returning the EmailMessage to send
+BUILDERS = {
+    'contact_notification': utils.contact_notification_email,
+    'contact_auto_reply': utils.contact_auto_reply_email,
+    'newsletter_welcome': utils.newsletter_welcome_email,
+}
+
+
+def max_attempts():
+    return getattr(settings, 'MAIL_OUTBOX_MAX_ATTEMPTS', 6)
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failed attempt"""
+    base = getattr(settings, 'MAIL_OUTBOX_RETRY_DELAY', 60)
+    return min(base * 2 ** (attempts - 1), getattr(settings, 'MAIL_OUTBOX_MAX_RETRY_DELAY', 6 * 60 * 60))
+
+
+def lease():
+    return timedelta(seconds=getattr(settings, 'MAIL_OUTBOX_LEASE', 5 * 60))
+
+
+def enqueue(kind, **payload):
+    if kind not in BUILDERS:
+        raise ValueError(f'Unknown email kind: {kind}')
+    return EmailOutbox.objects.create(kind=kind, payload=payload)
+
+
+def claim(limit):
+    """Due rows this worker now owns, oldest first"""
+    now = timezone.now()
+    due = list(
+        EmailOutbox.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk')
+        .values_list('pk', 'next_attempt_at')[:limit]
+    )
+    claimed = []
+    for pk, next_attempt_at in due:
+        # Lost to another worker if next_attempt_at moved in between
+        if EmailOutbox.objects.filter(pk=pk, status='pending', next_attempt_at=next_attempt_at).update(
+            next_attempt_at=now + lease(), attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+    return list(EmailOutbox.objects.filter(pk__in=claimed).order_by('created_at', 'pk'))
+
+
+def mark_sent(entry):
+    EmailOutbox.objects.filter(pk=entry.pk).update(status='sent', sent_at=timezone.now(), last_error='')
+
+
+def mark_failed(entry, error, permanent=False):
+    if permanent or entry.attempts >= max_attempts():
+        EmailOutbox.objects.filter(pk=entry.pk).update(status='failed', last_error=error)
+        logger.error(f'Giving up on {entry}: {error}')
+    else:
+        delay = retry_delay(entry.attempts)
+        EmailOutbox.objects.filter(pk=entry.pk).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=delay), last_error=error,
+        )
+        logger.warning(f'{entry} failed (attempt {entry.attempts}), retrying in {delay}s: {error}')
+
+
+def close(connection):
+    try:
+        connection.close()
+    except Exception:
+        # Closing a broken connection may fail; it's dropped either way
+        pass
+
+
+def send(message, connection):
+    """One SMTP transaction on `connection`, reconnecting once if the server had dropped it"""
+    try:
+        # Opened here so send_messages() leaves it open for the next message
+        connection.open()
+        utils.send_emails([message], connection)
+    except OSError as e:
+        # A kept-alive socket the server closed shows up as a disconnect, reset
+        # or broken pipe; SMTP replies (also OSErrors) are real failures
+        if isinstance(e, smtplib.SMTPException) and not isinstance(e, smtplib.SMTPServerDisconnected):
+            raise
+        close(connection)
+        connection.open()
+        utils.send_emails([message], connection)
+
+
+def deliver(entry, connection):
+    """Build and send one claimed row; returns True once it is sent"""
+    if entry.kind not in BUILDERS:
+        mark_failed(entry, f'Unknown email kind: {entry.kind}', permanent=True)
+        return False
+    try:
+        send(BUILDERS[entry.kind](**entry.payload), connection)
+    except ObjectDoesNotExist as e:
+        # The contact was deleted before its email went out
+        mark_failed(entry, f'{type(e).__name__}: {e}', permanent=True)
+        return False
+    except Exception as e:
+        close(connection)
+        mark_failed(entry, f'{type(e).__name__}: {e}')
+        return False
+    mark_sent(entry)
+    return True
+
+
+def drain(limit=100, connection=None):
+    """Send up to `limit` due emails; returns (sent, failed)
+
+    A `connection` passed in is left open for the caller's next drain;
+    otherwise one is opened for this batch only.
+    """
+    entries = claim(limit)
+    if not entries:
+        return 0, 0
+    own_connection = connection is None
+    if own_connection:
+        connection = mail.get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        for entry in entries:
+            if deliver(entry, connection):
+                sent += 1
+            else:
+                failed += 1
+    finally:
+        if own_connection:
+            close(connection)
+    return sent, failed
@@ -0,0 +1,74 @@
+"""
+Full-page cache for public pages, invalidated by content version.
+
+`versioned_cache_page` works like Django's `cache_page` (same URL/Vary
+based keys) but folds the catalog and site_config cache versions into the
+key prefix. The model signals bump those versions when a Project,
+ProjectImage, Banner, AboutUs or CompanyInfo changes, so pages can be
+cached with a long timeout and still change as soon as an admin saves.
+"""
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_cache_key, learn_cache_key
+from .utils import get_cache_version, CATALOG_VERSION, SITE_CONFIG_VERSION
+
+PAGE_CACHE_PREFIX = 'page'
+
+
+def page_cache_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def page_key_prefix():
+    """Key prefix for the current content generation"""
+    return '{}.{}.{}'.format(
+        PAGE_CACHE_PREFIX,
+        get_cache_version(CATALOG_VERSION),
+        get_cache_version(SITE_CONFIG_VERSION),
+    )
+
+
+def _cacheable(response):
+    # Same rules as UpdateCacheMiddleware: never share responses that set
+    # cookies or ask not to be stored
+    cache_control = response.get('Cache-Control', '')
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in cache_control
+        and 'no-store' not in cache_control
+    )
+
+
+def versioned_cache_page(view_func):
+    """Cache a GET/HEAD view's response until the content version changes"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+
+        key_prefix = page_key_prefix()
+        cache_key = get_cache_key(request, key_prefix, 'GET', cache=cache)
+        if cache_key is not None:
+            response = cache.get(cache_key)
+            if response is not None:
+                return response
+
+        response = view_func(request, *args, **kwargs)
+        if not _cacheable(response):
+            return response
+
+        timeout = page_cache_timeout()
+
+        def store(response):
+            cache_key = learn_cache_key(request, response, timeout, key_prefix, cache=cache)
+            cache.set(cache_key, response, timeout)
+
+        if hasattr(response, 'render') and callable(response.render):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+    return wrapper
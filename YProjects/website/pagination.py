@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination for project list APIs.
+
+Pages are ordered by (created_at, id) and the cursor encodes the sort key
+of the last row served, so fetching any page is an index range scan of
+per_page + 1 rows. No COUNT(*) or OFFSET is needed.
+"""
+import base64
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+MAX_PER_PAGE = 50
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_per_page(value, default=10, maximum=MAX_PER_PAGE):
+    """Parse a per_page parameter and keep it within 1..maximum"""
+    try:
+        per_page = int(value)
+    except (TypeError, ValueError):
+        per_page = default
+    return max(1, min(per_page, maximum))
+
+
+def wants_cursor(request):
+    """Cursor mode is opt-in via ?pagination=cursor or by passing a cursor"""
+    return 'cursor' in request.GET or request.GET.get('pagination') == 'cursor'
+
+
+def encode_cursor(created_at, pk):
+    payload = json.dumps([created_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError
+        return created_at, int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def paginate_by_cursor(queryset, cursor=None, per_page=10, descending=True):
+    """Return (items, pagination_info) for the page after `cursor`"""
+    if descending:
+        queryset = queryset.order_by('-created_at', '-id')
+    else:
+        queryset = queryset.order_by('created_at', 'id')
+
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # Written as a range on created_at plus a tie-break so the
+        # (created_at, id) index can serve it
+        if descending:
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+            )
+        else:
+            queryset = queryset.filter(
+                Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+            )
+
+    items = list(queryset[:per_page + 1])
+    has_next = len(items) > per_page
+    items = items[:per_page]
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].pk) if has_next else None
+
+    return items, {
+        'mode': 'cursor',
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,89 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+# Multipliers for the Indian price units used in listings ("₹45 Lakhs", "1.2 Cr")
+PRICE_UNITS = {
+    'crore': 10000000,
+    'crores': 10000000,
+    'cr': 10000000,
+    'lakh': 100000,
+    'lakhs': 100000,
+    'lac': 100000,
+    'lacs': 100000,
+    'l': 100000,
+    'thousand': 1000,
+    'k': 1000,
+}
+
+# Conversion factors from common land/floor area units to square feet
+AREA_UNITS = {
+    'acre': 43560,
+    'acres': 43560,
+    'sq m': Decimal('10.7639'),
+    'sqm': Decimal('10.7639'),
+    'sq mt': Decimal('10.7639'),
+    'sq yd': 9,
+    'sq yds': 9,
+    'sqyd': 9,
+}
+
+NUMBER_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)')
+PRICE_RE = re.compile(
+    r'(\d[\d,]*(?:\.\d+)?)\*?\s*(crores?|cr|lakhs?|lacs?|lac|l|thousand|k)?\b',
+    re.IGNORECASE,
+)
+
+
+def _to_decimal(text):
+    try:
+        return Decimal(text.replace(',', ''))
+    except InvalidOperation:
+        return None
+
+
+def parse_price(value):
+    """Parse a free-text price such as "₹45 Lakhs" into whole rupees.
+
+    Ranges ("₹45 - 60 Lakhs") resolve to their lower bound, using the unit
+    of the first number that carries one. Returns None when no number is found.
+    """
+    if not value:
+        return None
+    matches = PRICE_RE.findall(str(value))
+    if not matches:
+        return None
+    amount = _to_decimal(matches[0][0])
+    if amount is None:
+        return None
+    unit = matches[0][1] or next((u for _, u in matches if u), '')
+    multiplier = PRICE_UNITS.get(unit.lower(), 1)
+    return int(amount * multiplier)
+
+
+def parse_area(value):
+    """Parse a free-text area such as "1200 sq ft" into whole square feet"""
+    if not value:
+        return None
+    text = str(value).lower()
+    match = NUMBER_RE.search(text)
+    if not match:
+        return None
+    amount = _to_decimal(match.group(1))
+    if amount is None:
+        return None
+    for unit, factor in AREA_UNITS.items():
+        if unit in text:
+            amount *= factor
+            break
+    return int(amount)
+
+
+def parse_count(value):
+    """Parse a count such as "3 BHK" or "2/3 BHK" into its lowest integer"""
+    if not value:
+        return None
+    match = NUMBER_RE.search(str(value))
+    if not match:
+        return None
+    amount = _to_decimal(match.group(1))
+    return int(amount) if amount is not None else None
@@ -0,0 +1,288 @@
+"""
+Price statistics cube for /api/price-estimate/.
+
+PriceStat holds count, sum, min and max of price_inr plus the sufficient
+statistics of a price ~ area least-squares fit for every (locality,
+project type, bedrooms) cell and for each coarser cell obtained by
+wildcarding any of the three keys. The table is maintained incrementally
+from the Project post_save/post_delete receivers.
+
+Estimates are answered from an in-process snapshot of the table (rebuilt
+when the catalog cache version changes); the regression coefficients for
+every cell are solved at once with NumPy when the snapshot is loaded, so a
+request is one dict lookup per fallback step.
+"""
+import threading
+from itertools import product
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from .models import Project, PriceStat
+from .parsing import parse_count
+from .similarity import locality
+from .utils import get_cache_version, CATALOG_VERSION
+
+ANY_LOCATION = ''
+ANY_TYPE = ''
+ANY_BEDROOMS = 0
+
+# Project columns that feed the cube
+STAT_FIELDS = ('location', 'project_type', 'bedroom_count', 'price_inr', 'area_sqft_value')
+
+SUM_FIELDS = ('count', 'price_sum', 'area_count', 'area_sum', 'area_sq_sum', 'area_price_sum', 'area_cross_sum')
+
+
+def min_samples():
+    return getattr(settings, 'PRICE_ESTIMATE_MIN_SAMPLES', 3)
+
+
+def cell_keys(location, project_type, bedrooms):
+    """Every cell a project with these attributes counts towards"""
+    return set(product(
+        {locality(location), ANY_LOCATION},
+        {project_type or ANY_TYPE, ANY_TYPE},
+        {bedrooms or ANY_BEDROOMS, ANY_BEDROOMS},
+    ))
+
+
+def fallback_keys(location, project_type, bedrooms):
+    """Cells to try for a request, most specific first"""
+    location = locality(location)
+    project_type = project_type or ANY_TYPE
+    bedrooms = bedrooms or ANY_BEDROOMS
+    keys = []
+    for key in [
+        (location, project_type, bedrooms),
+        (location, project_type, ANY_BEDROOMS),
+        (ANY_LOCATION, project_type, bedrooms),
+        (ANY_LOCATION, project_type, ANY_BEDROOMS),
+        (ANY_LOCATION, ANY_TYPE, bedrooms),
+        (ANY_LOCATION, ANY_TYPE, ANY_BEDROOMS),
+    ]:
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def _contribution(price, area):
+    area = float(area) if area else None
+    return {
+        'count': 1,
+        'price_sum': float(price),
+        'area_count': 1 if area else 0,
+        'area_sum': area or 0.0,
+        'area_sq_sum': area * area if area else 0.0,
+        'area_price_sum': float(price) if area else 0.0,
+        'area_cross_sum': area * price if area else 0.0,
+    }
+
+
+def _cell_filter(key):
+    location, project_type, bedrooms = key
+    queryset = Project.objects.filter(price_inr__isnull=False)
+    if project_type:
+        queryset = queryset.filter(project_type=project_type)
+    if bedrooms:
+        queryset = queryset.filter(bedroom_count=bedrooms)
+    return queryset, location
+
+
+def _recompute_extremes(stat):
+    """Reload min/max of a cell after its current extreme was removed"""
+    queryset, location = _cell_filter((stat.location, stat.project_type, stat.bedrooms))
+    prices = [
+        price for row_location, price in queryset.values_list('location', 'price_inr')
+        if not location or locality(row_location) == location
+    ]
+    stat.price_min = min(prices) if prices else None
+    stat.price_max = max(prices) if prices else None
+
+
+def _apply(values, delta):
+    """Add (delta=1) or remove (delta=-1) one project from every cell it belongs to"""
+    price = values['price_inr']
+    if price is None:
+        return
+    keys = cell_keys(values['location'], values['project_type'], values['bedroom_count'])
+    contribution = _contribution(price, values['area_sqft_value'])
+
+    with transaction.atomic():
+        existing = {
+            (stat.location, stat.project_type, stat.bedrooms): stat
+            for stat in PriceStat.objects.select_for_update().filter(
+                location__in={key[0] for key in keys},
+                project_type__in={key[1] for key in keys},
+                bedrooms__in={key[2] for key in keys},
+            )
+            if (stat.location, stat.project_type, stat.bedrooms) in keys
+        }
+
+        created, updated, emptied = [], [], []
+        for key in keys:
+            stat = existing.get(key)
+            if stat is None:
+                if delta < 0:
+                    continue
+                stat = PriceStat(location=key[0], project_type=key[1], bedrooms=key[2])
+                created.append(stat)
+            else:
+                updated.append(stat)
+
+            for field in SUM_FIELDS:
+                setattr(stat, field, getattr(stat, field) + delta * contribution[field])
+
+            if stat.count <= 0:
+                emptied.append(stat.pk)
+            elif delta > 0:
+                stat.price_min = price if stat.price_min is None else min(stat.price_min, price)
+                stat.price_max = price if stat.price_max is None else max(stat.price_max, price)
+            elif price in (stat.price_min, stat.price_max):
+                _recompute_extremes(stat)
+
+        if emptied:
+            PriceStat.objects.filter(pk__in=emptied).delete()
+            updated = [stat for stat in updated if stat.pk not in emptied]
+        PriceStat.objects.bulk_create(created)
+        PriceStat.objects.bulk_update(updated, SUM_FIELDS + ('price_min', 'price_max'))
+
+
+def project_changed(old_values, new_values):
+    """Move one project between cells; None old/new values mean create/delete.
+
+    When the old values of an update are unknown the cube is rebuilt.
+    """
+    if old_values is not None and not all(field in old_values for field in STAT_FIELDS):
+        rebuild()
+        return
+    if old_values is not None and new_values is not None and all(
+        old_values[field] == new_values[field] for field in STAT_FIELDS
+    ):
+        return
+    if old_values is not None:
+        _apply(old_values, -1)
+    if new_values is not None:
+        _apply(new_values, 1)
+
+
+def stat_values(project):
+    return {field: getattr(project, field) for field in STAT_FIELDS}
+
+
+def rebuild():
+    """Recompute every cell from the catalog"""
+    cells = {}
+    rows = Project.objects.filter(price_inr__isnull=False).values_list(*STAT_FIELDS)
+    for location, project_type, bedrooms, price, area in rows.iterator():
+        contribution = _contribution(price, area)
+        for key in cell_keys(location, project_type, bedrooms):
+            stat = cells.get(key)
+            if stat is None:
+                stat = cells[key] = PriceStat(
+                    location=key[0], project_type=key[1], bedrooms=key[2], price_min=price, price_max=price
+                )
+            for field in SUM_FIELDS:
+                setattr(stat, field, getattr(stat, field) + contribution[field])
+            stat.price_min = min(stat.price_min, price)
+            stat.price_max = max(stat.price_max, price)
+
+    with transaction.atomic():
+        PriceStat.objects.all().delete()
+        PriceStat.objects.bulk_create(cells.values(), batch_size=500)
+    return len(cells)
+
+
+class PriceCube:
+    """Immutable in-memory snapshot of the PriceStat table with fitted coefficients"""
+
+    def __init__(self, rows):
+        self.keys = [(row[0], row[1], row[2]) for row in rows]
+        self.index = {key: position for position, key in enumerate(self.keys)}
+        columns = np.array([row[3:] for row in rows], dtype=float).reshape(len(rows), 9)
+        (self.count, price_sum, self.price_min, self.price_max,
+         n, sx, sxx, sy, sxy) = columns.T
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.mean = price_sum / self.count
+            self.price_per_sqft = np.where(sx > 0, sy / sx, np.nan)
+            # Closed-form least squares of price = intercept + slope * area per cell
+            denominator = n * sxx - sx * sx
+            fit = (n >= min_samples()) & (denominator > 0)
+            self.slope = np.where(fit, (n * sxy - sx * sy) / denominator, np.nan)
+            self.intercept = np.where(fit, (sy - self.slope * sx) / n, np.nan)
+
+    @classmethod
+    def load(cls):
+        return cls(list(PriceStat.objects.values_list(
+            'location', 'project_type', 'bedrooms', 'count', 'price_sum', 'price_min', 'price_max',
+            'area_count', 'area_sum', 'area_sq_sum', 'area_price_sum', 'area_cross_sum',
+        )))
+
+    def find(self, keys):
+        """Position of the first cell with enough samples, else the broadest one found"""
+        found = None
+        for key in keys:
+            position = self.index.get(key)
+            if position is None:
+                continue
+            found = position
+            if self.count[position] >= min_samples():
+                break
+        return found
+
+    def estimate(self, keys, area=None):
+        position = self.find(keys)
+        if position is None:
+            return None
+
+        location, project_type, bedrooms = self.keys[position]
+        result = {
+            'avg_price': float(self.mean[position]),
+            'min_price': int(self.price_min[position]),
+            'max_price': int(self.price_max[position]),
+            'count': int(self.count[position]),
+            'matched': {
+                'location': location or None,
+                'project_type': project_type or None,
+                'bedrooms': bedrooms or None,
+            },
+        }
+
+        price_per_sqft = self.price_per_sqft[position]
+        if not np.isnan(price_per_sqft):
+            result['price_per_sqft'] = float(price_per_sqft)
+        if area:
+            slope = self.slope[position]
+            if not np.isnan(slope) and slope > 0:
+                result['estimated_price'] = float(self.intercept[position] + slope * area)
+                result['method'] = 'regression'
+            elif not np.isnan(price_per_sqft):
+                result['estimated_price'] = float(price_per_sqft * area)
+                result['method'] = 'price_per_sqft'
+            if result.get('estimated_price') is not None and result['estimated_price'] <= 0:
+                del result['estimated_price'], result['method']
+        return result
+
+
+_cube = None
+_cube_version = None
+_cube_lock = threading.Lock()
+
+
+def get_cube():
+    """Return the current snapshot, reloading it if the catalog has changed"""
+    global _cube, _cube_version
+
+    version = get_cache_version(CATALOG_VERSION)
+    if _cube is not None and _cube_version == version:
+        return _cube
+
+    with _cube_lock:
+        if _cube is None or _cube_version != version:
+            _cube = PriceCube.load()
+            _cube_version = version
+    return _cube
+
+
+def estimate(location=None, project_type=None, bedrooms=None, area=None):
+    """Price estimate for the given criteria, or None if the catalog has no prices"""
+    return get_cube().estimate(fallback_keys(location, project_type, parse_count(bedrooms)), area)
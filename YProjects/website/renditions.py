@@ -0,0 +1,107 @@
+"""
+Width-bounded image renditions for srcset.
+
+Every processed upload gets thumb, card, hero and wide renditions in WebP
+and JPEG (never scaled up), stored under the SHA-256 of the original's content::
+
+    renditions/<d[:2]>/<digest>/<variant>.<ext>
+
+so identical uploads share one set of files and a URL never changes
+meaning. website.images.process() writes the set when an upload is
+processed. Until an instance has an `image_hash`, its rendition URLs point
+at the `image_rendition` view, which generates the requested file on the
+first request and redirects to it.
+"""
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from PIL import Image
+
+# (variant, max width), smallest first
+RENDITIONS = (
+    ('thumb', 160),
+    ('card', 480),
+    ('hero', 1200),
+    ('wide', 1920),
+)
+WIDTHS = dict(RENDITIONS)
+
+# URL format -> (PIL format, file extension)
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+RENDITION_DIR = 'renditions'
+
+# Models whose images the image_rendition view may render
+RENDITION_MODELS = ('project', 'banner', 'projectimage')
+
+
+def rendition_name(digest, variant, fmt):
+    return f'{RENDITION_DIR}/{digest[:2]}/{digest}/{variant}.{FORMATS[fmt][1]}'
+
+
+def encode(img, width, fmt):
+    """Bytes of `img` scaled down to at most `width` pixels wide"""
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS)
+    if fmt == 'jpeg' and img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert('RGBA')
+    output = BytesIO()
+    img.save(output, format=FORMATS[fmt][0], quality=80, optimize=True)
+    return output.getvalue()
+
+
+def generate(field_file, digest, variants=None, formats=None):
+    """Write the missing renditions of `field_file`; returns how many were written"""
+    storage = field_file.storage
+    wanted = [
+        (variant, fmt)
+        for variant, _ in RENDITIONS if variants is None or variant in variants
+        for fmt in FORMATS if formats is None or fmt in formats
+    ]
+    missing = [(variant, fmt) for variant, fmt in wanted if not storage.exists(rendition_name(digest, variant, fmt))]
+    if not missing:
+        return 0
+
+    with field_file.storage.open(field_file.name, 'rb') as handle:
+        img = Image.open(handle)
+        img.load()
+    for variant, fmt in missing:
+        storage.save(rendition_name(digest, variant, fmt), ContentFile(encode(img, WIDTHS[variant], fmt)))
+    return len(missing)
+
+
+def rendition_url(model_name, pk, image_name, digest, variant, fmt='jpeg', storage=None):
+    """URL of one rendition, from raw column values"""
+    if not image_name:
+        return None
+    if digest and storage is not None:
+        return storage.url(rendition_name(digest, variant, fmt))
+    return reverse('image_rendition', args=(model_name, pk, variant, fmt))
+
+
+def url(instance, variant, fmt='jpeg'):
+    return rendition_url(
+        instance._meta.model_name, instance.pk, instance.image.name, instance.image_hash,
+        variant, fmt, instance.image.storage,
+    )
+
+
+def srcset(instance, fmt='jpeg'):
+    """`srcset` attribute value covering every rendition width"""
+    if not instance.image:
+        return ''
+    return ', '.join(f'{url(instance, variant, fmt)} {width}w' for variant, width in RENDITIONS)
+
+
+def rendition_set(instance):
+    """API representation: per-variant URLs plus ready-made srcset strings"""
+    if not instance.image:
+        return None
+    data = {variant: {fmt: url(instance, variant, fmt) for fmt in FORMATS} for variant, _ in RENDITIONS}
+    data['srcset'] = {fmt: srcset(instance, fmt) for fmt in FORMATS}
+    return data
@@ -0,0 +1,113 @@
+"""
+Full-text search over projects.
+
+On SQLite the project text fields are mirrored into an FTS5 virtual table
+(created by migration 0004) and queries are ranked with BM25. Other database
+backends fall back to the previous icontains filters.
+"""
+import re
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from .models import Project
+
+FTS_TABLE = 'website_project_fts'
+
+# Indexed columns and their BM25 weights, in FTS table column order
+FTS_COLUMNS = ('title', 'location', 'project_type', 'amenities', 'description')
+COLUMN_WEIGHTS = (10.0, 5.0, 3.0, 2.0, 1.0)
+
+RANK_SQL = 'bm25({table}, {weights})'.format(
+    table=FTS_TABLE,
+    weights=', '.join(str(weight) for weight in COLUMN_WEIGHTS),
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    """FTS5 ships with the SQLite builds Django supports"""
+    return connection.vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """Turn user input into an FTS5 query: every word must match as a prefix"""
+    tokens = TOKEN_RE.findall(query.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_projects(queryset, query, rank=True):
+    """Restrict a Project queryset to rows matching `query`.
+
+    With rank=True the result is ordered by BM25 relevance (best first) and
+    each row gets a `search_rank` attribute; callers that apply their own
+    order_by() afterwards keep the filter but drop the ranking.
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    if not is_available():
+        condition = Q()
+        for column in FTS_COLUMNS:
+            condition |= Q(**{f'{column}__icontains': query})
+        return queryset.filter(condition)
+
+    expression = build_match_expression(query)
+    if not expression:
+        return queryset.none()
+
+    queryset = queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression])
+    )
+    if not rank:
+        return queryset
+
+    # bm25() needs the MATCH in its own query; the rowid lookup keeps it to one row
+    project_table = Project._meta.db_table
+    search_rank = RawSQL(
+        f'SELECT {RANK_SQL} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {project_table}.id',
+        [expression],
+        output_field=FloatField(),
+    )
+    return queryset.annotate(search_rank=search_rank).order_by('search_rank')
+
+
+def index_project(project):
+    """Insert or refresh a project's row in the search index"""
+    if not is_available():
+        return
+
+    values = [getattr(project, column) or '' for column in FTS_COLUMNS]
+    placeholders = ', '.join(['%s'] * len(FTS_COLUMNS))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [project.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES (%s, {placeholders})',
+            [project.pk, *values],
+        )
+
+
+def remove_project(project_id):
+    """Drop a project from the search index"""
+    if not is_available():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [project_id])
+
+
+def rebuild_index():
+    """Repopulate the whole search index from the projects table"""
+    if not is_available():
+        return 0
+
+    project_table = Project._meta.db_table
+    columns = ', '.join(FTS_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, {columns}) SELECT id, {columns} FROM {project_table}'
+        )
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
@@ -0,0 +1,170 @@
+"""
+Pre-encoded JSON fragments for projects.
+
+Each project is encoded once per version, as UTF-8 JSON bytes, in two
+variants:
+
+* ``full``: the /api/projects/ item (also the base of the detail payload)
+* ``card``: the compact listing item used by search, featured and
+  similar-project results
+
+Fragments are cached under keys that include the project's `updated_at`,
+so a save produces new keys and stale fragments simply age out. They are
+encoded ahead of time from the post_save receiver. List endpoints fetch
+the (id, updated_at) pairs of a page, read the fragments with one
+get_many() and splice them into the response with `dumps()` instead of
+rebuilding and re-encoding a dict per project.
+"""
+import json
+import uuid
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from .models import Project
+from . import renditions
+
+FULL = 'full'
+CARD = 'card'
+VARIANTS = (FULL, CARD)
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24 * 7
+
+# Columns needed to look fragments up for a page of results
+KEY_FIELDS = ('id', 'updated_at', 'created_at')
+
+
+def project_full(project):
+    return {
+        'id': project.id,
+        'title': project.title,
+        'description': project.description,
+        'location': project.location,
+        'price': project.price,
+        'project_type': project.project_type,
+        'area_sqft': project.area_sqft,
+        'bedrooms': project.bedrooms,
+        'bathrooms': project.bathrooms,
+        'parking': project.parking,
+        'amenities': project.get_amenities_list(),
+        'is_featured': project.is_featured,
+        'status': project.status,
+        'image_url': project.display_image_url,
+        'image_renditions': renditions.rendition_set(project),
+        'created_at': project.created_at.isoformat(),
+    }
+
+
+def project_card(project):
+    description = project.description
+    return {
+        'id': project.id,
+        'title': project.title,
+        'description': description[:200] + '...' if len(description) > 200 else description,
+        'location': project.location,
+        'price': project.price,
+        'project_type': project.project_type,
+        'bedrooms': project.bedrooms,
+        'bathrooms': project.bathrooms,
+        'area_sqft': project.area_sqft,
+        'amenities': project.get_amenities_list()[:5],
+        'image_url': project.display_image_url,
+        'image_renditions': renditions.rendition_set(project),
+        'is_featured': project.is_featured,
+        'status': project.status,
+    }
+
+
+BUILDERS = {FULL: project_full, CARD: project_card}
+
+
+def encode(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def fragment_key(variant, project_id, updated_at):
+    return f'project_json:{variant}:{project_id}:{updated_at.timestamp()}'
+
+
+def encode_project(project, variant):
+    return encode(BUILDERS[variant](project))
+
+
+def warm(project):
+    """Encode and cache every variant of a freshly saved project"""
+    cache.set_many(
+        {
+            fragment_key(variant, project.id, project.updated_at): encode_project(project, variant)
+            for variant in VARIANTS
+        },
+        FRAGMENT_TIMEOUT,
+    )
+
+
+def fragments(projects, variant):
+    """Encoded fragments for `projects`, in order.
+
+    `projects` only need `id` and `updated_at` loaded; projects whose
+    fragment is not cached are loaded in one query, encoded and stored.
+    """
+    keys = [fragment_key(variant, project.id, project.updated_at) for project in projects]
+    found = cache.get_many(keys)
+
+    missing = {project.id: key for project, key in zip(projects, keys) if key not in found}
+    if missing:
+        encoded = {}
+        for project in Project.objects.with_amenities().filter(id__in=missing):
+            data = encode_project(project, variant)
+            encoded[fragment_key(variant, project.id, project.updated_at)] = data
+            found[missing[project.id]] = data
+        cache.set_many(encoded, FRAGMENT_TIMEOUT)
+
+    return [Raw(found[key]) for key in keys if key in found]
+
+
+class Raw:
+    """Already-encoded JSON, inserted verbatim by dumps()"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def splice(fragment, **fields):
+    """Add fields (which may hold Raw values) to an encoded JSON object without decoding it"""
+    if not fields:
+        return fragment
+    data = fragment.data if isinstance(fragment, Raw) else fragment
+    return Raw(data[:-1] + b',' + dumps(fields)[1:])
+
+
+def dumps(value):
+    """json.dumps() to bytes, splicing any Raw values in verbatim"""
+    raws = []
+    token = uuid.uuid4().hex
+
+    def replace(node):
+        if isinstance(node, Raw):
+            raws.append(node.data)
+            return f'@{token}:{len(raws) - 1}@'
+        if isinstance(node, dict):
+            return {key: replace(item) for key, item in node.items()}
+        if isinstance(node, (list, tuple)):
+            return [replace(item) for item in node]
+        return node
+
+    body = encode(replace(value))
+    if not raws:
+        return body
+    parts = body.split(f'"@{token}:'.encode())
+    pieces = [parts[0]]
+    for part in parts[1:]:
+        index, rest = part.split(b'@"', 1)
+        pieces.append(raws[int(index)])
+        pieces.append(rest)
+    return b''.join(pieces)
+
+
+def fragment_response(value, status=200):
+    """JsonResponse equivalent for payloads containing Raw fragments"""
+    return HttpResponse(dumps(value), status=status, content_type='application/json')
@@ -1,30 +1,147 @@
-from django.db.models.signals import post_save
+from django.db.models import FileField
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-from .models import Contact, Newsletter
-from .utils import send_contact_notification, send_newsletter_welcome
+from django.utils import timezone
+from .models import Contact, Newsletter, Project, ProjectImage, CompanyInfo, AboutUs, SEOSettings, Banner
+from .utils import (
+    bump_cache_version_on_commit, ProjectCache, CATALOG_VERSION, SITE_CONFIG_VERSION, CONTACTS_VERSION,
+)
+from . import search, facets, similarity, price_stats, serializers, images, storage, outbox
 import logging
 
 logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=Contact)
 def contact_created(sender, instance, created, **kwargs):
-    """Send notification when new contact is created"""
+    """Queue the notification and auto-reply; run_mail_worker sends them"""
     if created:
-        try:
-            # Send email notification in background (consider using Celery for production)
-            send_contact_notification(instance.id)
-            logger.info(f'Contact notification triggered for {instance.name}')
-        except Exception as e:
-            logger.error(f'Failed to send contact notification: {str(e)}')
+        outbox.enqueue('contact_notification', contact_id=instance.id)
+        outbox.enqueue('contact_auto_reply', contact_id=instance.id)
 
 @receiver(post_save, sender=Newsletter)
 def newsletter_subscribed(sender, instance, created, **kwargs):
-    """Send welcome email when someone subscribes to newsletter"""
+    """Queue the welcome email for a new subscriber"""
     if created:
-        try:
-            # Send welcome email
-            send_newsletter_welcome(instance.email)
-            logger.info(f'Newsletter welcome email sent to {instance.email}')
-        except Exception as e:
-            logger.error(f'Failed to send newsletter welcome email: {str(e)}')
\ No newline at end of file
+        outbox.enqueue('newsletter_welcome', email=instance.email)
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def contact_changed(sender, **kwargs):
+    """Inquiry counts are part of the memoized project stats"""
+    bump_cache_version_on_commit(CONTACTS_VERSION)
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    """Keep the search index, facet summary and price statistics in sync with project edits"""
+    search.index_project(instance)
+    old_values = None if created else (instance.get_loaded_values() or {})
+    facets.project_changed(old_values, facets.facet_values(instance))
+    price_stats.project_changed(old_values, price_stats.stat_values(instance))
+    if created or similarity.features_changed(instance):
+        similarity.schedule(similarity.refresh_project, instance.pk)
+    ProjectCache.invalidate_project(instance, old_values)
+    serializers.warm(instance)
+    bump_cache_version_on_commit(CATALOG_VERSION)
+
+@receiver(pre_delete, sender=Project)
+def project_deleting(sender, instance, **kwargs):
+    """Remember which similar-project lists will lose this project"""
+    instance._similar_owner_ids = similarity.projects_listing(instance.pk)
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    """Remove deleted projects from the search index, facet summary and price statistics"""
+    search.remove_project(instance.pk)
+    facets.project_changed(instance.get_loaded_values() or facets.facet_values(instance), None)
+    price_stats.project_changed(instance.get_loaded_values() or price_stats.stat_values(instance), None)
+    owner_ids = getattr(instance, '_similar_owner_ids', [])
+    if owner_ids:
+        similarity.schedule(similarity.refresh_neighbours_of, owner_ids)
+    ProjectCache.invalidate_project(instance)
+    bump_cache_version_on_commit(CATALOG_VERSION)
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=ProjectImage)
+@receiver(post_save, sender=Banner)
+def image_saved(sender, instance, created, update_fields, **kwargs):
+    """Resize new uploads in the background instead of during the save"""
+    # ProcessedImageMixin already cleared the old hash, so pages show the
+    # new original until its resized copy exists
+    if images.upload_changed(instance, created, update_fields):
+        images.schedule(instance)
+
+def _file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, FileField)]
+
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=ProjectImage)
+@receiver(pre_save, sender=Banner)
+@receiver(pre_save, sender=AboutUs)
+@receiver(pre_save, sender=CompanyInfo)
+def media_uploading(sender, instance, **kwargs):
+    """Note which files this save uploads; storing them already counts their reference"""
+    instance._uploaded_fields = {
+        field.attname for field in _file_fields(sender)
+        if getattr(instance, field.attname) and not getattr(instance, field.attname)._committed
+    }
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=ProjectImage)
+@receiver(post_save, sender=Banner)
+@receiver(post_save, sender=AboutUs)
+@receiver(post_save, sender=CompanyInfo)
+def media_replaced(sender, instance, created, update_fields, **kwargs):
+    """Move the row's stored-file reference from the old name to the new one"""
+    loaded = {} if created else instance.get_loaded_values() or {}
+    uploaded = getattr(instance, '_uploaded_fields', set())
+    for field in _file_fields(sender):
+        if update_fields is not None and field.name not in update_fields:
+            continue
+        if not created and field.attname not in loaded:
+            # Deferred column: the previous name is unknown
+            continue
+        new_file = getattr(instance, field.attname)
+        # A FieldFile once the instance has been saved, a name when loaded
+        old_name = getattr(loaded.get(field.attname), 'name', loaded.get(field.attname))
+        if old_name == new_file.name:
+            if field.attname in uploaded:
+                # Same content uploaded again: storing it counted a second reference
+                storage.release(new_file)
+            continue
+        if field.attname not in uploaded:
+            # Pointed at a stored name directly
+            storage.add_reference(new_file)
+        if old_name:
+            storage.release(field.attr_class(instance, field, old_name))
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectImage)
+@receiver(post_delete, sender=Banner)
+@receiver(post_delete, sender=AboutUs)
+@receiver(post_delete, sender=CompanyInfo)
+def media_deleted(sender, instance, **kwargs):
+    """Deleted rows release their stored files"""
+    for field in _file_fields(sender):
+        storage.release(getattr(instance, field.attname))
+
+@receiver(post_save, sender=CompanyInfo)
+@receiver(post_delete, sender=CompanyInfo)
+@receiver(post_save, sender=AboutUs)
+@receiver(post_delete, sender=AboutUs)
+@receiver(post_save, sender=SEOSettings)
+@receiver(post_delete, sender=SEOSettings)
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def site_config_changed(sender, **kwargs):
+    """Invalidate the per-worker site configuration snapshot"""
+    bump_cache_version_on_commit(SITE_CONFIG_VERSION)
+
+@receiver(post_save, sender=ProjectImage)
+@receiver(post_delete, sender=ProjectImage)
+def project_image_changed(sender, instance, **kwargs):
+    """Gallery edits change the project pages"""
+    # Touching updated_at rotates the project's cached gallery fragment
+    Project.objects.filter(pk=instance.project_id).update(updated_at=timezone.now())
+    ProjectCache.invalidate(f'project:{instance.project_id}')
+    bump_cache_version_on_commit(CATALOG_VERSION)
@@ -0,0 +1,262 @@
+"""
+Project similarity engine.
+
+Every project is encoded as a feature vector (one-hot project type,
+locality and price band, plus scaled bedrooms and log area), rows
+are L2-normalized and similarity is the cosine score. Each project's top-k
+neighbours are stored in SimilarProject so the detail page, the detail API
+and /api/similar-projects/ serve them with one indexed lookup.
+
+When a project changes only the rows it can affect are recomputed: its
+own list, lists that currently contain it, and lists whose weakest entry
+it now beats. Weakest entries are read only for projects scoring above
+the weakest entry of any list, through the (rank, score) index. Reads
+never write: projects without stored neighbours (saved before the table
+existed) are filled in by `manage.py rebuild_similar_projects --missing`.
+
+Refreshes load the feature rows of the whole catalog, so the Project
+receivers in signals.py `schedule()` them to run after the transaction
+commits, on a single background worker (which also keeps two refreshes
+from rewriting the same lists at once).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Min
+from .facets import price_bucket
+from .models import Project, SimilarProject
+
+FEATURE_FIELDS = ('id', 'project_type', 'location', 'price_inr', 'bedroom_count', 'area_sqft_value')
+
+# Relative importance of each feature group
+TYPE_WEIGHT = 2.0
+LOCATION_WEIGHT = 1.5
+PRICE_BAND_WEIGHT = 1.0
+BEDROOMS_WEIGHT = 0.5
+AREA_WEIGHT = 0.5
+
+# Reference center/scale for the numeric features
+BEDROOMS_CENTER, BEDROOMS_SCALE = 3.0, 1.5
+LOG_AREA_CENTER, LOG_AREA_SCALE = np.log1p(1500), 0.7
+
+# Rows of the similarity matrix computed at once during a full rebuild
+CHUNK_SIZE = 512
+
+# Ids per IN (...) lookup
+LOOKUP_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity')
+
+
+def top_k():
+    return getattr(settings, 'SIMILAR_PROJECTS_TOP_K', 6)
+
+
+def locality(location):
+    """First comma-separated part of a location, e.g. the neighbourhood"""
+    return (location or '').split(',')[0].strip().lower()
+
+
+def _scaled(values, center, scale):
+    """Center and scale a column by fixed constants; missing values become 0.
+
+    Fixed constants (rather than catalog statistics) keep every row's
+    vector independent of the other projects, so incremental refreshes give
+    the same table as a full rebuild.
+    """
+    return np.array([0.0 if v is None else (float(v) - center) / scale for v in values])
+
+
+def _one_hot(labels, weight):
+    categories = sorted({label for label in labels if label is not None}, key=str)
+    index = {label: position for position, label in enumerate(categories)}
+    matrix = np.zeros((len(labels), len(categories)))
+    for row, label in enumerate(labels):
+        if label is not None:
+            matrix[row, index[label]] = weight
+    return matrix
+
+
+class Catalog:
+    """Normalized feature matrix for every project, in id order"""
+
+    def __init__(self, rows):
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.position = {project_id: pos for pos, project_id in enumerate(self.ids.tolist())}
+
+        areas = [None if row[5] is None else np.log1p(row[5]) for row in rows]
+        features = np.hstack([
+            _one_hot([row[1] for row in rows], TYPE_WEIGHT),
+            _one_hot([locality(row[2]) or None for row in rows], LOCATION_WEIGHT),
+            _one_hot([price_bucket(row[3]) for row in rows], PRICE_BAND_WEIGHT),
+            (_scaled([row[4] for row in rows], BEDROOMS_CENTER, BEDROOMS_SCALE) * BEDROOMS_WEIGHT)[:, None],
+            (_scaled(areas, LOG_AREA_CENTER, LOG_AREA_SCALE) * AREA_WEIGHT)[:, None],
+        ])
+
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.features = features / norms
+
+    @classmethod
+    def load(cls):
+        return cls(list(Project.objects.order_by('id').values_list(*FEATURE_FIELDS)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, positions):
+        """Similarity of the given rows against the whole catalog"""
+        scores = self.features[positions] @ self.features.T
+        scores[np.arange(len(positions)), positions] = -np.inf
+        return scores
+
+    def neighbours(self, positions, k):
+        """Top-k (ids, scores) per row, best first"""
+        scores = self.scores(positions)
+        k = min(k, len(self) - 1)
+        if k <= 0:
+            return [([], []) for _ in positions]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            (self.ids[row].tolist(), score_row.tolist())
+            for row, score_row in zip(top, top_scores)
+        ]
+
+
+def _replace_rows(catalog, positions, k):
+    project_ids = catalog.ids[positions].tolist()
+    links = []
+    for project_id, (similar_ids, scores) in zip(project_ids, catalog.neighbours(positions, k)):
+        links.extend(
+            SimilarProject(project_id=project_id, similar_id=similar_id, score=score, rank=rank)
+            for rank, (similar_id, score) in enumerate(zip(similar_ids, scores))
+        )
+    with transaction.atomic():
+        SimilarProject.objects.filter(project_id__in=project_ids).delete()
+        SimilarProject.objects.bulk_create(links)
+
+
+def rebuild_all():
+    """Recompute the neighbour table for the whole catalog"""
+    catalog = Catalog.load()
+    k = top_k()
+    with transaction.atomic():
+        SimilarProject.objects.all().delete()
+        for start in range(0, len(catalog), CHUNK_SIZE):
+            _replace_rows(catalog, np.arange(start, min(start + CHUNK_SIZE, len(catalog))), k)
+    return len(catalog)
+
+
+def rebuild_missing():
+    """Compute the neighbour lists of projects that have none; returns how many"""
+    catalog = Catalog.load()
+    listed = set(SimilarProject.objects.values_list('project_id', flat=True).distinct())
+    positions = [position for project_id, position in catalog.position.items() if project_id not in listed]
+    for start in range(0, len(positions), CHUNK_SIZE):
+        _replace_rows(catalog, np.array(positions[start:start + CHUNK_SIZE]), top_k())
+    return len(positions)
+
+
+def _weakest_scores(owner_ids, rank):
+    """{project id: score of its entry at `rank`} for the given lists"""
+    weakest = {}
+    for start in range(0, len(owner_ids), LOOKUP_BATCH_SIZE):
+        weakest.update(
+            SimilarProject.objects.filter(project_id__in=owner_ids[start:start + LOOKUP_BATCH_SIZE], rank=rank)
+            .values_list('project_id', 'score')
+        )
+    return weakest
+
+
+def refresh_project(project_id):
+    """Recompute the rows a saved project can affect"""
+    catalog = Catalog.load()
+    if project_id not in catalog.position:
+        return
+    k = top_k()
+    full_size = min(k, len(catalog) - 1)
+    if full_size < k:
+        # Every list holds the whole (small) catalog, so every list changes
+        _replace_rows(catalog, np.arange(len(catalog)), k)
+        return
+
+    position = catalog.position[project_id]
+    scores = catalog.scores(np.array([position]))[0]
+    affected = {project_id} | set(projects_listing(project_id))
+
+    # Only lists whose weakest entry scores below this project can take it in
+    floor = SimilarProject.objects.filter(rank=full_size - 1).aggregate(floor=Min('score'))['floor']
+    if floor is not None:
+        candidates = [owner_id for owner_id in catalog.ids[scores > floor].tolist() if owner_id not in affected]
+        weakest = _weakest_scores(candidates, full_size - 1)
+        affected.update(
+            owner_id for owner_id in candidates
+            # Lists never computed are left to rebuild_missing()
+            if owner_id in weakest and scores[catalog.position[owner_id]] > weakest[owner_id]
+        )
+
+    positions = np.array(sorted(catalog.position[owner_id] for owner_id in affected))
+    _replace_rows(catalog, positions, k)
+
+
+def refresh_neighbours_of(project_ids):
+    """Recompute lists that pointed at a deleted project"""
+    if not project_ids:
+        return
+    catalog = Catalog.load()
+    positions = [catalog.position[pid] for pid in project_ids if pid in catalog.position]
+    if positions:
+        _replace_rows(catalog, np.array(sorted(positions)), top_k())
+
+
+def _run(refresh, *args):
+    try:
+        refresh(*args)
+    except Exception as e:
+        logger.error(f'Similar project refresh failed ({refresh.__name__}{args}): {e}')
+
+
+def _run_in_thread(refresh, *args):
+    try:
+        _run(refresh, *args)
+    finally:
+        connections.close_all()
+
+
+def schedule(refresh, *args):
+    """Run `refresh(*args)` (refresh_project, refresh_neighbours_of) once the current transaction commits"""
+    if getattr(settings, 'SIMILAR_PROJECTS_ASYNC', True):
+        transaction.on_commit(lambda: _executor.submit(_run_in_thread, refresh, *args))
+    else:
+        transaction.on_commit(lambda: _run(refresh, *args))
+
+
+def features_changed(project):
+    """Whether a save touched any column the feature vector is built from"""
+    loaded = project.get_loaded_values()
+    if loaded is None:
+        return True
+    return any(
+        field not in loaded or loaded[field] != getattr(project, field)
+        for field in FEATURE_FIELDS[1:]
+    )
+
+
+def projects_listing(project_id):
+    """Ids of projects whose stored neighbours include `project_id`"""
+    return list(SimilarProject.objects.filter(similar_id=project_id).values_list('project_id', flat=True))
+
+
+def get_similar_projects(project_id, limit=None):
+    """Return the stored [(project, score)], best first"""
+    limit = limit or top_k()
+    links = SimilarProject.objects.filter(project_id=project_id).select_related('similar')[:limit]
+    return [(link.similar, link.score) for link in links]
@@ -0,0 +1,80 @@
+"""
+In-process snapshot of the site configuration.
+
+CompanyInfo, AboutUs, SEOSettings, the active Banners and the catalog
+counts shown in the header/footer are read on nearly every page. They are
+loaded together into an immutable SiteConfig, kept per worker and reused
+until the site_config or catalog cache version changes; the post_save and
+post_delete receivers in signals.py bump the site_config version whenever
+one of these models is edited.
+"""
+import threading
+from types import MappingProxyType
+from .models import CompanyInfo, AboutUs, SEOSettings, Banner, Project
+from .utils import get_cache_version, CATALOG_VERSION, SITE_CONFIG_VERSION
+
+
+class SiteConfig:
+    """Read-only view of the configuration models at one point in time"""
+
+    __slots__ = (
+        'company_info', 'about_us', 'seo', 'banners',
+        'featured_projects_count', 'total_projects_count', 'social_links',
+    )
+
+    def __init__(self, company_info, about_us, seo, banners, featured_projects_count, total_projects_count):
+        values = {
+            'company_info': company_info,
+            'about_us': about_us,
+            'seo': MappingProxyType(dict(seo)),
+            'banners': tuple(banners),
+            'featured_projects_count': featured_projects_count,
+            'total_projects_count': total_projects_count,
+            'social_links': MappingProxyType({
+                'facebook': company_info.facebook_url,
+                'instagram': company_info.instagram_url,
+                'twitter': company_info.twitter_url,
+                'youtube': company_info.youtube_url,
+                'linkedin': company_info.linkedin_url,
+            }) if company_info else None,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SiteConfig is immutable')
+
+    @classmethod
+    def load(cls):
+        return cls(
+            company_info=CompanyInfo.objects.first(),
+            about_us=AboutUs.objects.first(),
+            seo={seo.page_name: seo for seo in SEOSettings.objects.all()},
+            banners=Banner.objects.filter(is_active=True).order_by('order'),
+            featured_projects_count=Project.objects.filter(is_featured=True).count(),
+            total_projects_count=Project.objects.count(),
+        )
+
+    def seo_for(self, page_name):
+        """SEOSettings for a page (by URL name), or None"""
+        return self.seo.get(page_name)
+
+
+_config = None
+_config_version = None
+_config_lock = threading.Lock()
+
+
+def get_site_config():
+    """Return the current snapshot, reloading it if any of its sources changed"""
+    global _config, _config_version
+
+    version = (get_cache_version(SITE_CONFIG_VERSION), get_cache_version(CATALOG_VERSION))
+    if _config is not None and _config_version == version:
+        return _config
+
+    with _config_lock:
+        if _config is None or _config_version != version:
+            _config = SiteConfig.load()
+            _config_version = version
+    return _config
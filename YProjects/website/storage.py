@@ -0,0 +1,174 @@
+"""
+Content-addressed, deduplicated media storage.
+
+DedupStorage hashes every upload while streaming it to a temporary file
+and keeps one copy per distinct content under
+
+    blobs/<d[:2]>/<sha256><ext>
+
+which is the name saved in the model's file column. A MediaBlob row per
+digest counts the rows referencing it. An upload saved through a model
+counts its row's reference as it is stored; the receivers in signals.py
+add one when a row is pointed at an existing blob name, and release one
+when a row is deleted or its file replaced. The blob is removed when the
+last reference goes.
+
+Every check or change of a blob's file and count happens with its MediaBlob
+row locked (see DedupStorage.lock()), so a blob being stored again cannot
+be removed underneath the new reference.
+
+Renditions and display copies (website.renditions, website.images) are
+already keyed by the same SHA-256 and are stored as plain files. Files
+saved before this backend was enabled keep their names and are never
+deleted by it.
+"""
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+BLOB_DIR = 'blobs'
+
+# Names under these directories are content-addressed already and are
+# stored as is
+PASSTHROUGH_DIRS = ('derived/', 'renditions/')
+
+
+class DedupStorage(FileSystemStorage):
+
+    def is_blob(self, name):
+        return bool(name) and name.startswith(BLOB_DIR + '/')
+
+    def digest(self, name):
+        """SHA-256 of a blob, read from its name, or None for other files"""
+        if not self.is_blob(name):
+            return None
+        return os.path.splitext(os.path.basename(name))[0]
+
+    def blob_name(self, digest, extension):
+        return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+    def _save(self, name, content):
+        if name.startswith(PASSTHROUGH_DIRS):
+            return super()._save(name, content)
+
+        blob_root = self.path(BLOB_DIR)
+        os.makedirs(blob_root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        # Same filesystem as the blobs, so the final move is a rename
+        handle, temp_path = tempfile.mkstemp(dir=blob_root, suffix='.upload')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+
+            name = self.blob_name(digest.hexdigest(), os.path.splitext(name)[1].lower())
+            path = self.path(name)
+            with transaction.atomic():
+                self.lock(digest.hexdigest(), name, size)
+                if os.path.exists(path):
+                    os.remove(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temp_path, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+                self._change_count(digest.hexdigest(), 1)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Uploads end up under their digest; only passthrough names are final
+        if name.startswith(PASSTHROUGH_DIRS):
+            return super().get_available_name(name, max_length)
+        return name
+
+    def lock(self, digest, name, size=0):
+        """Lock the MediaBlob row of `digest` until the transaction ends.
+
+        Creates it with no references if it doesn't exist. Returns
+        (blob, created). The no-op update takes the row lock (the database
+        write lock on SQLite) before anything looks at the file.
+        """
+        from .models import MediaBlob
+        while True:
+            if MediaBlob.objects.filter(digest=digest).update(ref_count=F('ref_count')):
+                return MediaBlob.objects.get(digest=digest), False
+            try:
+                with transaction.atomic():
+                    return MediaBlob.objects.create(digest=digest, name=name, size=size, ref_count=0), True
+            except IntegrityError:
+                # Created concurrently; lock that row instead
+                continue
+
+    def _change_count(self, digest, delta):
+        from .models import MediaBlob
+        MediaBlob.objects.filter(digest=digest).update(ref_count=F('ref_count') + delta)
+
+    def add_reference(self, name):
+        """Count one more row using an already stored blob"""
+        if not self.is_blob(name):
+            return
+        size = os.path.getsize(self.path(name)) if os.path.exists(self.path(name)) else 0
+        with transaction.atomic():
+            self.lock(self.digest(name), name, size)
+            self._change_count(self.digest(name), 1)
+
+    def delete(self, name):
+        """Release one reference to a blob; other files are left alone"""
+        if not self.is_blob(name):
+            return
+        with transaction.atomic():
+            blob, created = self.lock(self.digest(name), name)
+            if created:
+                # Never counted, so nothing is known to be safe to remove
+                blob.delete()
+                return
+            if blob.ref_count > 1:
+                self._change_count(blob.digest, -1)
+                return
+            blob.delete()
+            super().delete(name)
+
+    def remove_if_unreferenced(self, name, in_use=None):
+        """Remove a blob no reference is counted for; returns True if it was removed.
+
+        `in_use(name)` may re-check the model rows while the blob is locked.
+        """
+        if not self.is_blob(name):
+            return False
+        with transaction.atomic():
+            blob, created = self.lock(self.digest(name), name)
+            if blob.ref_count > 0 or (in_use is not None and in_use(name)):
+                if created:
+                    blob.delete()
+                return False
+            blob.delete()
+            super().delete(name)
+        return True
+
+
+def add_reference(field_file):
+    """Count a row's reference to a blob it was pointed at without uploading it"""
+    name = field_file.name if field_file else None
+    storage = getattr(field_file, 'storage', None)
+    if name and isinstance(storage, DedupStorage):
+        storage.add_reference(name)
+
+
+def release(field_file):
+    """Drop a row's reference to its file once the current transaction commits"""
+    name = field_file.name if field_file else None
+    storage = getattr(field_file, 'storage', None)
+    if name and isinstance(storage, DedupStorage) and storage.is_blob(name):
+        transaction.on_commit(lambda: storage.delete(name))
@@ -0,0 +1,94 @@
+"""
+Template fragment caching keyed on the objects a fragment shows.
+
+    {% load fragment_cache %}
+
+    {% cachefragment "gallery" project %}...{% endcachefragment %}
+        Caches the enclosed HTML under a key built from the fragment name
+        and each argument: model instances contribute their label, pk and
+        `updated_at`, anything else its string value. Saving an object
+        moves its `updated_at`, so keys change by themselves and stale
+        fragments simply age out; there is nothing to delete.
+
+    {% project_cards projects "listing" %}
+        Renders website/partials/project_card_<style>.html for every
+        project, reading all cached cards with one get_many() and rendering
+        only the missing ones.
+"""
+import hashlib
+from django import template
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def key_part(value):
+    if value is None:
+        return 'none'
+    meta = getattr(value, '_meta', None)
+    if meta is None:
+        return str(value)
+    updated_at = getattr(value, 'updated_at', None)
+    stamp = updated_at.timestamp() if updated_at else ''
+    return f'{meta.label_lower}.{value.pk}.{stamp}'
+
+
+def fragment_key(name, *values):
+    digest = hashlib.md5(':'.join(key_part(value) for value in values).encode()).hexdigest()
+    return f'template.fragment.{name}.{digest}'
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, values):
+        self.nodelist = nodelist
+        self.name = name
+        self.values = values
+
+    def render(self, context):
+        key = fragment_key(
+            self.name.resolve(context),
+            *(value.resolve(context) for value in self.values),
+        )
+        html = cache.get(key)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, str(html), FRAGMENT_TIMEOUT)
+        return mark_safe(html)
+
+
+@register.tag('cachefragment')
+def do_cachefragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return CacheFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
+
+
+@register.simple_tag
+def project_cards(projects, style='listing'):
+    """Concatenated card HTML for `projects`, rendered only on cache misses"""
+    projects = list(projects)
+    keys = [fragment_key(f'project_card_{style}', project) for project in projects]
+    found = cache.get_many(keys)
+
+    missing = {}
+    card = None
+    for project, key in zip(projects, keys):
+        if key not in found:
+            if card is None:
+                card = get_template(f'website/partials/project_card_{style}.html')
+            found[key] = missing[key] = card.render({'project': project})
+    if missing:
+        cache.set_many(missing, FRAGMENT_TIMEOUT)
+
+    return mark_safe(''.join(found[key] for key in keys))
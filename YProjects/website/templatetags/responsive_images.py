@@ -0,0 +1,24 @@
+"""
+{% picture obj sizes="..." alt="..." %} renders a <picture> with WebP and
+JPEG srcsets for a Project, ProjectImage or Banner image.
+"""
+from django import template
+from .. import renditions
+
+register = template.Library()
+
+
+@register.inclusion_tag('website/partials/picture.html')
+def picture(instance, sizes='100vw', alt='', css_class='', variant='card', lazy=True):
+    """`variant` is the rendition used as the plain <img src> fallback"""
+    if not instance.image:
+        return {'src': None}
+    return {
+        'src': renditions.url(instance, variant),
+        'webp_srcset': renditions.srcset(instance, 'webp'),
+        'jpeg_srcset': renditions.srcset(instance, 'jpeg'),
+        'sizes': sizes,
+        'alt': alt,
+        'css_class': css_class,
+        'lazy': lazy,
+    }
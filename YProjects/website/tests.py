@@ -1,3 +1,1362 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import re
+import smtplib
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from .cache_backends import TwoTierCache
+from .models import Project, ProjectImage, Contact, Newsletter, AboutUs, CompanyInfo, MediaBlob, ChunkedUpload, EmailOutbox, SimilarProject, Amenity, PriceStat, Banner, SEOSettings
+from .page_cache import versioned_cache_page
+from .pagination import encode_cursor
+from .site_config import get_site_config
+from .utils import rate_limit_check, ProjectCache, CATALOG_VERSION, bump_cache_version, calculate_project_stats, memoize, generate_sitemap_data
+from . import search, similarity, images, renditions, outbox, media_scan, uploads, autocomplete, facets, price_stats
+from .serializers import Raw, dumps, splice
 
-# Create your tests here.
+# "SCAN website_project" without "USING ... INDEX" is a full table scan
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+HOT_TABLES = {
+    Project._meta.db_table,
+    Contact._meta.db_table,
+    Newsletter._meta.db_table,
+}
+
+
+# Tests run against a local stand-in for the shared L2 (Redis in
+# production) so they never clear a real cache
+TWO_TIER_CACHES = {
+    'default': {
+        'BACKEND': 'website.cache_backends.TwoTierCache',
+        'OPTIONS': {'L2': 'shared'},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+}
+
+
+def create_project(i, **fields):
+    """Save project number `i`, with placeholder values for the required fields"""
+    values = dict(
+        title=f'Project {i}', slug=f'project-{i}', description='Homes', location='Whitefield',
+        price='₹50 Lakhs', project_type='villas',
+    )
+    values.update(fields)
+    return Project.objects.create(**values)
+
+
+@override_settings(CACHES=TWO_TIER_CACHES)
+class QueryPlanTests(TestCase):
+    """Run EXPLAIN QUERY PLAN on every query a hot path issues and fail on full scans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        project_types = [choice for choice, _ in Project.PROPERTY_TYPES]
+        statuses = [choice for choice, _ in Project.STATUS_CHOICES]
+        projects = []
+        for i in range(40):
+            project = Project(
+                title=f'Test Project {i}',
+                slug=f'test-project-{i}',
+                description='Spacious homes with modern amenities',
+                location=['Whitefield', 'Koramangala', 'HSR Layout'][i % 3],
+                price=f'₹{40 + i} Lakhs',
+                image='projects/test.jpg',
+                project_type=project_types[i % len(project_types)],
+                status=statuses[i % len(statuses)],
+                area_sqft=f'{1000 + i * 10} sq ft',
+                bedrooms=f'{i % 4 + 1} BHK',
+                amenities='Gym, Garden, Security',
+                is_featured=i % 4 == 0,
+            )
+            project.update_numeric_fields()
+            projects.append(project)
+        Project.objects.bulk_create(projects)
+        for project in Project.objects.all():
+            project.sync_amenity_tags()
+        search.rebuild_index()
+        similarity.rebuild_all()
+
+        Contact.objects.bulk_create([
+            Contact(name=f'Visitor {i}', email=f'visitor{i}@example.com', mobile='9876543210', is_read=i % 2 == 0)
+            for i in range(20)
+        ])
+        Newsletter.objects.bulk_create([
+            Newsletter(email=f'reader{i}@example.com') for i in range(20)
+        ])
+        CompanyInfo.objects.create()
+        AboutUs.objects.create(description='About us')
+
+    def setUp(self):
+        cache.clear()
+
+    def full_scans(self, sql, tables):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        matches = (FULL_SCAN_RE.match(line) for line in plan)
+        return [match.group(1) for match in matches if match and match.group(1) in tables]
+
+    def assertNoFullScans(self, func, *args, tables=HOT_TABLES, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+
+        offenders = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            scanned = self.full_scans(sql, tables)
+            if scanned:
+                offenders.append(f'{", ".join(scanned)}: {sql}')
+
+        self.assertFalse(offenders, 'Full table scan in hot query:\n' + '\n'.join(offenders))
+        return result
+
+    def get(self, url, **kwargs):
+        response = self.assertNoFullScans(self.client.get, url, **kwargs)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_home_page(self):
+        self.get('/')
+
+    def test_projects_page(self):
+        self.get('/projects/')
+        self.get('/projects/?type=villas')
+        self.get('/projects/?search=modern')
+        self.get('/projects/?page=2')
+
+    def test_project_detail_page(self):
+        project = Project.objects.filter(is_featured=True).first()
+        self.get(f'/projects/{project.id}/')
+
+    def test_api_projects(self):
+        self.get('/api/projects/')
+        self.get('/api/projects/?featured=true')
+        self.get('/api/projects/?type=villas')
+        self.get('/api/projects/?search=garden')
+        response = self.get('/api/projects/?pagination=cursor&per_page=5')
+        cursor = response.json()['pagination']['next_cursor']
+        self.get(f'/api/projects/?cursor={cursor}&per_page=5')
+
+    def test_api_project_detail(self):
+        project = Project.objects.first()
+        self.get(f'/api/projects/{project.id}/')
+
+    def test_api_similar_projects(self):
+        project = Project.objects.first()
+        self.get(f'/api/similar-projects/{project.id}/')
+
+    def test_api_featured_projects(self):
+        self.get('/api/featured-projects/')
+
+    def test_api_advanced_search(self):
+        self.get('/api/search-advanced/')
+        self.get('/api/search-advanced/?project_type=villas')
+        self.get('/api/search-advanced/?min_price=5000000&max_price=7000000&sort=price')
+        self.get('/api/search-advanced/?min_bedrooms=2&sort=bedrooms&order=asc')
+        self.get('/api/search-advanced/?q=modern')
+        self.get('/api/search-advanced/?amenities=gym&amenities=garden')
+
+    def test_api_statistics(self):
+        # Grouping by location is a reporting query; only the activity tables are hot here
+        self.get('/api/statistics/', tables={Contact._meta.db_table, Newsletter._meta.db_table})
+
+    def test_generate_reports(self):
+        Contact.objects.update(created_at=timezone.now() - timedelta(days=3))
+        for report_type in ['contacts', 'projects', 'newsletter', 'analytics']:
+            self.assertNoFullScans(
+                call_command, 'generate_reports', type=report_type, stdout=StringIO()
+            )
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=False, SIMILAR_PROJECTS_ASYNC=False)
+class ProjectFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_dumps_splices_raw_fragments(self):
+        fragment = splice(Raw(b'{"id":1,"title":"A \\"quoted\\" title"}'), score=0.5, tags=[Raw(b'[1,2]')])
+        body = dumps({'success': True, 'data': [fragment, {'plain': 'value'}]})
+        self.assertEqual(json.loads(body), {
+            'success': True,
+            'data': [
+                {'id': 1, 'title': 'A "quoted" title', 'score': 0.5, 'tags': [[1, 2]]},
+                {'plain': 'value'},
+            ],
+        })
+
+    def test_saved_project_gets_a_fresh_fragment(self):
+        project = Project.objects.create(
+            title='Old Title', slug='old-title', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas',
+        )
+        self.assertEqual(self.client.get('/api/projects/').json()['data'][0]['title'], 'Old Title')
+
+        project.title = 'New Title'
+        project.save()
+        self.assertEqual(self.client.get('/api/projects/').json()['data'][0]['title'], 'New Title')
+
+    def test_gallery_fragment_follows_image_changes(self):
+        project = Project.objects.create(
+            title='Gallery Project', slug='gallery-project', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas',
+        )
+        url = f'/projects/{project.id}/'
+        self.assertNotContains(self.client.get(url), 'Lake view')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectImage.objects.create(project=project, image='projects/gallery/lake.jpg', caption='Lake view')
+        self.assertContains(self.client.get(url), 'Lake view')
+
+
+class ImageProcessingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(
+            MEDIA_ROOT=media_root.name, IMAGE_PROCESSING_ASYNC=False, SIMILAR_PROJECTS_ASYNC=False,
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+
+    def upload(self, size=(2400, 1600)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'navy').save(buffer, format='JPEG')
+        return SimpleUploadedFile('large.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_is_resized_into_a_separate_file(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(
+                title='Large Image', slug='large-image', description='Homes', location='Whitefield',
+                price='₹50 Lakhs', project_type='villas', image=self.upload(),
+            )
+        project.refresh_from_db()
+
+        self.assertEqual(len(project.image_hash), 64)
+        with Image.open(project.image.path) as original:
+            self.assertEqual(original.size, (2400, 1600))
+        derived = images.derived_name(project.image.name, project.image_hash, images.MAX_SIZES['website.project'])
+        with Image.open(project.image.storage.path(derived)) as resized:
+            self.assertEqual(resized.size, (1200, 800))
+        self.assertTrue(project.display_image_url.endswith(derived))
+        for variant, width in renditions.RENDITIONS:
+            for fmt in renditions.FORMATS:
+                with Image.open(project.image.storage.path(renditions.rendition_name(project.image_hash, variant, fmt))) as rendition:
+                    self.assertEqual(rendition.width, min(width, 2400))
+
+    def test_unprocessed_image_renditions_are_generated_on_first_request(self):
+        project = Project.objects.create(
+            title='Large Image', slug='large-image', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas', image=self.upload(),
+        )
+        data = self.client.get(f'/api/projects/{project.id}/').json()['data']
+        thumb_url = data['image_renditions']['thumb']['webp']
+        self.assertIn('/thumb.webp 160w', data['image_renditions']['srcset']['webp'])
+
+        with mock.patch.object(images, 'schedule') as schedule:
+            response = self.client.get(thumb_url)
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response['Location'].endswith('/thumb.webp'))
+            with Image.open(project.image.storage.path(response['Location'].split(settings.MEDIA_URL, 1)[1])) as thumb:
+                self.assertEqual(thumb.width, 160)
+
+            # Processing is scheduled once, however many renditions are requested
+            self.client.get(data['image_renditions']['card']['jpeg'])
+            schedule.assert_called_once()
+
+            # While another request renders this image, the original is served
+            cache.add(f'rendition-lock:project:{project.id}', 1)
+            response = self.client.get(data['image_renditions']['hero']['jpeg'])
+            self.assertEqual(response['Location'], project.image.url)
+            cache.delete(f'rendition-lock:project:{project.id}')
+
+    def test_saves_that_keep_the_image_do_not_reprocess_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(
+                title='Large Image', slug='large-image', description='Homes', location='Whitefield',
+                price='₹50 Lakhs', project_type='villas', image=self.upload(),
+            )
+        project.refresh_from_db()
+        self.assertFalse(images.upload_changed(project, False, None))
+
+        with mock.patch.object(images, 'schedule') as schedule:
+            project.is_featured = True
+            project.save()
+            schedule.assert_not_called()
+
+            project.image = self.upload(size=(100, 100))
+            project.save()
+            schedule.assert_called_once_with(project)
+
+    def test_replaced_image_is_not_served_from_the_old_hash(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(
+                title='Large Image', slug='large-image', description='Homes', location='Whitefield',
+                price='₹50 Lakhs', project_type='villas', image=self.upload(),
+            )
+        project.refresh_from_db()
+        old_hash = project.image_hash
+        self.assertIn(old_hash, self.client.get(f'/api/projects/{project.id}/').json()['data']['image_url'])
+
+        # Processing of the new upload hasn't run (or failed)
+        with mock.patch.object(images, 'schedule'), self.captureOnCommitCallbacks(execute=True):
+            project.image = self.upload(size=(100, 100))
+            project.save()
+        self.assertEqual(Project.objects.get(pk=project.pk).image_hash, '')
+
+        data = self.client.get(f'/api/projects/{project.id}/').json()['data']
+        self.assertEqual(data['image_url'], project.image.url)
+        self.assertNotIn(old_hash, json.dumps(data))
+
+    def test_optimize_images_resumes_from_its_manifest(self):
+        project = Project.objects.create(
+            title='Large Image', slug='large-image', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas', image=self.upload(),
+        )
+        ProjectImage.objects.create(project=project, image=self.upload(size=(800, 600)), caption='Lobby')
+        manifest = os.path.join(settings.MEDIA_ROOT, 'manifest')
+
+        out = StringIO()
+        call_command('optimize_images', workers=1, manifest=manifest, stdout=out)
+        self.assertIn('2 images to process', out.getvalue())
+        project.refresh_from_db()
+        self.assertEqual(len(project.image_hash), 64)
+
+        out = StringIO()
+        call_command('optimize_images', workers=1, manifest=manifest, force=True, stdout=out)
+        self.assertIn('0 images to process, 2 already optimized', out.getvalue())
+
+    def test_identical_uploads_share_one_reference_counted_blob(self):
+        upload = self.upload().read()
+        projects = [
+            Project.objects.create(
+                title=f'Phase {i}', slug=f'phase-{i}', description='Homes', location='Whitefield',
+                price='₹50 Lakhs', project_type='villas',
+                image=SimpleUploadedFile(f'phase-{i}.jpg', upload, content_type='image/jpeg'),
+            )
+            for i in range(2)
+        ]
+        name = projects[0].image.name
+        self.assertEqual(projects[1].image.name, name)
+        self.assertTrue(name.startswith('blobs/'))
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            projects[0].delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(os.path.exists(projects[1].image.path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            projects[1].delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, name)))
+
+    def test_blob_references_are_counted_per_row(self):
+        upload = self.upload(size=(300, 200)).read()
+        first = Project.objects.create(
+            title='Phase 1', slug='phase-1', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas',
+            image=SimpleUploadedFile('phase.jpg', upload, content_type='image/jpeg'),
+        )
+        name = first.image.name
+        # A row pointed at the stored name, without uploading anything
+        second = Project.objects.create(
+            title='Phase 2', slug='phase-2', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas', image=name,
+        )
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(os.path.exists(second.image.path))
+
+        # Uploading the same content to the same row again
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Project.objects.get(pk=second.pk)
+            second.image = SimpleUploadedFile('again.jpg', upload, content_type='image/jpeg')
+            second.save()
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, name)))
+
+    def test_chunked_uploads_are_added_to_the_gallery_in_order(self):
+        staff = User.objects.create_user('editor', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        project = Project.objects.create(
+            title='Gallery Project', slug='gallery-project', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas',
+        )
+        ProjectImage.objects.create(project=project, image='projects/gallery/existing.jpg', order=4)
+
+        entries = []
+        for caption in ('Lobby', 'Pool'):
+            data = self.upload(size=(300, 200)).read()
+            response = self.client.post(
+                '/api/uploads/', {'filename': f'{caption}.jpg', 'size': len(data)}, content_type='application/json'
+            )
+            upload_url = f"/api/uploads/{response.json()['data']['upload_id']}/"
+            middle = len(data) // 2
+            for first, chunk in ((0, data[:middle]), (middle, data[middle:])):
+                response = self.client.put(
+                    upload_url, chunk, content_type='application/octet-stream',
+                    HTTP_CONTENT_RANGE=f'bytes {first}-{first + len(chunk) - 1}/{len(data)}',
+                )
+                self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['data']['complete'])
+            entries.append({'upload_id': response.json()['data']['upload_id'], 'caption': caption})
+
+        # A repeated chunk is refused with the offset to resume from
+        response = self.client.put(
+            upload_url, chunk, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {middle}-{len(data) - 1}/{len(data)}',
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['received'], len(data))
+
+        response = self.client.post(
+            f'/api/projects/{project.id}/images/', {'images': entries}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(project.images.values_list('caption', 'order')),
+            [('', 4), ('Lobby', 5), ('Pool', 6)],
+        )
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+        self.client.logout()
+        self.assertEqual(self.client.post('/api/uploads/', {}, content_type='application/json').status_code, 403)
+
+    def test_abandoned_uploads_expire_and_failed_batches_leave_no_blobs(self):
+        staff = User.objects.create_user('editor', password='secret', is_staff=True)
+        project = Project.objects.create(
+            title='Gallery Project', slug='gallery-project', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas',
+        )
+        temp_root = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_root.cleanup)
+        temp_settings = override_settings(FILE_UPLOAD_TEMP_DIR=temp_root.name)
+        temp_settings.enable()
+        self.addCleanup(temp_settings.disable)
+        data = self.upload(size=(300, 200)).read()
+        upload = uploads.start(staff, 'lobby.jpg', len(data))
+        uploads.append_chunk(upload, BytesIO(data), 0, len(data))
+
+        with mock.patch.object(ProjectImage.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                uploads.add_gallery_images(project, [(upload, '')])
+        self.assertFalse(MediaBlob.objects.exists())
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'blobs', digest[:2], f'{digest}.jpg')))
+
+        self.assertEqual(uploads.expire(), (0, 0))
+        self.assertEqual(uploads.expire(now=timezone.now() + timedelta(days=2)), (1, len(data)))
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(os.path.exists(uploads.temp_path(upload)))
+
+    def test_media_scan_reports_missing_and_deletes_orphaned_files(self):
+        project = Project.objects.create(
+            title='Scanned', slug='scanned', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas', image=self.upload(size=(300, 200)),
+        )
+        ProjectImage.objects.create(project=project, image='projects/gallery/gone.jpg')
+        orphan = os.path.join(settings.MEDIA_ROOT, 'projects', 'stale.jpg')
+        os.makedirs(os.path.dirname(orphan), exist_ok=True)
+        with open(orphan, 'wb') as handle:
+            handle.write(b'x' * 100)
+
+        out = StringIO()
+        call_command('media_scan', delete_orphans=True, grace=0, stdout=out)
+        self.assertIn('website.ProjectImage', out.getvalue())
+        self.assertIn('projects/gallery/gone.jpg', out.getvalue())
+        self.assertIn('projects/stale.jpg (100 bytes)', out.getvalue())
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(project.image.path))
+
+        # A blob nothing referenced at scan time, then reused by a new row
+        blob = 'blobs/ab/' + 'ab' * 32 + '.jpg'
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'blobs', 'ab'))
+        with open(os.path.join(settings.MEDIA_ROOT, blob), 'wb') as handle:
+            handle.write(b'x' * 100)
+        result = media_scan.scan(grace=0)
+        self.assertEqual([orphan.name for orphan in result.orphans], [blob])
+        Project.objects.create(
+            title='Reused', slug='reused', description='Homes', location='Whitefield',
+            price='₹50 Lakhs', project_type='villas', image=blob,
+        )
+        self.assertEqual(media_scan.delete_orphans(result), (0, 0))
+        self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT, blob)))
+        self.assertEqual(MediaBlob.objects.get(name=blob).ref_count, 1)
+
+
+@override_settings(SIMILAR_PROJECTS_ASYNC=False)
+class SimilarProjectTests(TestCase):
+    def create(self, i, **fields):
+        values = dict(
+            location=['Whitefield', 'Koramangala, Bangalore', 'HSR Layout'][i % 3],
+            price=f'₹{40 + i * 7} Lakhs', project_type=['villas', 'apartments'][i % 2],
+            area_sqft=f'{900 + i * 37} sq ft', bedrooms=f'{i % 4 + 1} BHK',
+        )
+        values.update(fields)
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_project(i, **values)
+
+    def table(self):
+        return {
+            (owner, similar, rank): round(score, 9)
+            for owner, similar, rank, score in SimilarProject.objects.values_list('project_id', 'similar_id', 'rank', 'score')
+        }
+
+    def test_incremental_refresh_matches_a_full_rebuild(self):
+        projects = [self.create(i) for i in range(14)]
+        projects[3].location = 'HSR Layout'
+        projects[3].area_sqft = '2400 sq ft'
+        with self.captureOnCommitCallbacks(execute=True):
+            projects[3].save()
+        projects[8].project_type = 'villas'
+        with self.captureOnCommitCallbacks(execute=True):
+            projects[8].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            projects[5].delete()
+        self.create(20, project_type='plots', price='₹2 Crores')
+
+        incremental = self.table()
+        self.assertTrue(incremental)
+        similarity.rebuild_all()
+        self.assertEqual(incremental, self.table())
+
+    def test_saves_refresh_after_the_commit(self):
+        with mock.patch.object(similarity.Catalog, 'load', wraps=similarity.Catalog.load) as load:
+            with self.captureOnCommitCallbacks() as callbacks:
+                create_project(0)
+            load.assert_not_called()
+            for callback in callbacks:
+                callback()
+            load.assert_called_once()
+
+    def test_reads_never_compute_missing_lists(self):
+        projects = [self.create(i) for i in range(8)]
+        SimilarProject.objects.filter(project=projects[0]).delete()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(similarity.get_similar_projects(projects[0].id), [])
+        self.assertFalse([q for q in context.captured_queries if not q['sql'].startswith('SELECT')])
+
+        call_command('rebuild_similar_projects', missing=True, stdout=StringIO())
+        self.assertEqual(len(similarity.get_similar_projects(projects[0].id)), similarity.top_k())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.project = create_project(0, title='Cached Project')
+
+    def test_etag_revalidation_follows_site_config_changes(self):
+        for url in (f'/api/projects/{self.project.id}/', f'/projects/{self.project.id}/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Last-Modified', response)
+            etag = response['ETag']
+
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # Without a Last-Modified there is nothing for If-Modified-Since to match
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200
+            )
+
+            with self.captureOnCommitCallbacks(execute=True):
+                CompanyInfo.objects.create(company_name=f'Renamed for {url}')
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_follows_the_row_updated_at(self):
+        url = f'/api/projects/{self.project.id}/'
+        etag = self.client.get(url)['ETag']
+        Project.objects.filter(pk=self.project.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FlakySMTPBackend(locmem.EmailBackend):
+    """Stand-in for an SMTP server: counts connections and raises `errors` on the next sends"""
+    errors = []
+    connections = 0
+
+    def open(self):
+        if getattr(self, 'is_open', False):
+            return False
+        self.is_open = True
+        FlakySMTPBackend.connections += 1
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        if FlakySMTPBackend.errors:
+            raise FlakySMTPBackend.errors.pop(0)
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='website.tests.FlakySMTPBackend')
+class MailOutboxTests(TestCase):
+    def setUp(self):
+        FlakySMTPBackend.errors = []
+        FlakySMTPBackend.connections = 0
+
+    def test_contact_emails_are_queued_and_sent_by_the_worker(self):
+        Contact.objects.create(name='Asha', email='asha@example.com', mobile='9876543210', message='Hi')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(EmailOutbox.objects.values_list('kind', flat=True)),
+            ['contact_auto_reply', 'contact_notification'],
+        )
+
+        out = StringIO()
+        call_command('run_mail_worker', once=True, stdout=out)
+        self.assertIn('Sent 2 emails', out.getvalue())
+        self.assertEqual(sorted(message.subject for message in mail.outbox), [
+            'New Contact Inquiry from Asha', 'Thank you for contacting Harsha Designers',
+        ])
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 2)
+        self.assertEqual(FlakySMTPBackend.connections, 1)
+
+    def test_dropped_connection_is_reopened(self):
+        Newsletter.objects.create(email='reader@example.com')
+        connection = mail.get_connection()
+        connection.open()
+        FlakySMTPBackend.errors = [smtplib.SMTPServerDisconnected('Connection unexpectedly closed')]
+
+        self.assertEqual(outbox.drain(connection=connection), (1, 0))
+        self.assertEqual(FlakySMTPBackend.connections, 2)
+        self.assertEqual(EmailOutbox.objects.get().status, 'sent')
+
+        Newsletter.objects.create(email='other@example.com')
+        FlakySMTPBackend.errors = [ConnectionResetError(104, 'Connection reset by peer')]
+        self.assertEqual(outbox.drain(connection=connection), (1, 0))
+        self.assertEqual(FlakySMTPBackend.connections, 3)
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+
+    @override_settings(MAIL_OUTBOX_MAX_ATTEMPTS=2, MAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failed_sends_back_off_and_give_up(self):
+        Newsletter.objects.create(email='reader@example.com')
+        entry = EmailOutbox.objects.get()
+        FlakySMTPBackend.errors = [smtplib.SMTPDataError(451, 'Try again later') for _ in range(2)]
+
+        self.assertEqual(outbox.drain(), (0, 1))
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('pending', 1))
+        self.assertIn('SMTPDataError', entry.last_error)
+        self.assertGreater(entry.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # Not due yet
+        self.assertEqual(outbox.drain(), (0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain(), (0, 1))
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('failed', 2))
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(CACHES=TWO_TIER_CACHES)
+class TwoTierCacheTests(SimpleTestCase):
+    """Two TwoTierCache instances over one L2 behave like two worker processes"""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.worker_a = self.make_cache()
+        self.worker_b = self.make_cache()
+
+    def make_cache(self, **options):
+        return TwoTierCache(None, {'OPTIONS': {'L2': 'shared', **options}})
+
+    def test_reads_are_served_from_process_memory(self):
+        self.worker_a.set('greeting', 'hello')
+        caches['shared'].delete('greeting')
+        self.assertEqual(self.worker_a.get('greeting'), 'hello')
+        self.assertIsNone(self.worker_b.get('greeting'))
+
+    def test_l1_returns_copies(self):
+        self.worker_a.set('items', [1, 2])
+        self.worker_a.get('items').append(3)
+        self.assertEqual(self.worker_a.get('items'), [1, 2])
+
+    def test_version_stamps_bypass_l1(self):
+        self.worker_a.set('cache_version:catalog', 1)
+        self.assertEqual(self.worker_a.get('cache_version:catalog'), 1)
+        self.worker_b.incr('cache_version:catalog')
+        self.assertEqual(self.worker_a.get('cache_version:catalog'), 2)
+
+    def test_version_bump_invalidates_other_processes(self):
+        def read(worker):
+            version = worker.get('cache_version:catalog')
+            return worker.get(f'summary:{version}')
+
+        self.worker_a.set('cache_version:catalog', 1)
+        self.worker_a.set('summary:1', 'old')
+        self.assertEqual(read(self.worker_b), 'old')
+
+        self.worker_a.incr('cache_version:catalog')
+        self.worker_a.set('summary:2', 'new')
+        self.assertEqual(read(self.worker_b), 'new')
+
+    def test_l1_is_bounded(self):
+        worker = self.make_cache(L1_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            worker.set(key, key)
+        caches['shared'].clear()
+        self.assertIsNone(worker.get('a'))
+        self.assertEqual(worker.get('c'), 'c')
+
+    def test_l1_entries_expire(self):
+        worker = self.make_cache(L1_TIMEOUT=60)
+        now = time.monotonic()
+        with mock.patch('website.cache_backends.time.monotonic', return_value=now):
+            worker.set('greeting', 'hello')
+        caches['shared'].delete('greeting')
+        with mock.patch('website.cache_backends.time.monotonic', return_value=now + 59):
+            self.assertEqual(worker.get('greeting'), 'hello')
+        with mock.patch('website.cache_backends.time.monotonic', return_value=now + 60):
+            self.assertIsNone(worker.get('greeting'))
+
+    def test_rate_limit_is_shared_between_processes(self):
+        self.assertTrue(rate_limit_check('client', limit=2))
+        cache.clear_local()
+        self.assertTrue(rate_limit_check('client', limit=2))
+        self.assertFalse(rate_limit_check('client', limit=2))
+
+
+class NumericFieldTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_free_text_fields_are_parsed_into_numeric_columns(self):
+        project = create_project(0, price='₹45 - 60 Lakhs', bedrooms='2/3 BHK', area_sqft='1.5 acres')
+        self.assertEqual(project.price_inr, 4_500_000)
+        self.assertEqual(project.bedroom_count, 2)
+        self.assertEqual(project.area_sqft_value, 65_340)
+        self.assertIsNone(project.bathroom_count)
+
+        project.price = '1.2 Cr'
+        project.save(update_fields=['price'])
+        project.refresh_from_db()
+        self.assertEqual(project.price_inr, 12_000_000)
+        self.assertIsNone(create_project(1, price='Price on request').price_inr)
+
+    def test_advanced_search_filters_and_sorts_numerically(self):
+        nine = create_project(0, price='₹9 Lakhs', bedrooms='1 BHK')
+        crore = create_project(1, price='₹1.2 Crores', bedrooms='4 BHK')
+        lakhs = create_project(2, price='₹45 Lakhs', bedrooms='10 BHK')
+        create_project(3, price='Price on request')
+
+        def ids(query):
+            response = self.client.get(f'/api/search-advanced/?{query}')
+            return [result['id'] for result in response.json()['data']['results']]
+
+        # As strings, '₹9' sorts after '₹45' and '₹1.2'; unparsed prices go last
+        self.assertEqual(ids('sort=price&order=asc')[:3], [nine.id, lakhs.id, crore.id])
+        self.assertEqual(ids('min_price=1000000&max_price=20000000&sort=price'), [crore.id, lakhs.id])
+        self.assertEqual(ids('min_bedrooms=4&sort=bedrooms&order=asc'), [crore.id, lakhs.id])
+
+    def test_data_migration_parses_existing_strings(self):
+        migration = import_module('website.migrations.0003_project_numeric_fields')
+        Project.objects.bulk_create([
+            Project(title='A', slug='a', description='Homes', location='Whitefield', price='₹45 Lakhs',
+                    area_sqft='1,200 sq ft', bedrooms='3 BHK', bathrooms='2'),
+            Project(title='B', slug='b', description='Homes', location='Whitefield', price='Price on request'),
+        ])
+        migration.backfill_numeric_fields(django_apps, None)
+
+        a, b = Project.objects.order_by('slug')
+        self.assertEqual((a.price_inr, a.area_sqft_value, a.bedroom_count, a.bathroom_count), (4_500_000, 1200, 3, 2))
+        self.assertEqual((b.price_inr, b.area_sqft_value, b.bedroom_count, b.bathroom_count), (None, None, None, None))
+
+
+class SearchIndexTests(TestCase):
+    def search(self, query):
+        return list(search.search_projects(Project.objects.all(), query).values_list('id', flat=True))
+
+    def test_title_matches_rank_above_description_matches(self):
+        described = create_project(0, description='Homes next to the lakeside promenade')
+        titled = create_project(1, title='Lakeside Residency')
+        create_project(2, description='Homes near the metro')
+
+        self.assertEqual(self.search('lakeside'), [titled.id, described.id])
+        # Every word must match, each as a prefix
+        self.assertEqual(self.search('lakesi resid'), [titled.id])
+        self.assertEqual(self.search('lake'), [titled.id, described.id])
+        self.assertEqual(self.search('"*()'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        project = create_project(0, amenities='Gym, Pool')
+        self.assertEqual(self.search('pool'), [project.id])
+
+        project.amenities = 'Gym, Clubhouse'
+        project.save()
+        self.assertEqual(self.search('pool'), [])
+        self.assertEqual(self.search('clubhouse'), [project.id])
+
+        project.delete()
+        self.assertEqual(self.search('clubhouse'), [])
+
+    def test_other_backends_fall_back_to_icontains(self):
+        project = create_project(0, location='Koramangala')
+        create_project(1)
+        with mock.patch.object(search, 'is_available', return_value=False):
+            self.assertEqual(self.search('koraman'), [project.id])
+
+
+@override_settings(SIMILAR_PROJECTS_ASYNC=False)
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/search-projects/', {'q': query, **params})
+        return [result['id'] for result in response.json()['results']]
+
+    def test_prefixes_of_every_word_must_match(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            green = create_project(0, title='Green Meadows', location='Sarjapur Road', project_type='apartments')
+            garden = create_project(1, title='Garden Villas')
+
+        self.assertEqual(self.suggest('gre mea'), [green.id])
+        self.assertEqual(self.suggest('sarj'), [green.id])
+        self.assertEqual(self.suggest('g white'), [garden.id])
+        self.assertEqual(self.suggest('green villas'), [])
+        self.assertEqual(self.suggest('g'), [])
+
+        response = self.client.get('/api/search-projects/', {'q': 'meadow'})
+        self.assertEqual(
+            set(response.json()['results'][0]), set(autocomplete.RESULT_FIELDS),
+        )
+
+    def test_featured_projects_come_first_then_recent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            older = create_project(0, title='Lake View')
+            featured = create_project(1, title='Lake Shore', is_featured=True)
+            newer = create_project(2, title='Lake Front')
+
+        self.assertEqual(self.suggest('lake'), [featured.id, newer.id, older.id])
+        self.assertEqual(self.suggest('lake', sort='recent'), [newer.id, featured.id, older.id])
+        self.assertEqual(self.suggest('lake', limit=1), [featured.id])
+
+    def test_index_is_rebuilt_when_the_catalog_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = create_project(0, title='Palm Grove')
+        self.assertEqual(self.suggest('palm'), [project.id])
+        # A warm index answers without touching the database
+        with self.assertNumQueries(0):
+            autocomplete.suggest('palm')
+
+        project.title = 'Oak Grove'
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        self.assertEqual(self.suggest('palm'), [])
+        self.assertEqual(self.suggest('oak'), [project.id])
+
+
+class AmenityTests(TestCase):
+    def amenities(self, project):
+        return list(project.project_amenities.values_list('amenity__slug', flat=True))
+
+    def test_data_migration_parses_existing_strings(self):
+        migration = import_module('website.migrations.0006_populate_amenities')
+        Project.objects.bulk_create([
+            Project(title='A', slug='a', description='Homes', location='Whitefield', price='₹50 Lakhs',
+                    amenities='Gym, Swimming Pool,, gym'),
+            Project(title='B', slug='b', description='Homes', location='Whitefield', price='₹50 Lakhs',
+                    amenities='swimming pool'),
+        ])
+        migration.populate_amenities(django_apps, None)
+
+        a, b = Project.objects.order_by('slug')
+        self.assertEqual(self.amenities(a), ['gym', 'swimming-pool'])
+        self.assertEqual(self.amenities(b), ['swimming-pool'])
+        self.assertEqual(Amenity.objects.count(), 2)
+
+    def test_links_follow_the_amenities_text(self):
+        project = create_project(0, amenities='Gym, Garden')
+        self.assertEqual(self.amenities(project), ['gym', 'garden'])
+
+        project.amenities = 'Clubhouse, Gym'
+        project.save()
+        self.assertEqual(self.amenities(project), ['clubhouse', 'gym'])
+
+        # Updates that leave the text alone keep the links as they are
+        project.title = 'Renamed'
+        project.save(update_fields=['title'])
+        self.assertEqual(self.amenities(project), ['clubhouse', 'gym'])
+
+        listed = Project.objects.with_amenities().get(pk=project.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(listed.get_amenities_list(), ['Clubhouse', 'Gym'])
+
+    def test_filters_require_every_amenity(self):
+        both = create_project(0, amenities='Gym, Swimming Pool')
+        create_project(1, amenities='Gym')
+        create_project(2, amenities='Gymnasium, Swimming Pool')
+
+        def matches(*names):
+            return list(Project.objects.with_all_amenities(names).values_list('id', flat=True))
+
+        self.assertEqual(matches('gym', 'SWIMMING POOL'), [both.id])
+        self.assertEqual(matches('gym', 'sauna'), [])
+        self.assertEqual(len(matches('')), 3)
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_summary_deltas_match_a_rebuild(self):
+        projects = [
+            create_project(0, bedrooms='3 BHK'),
+            create_project(1, price='₹1.5 Crores', status='ongoing', bedrooms='3 BHK'),
+        ]
+        facets.get_summary()
+
+        create_project(2, location='HSR Layout', price='₹20 Lakhs', bedrooms='2 BHK')
+        projects[0].price = '₹30 Lakhs'
+        projects[0].project_type = 'apartments'
+        projects[0].save()
+        projects[1].delete()
+        create_project(3, price='Price on request', bedrooms='')
+
+        incremental = cache.get(facets.FACET_SUMMARY_KEY)
+        self.assertEqual(incremental, facets.build_summary())
+        self.assertEqual(incremental['locations'], {'Whitefield': 2, 'HSR Layout': 1})
+        self.assertEqual(incremental['price_buckets'], {0: 1, 1: 1})
+
+        with self.assertNumQueries(0):
+            options = facets.filter_options()
+        self.assertEqual(options['price_range'], {'min': 2_000_000, 'max': 3_000_000})
+        self.assertEqual(options['bedroom_range'], {'min': 2, 'max': 3})
+
+        # Loaded without the facet columns, so its old values are unknown
+        deferred = Project.objects.only('id', 'title').get(pk=projects[0].pk)
+        deferred.title = 'Renamed'
+        deferred.save()
+        self.assertIsNone(cache.get(facets.FACET_SUMMARY_KEY))
+
+    def test_filtered_counts_cover_only_matching_projects(self):
+        create_project(0)
+        create_project(1, location='HSR Layout', price='₹1.5 Crores')
+        create_project(2, project_type='plots', price='₹20 Lakhs', bedrooms='')
+
+        response = self.client.get('/api/search-advanced/?project_type=villas')
+        counts = response.json()['data']['facet_counts']
+        self.assertEqual(counts['project_type'], {'villas': 2})
+        self.assertEqual(counts['location'], {'HSR Layout': 1, 'Whitefield': 1})
+        self.assertEqual([bucket['count'] for bucket in counts['price']], [0, 0, 1, 1, 0])
+
+        unfiltered = self.client.get('/api/search-advanced/').json()['data']['facet_counts']
+        self.assertEqual(unfiltered['project_type'], {'plots': 1, 'villas': 2})
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.projects = [create_project(i) for i in range(7)]
+        # Ties on created_at must be broken by id, not skipped or repeated
+        tied = timezone.now() - timedelta(days=1)
+        Project.objects.filter(pk__in=[p.pk for p in self.projects[1:5]]).update(created_at=tied)
+
+    def walk(self, url, per_page):
+        ids, cursor, pages = [], None, 0
+        while True:
+            params = {'pagination': 'cursor', 'per_page': per_page}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get(url, params).json()
+            items = body['data'] if url == '/api/projects/' else body['data']['results']
+            pagination = body['pagination'] if url == '/api/projects/' else body['data']['pagination']
+            ids += [item['id'] for item in items]
+            pages += 1
+            self.assertNotIn('total_items', pagination)
+            cursor = pagination['next_cursor']
+            self.assertEqual(pagination['has_next'], cursor is not None)
+            if not cursor:
+                return ids, pages
+
+    def test_pages_cover_every_project_once_in_order(self):
+        expected = list(Project.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        for per_page in (1, 2, 3, 7):
+            ids, pages = self.walk('/api/projects/', per_page)
+            self.assertEqual(ids, expected)
+            # A full last page does not leave an empty page behind it
+            self.assertEqual(pages, -(-len(expected) // per_page))
+        ids, _ = self.walk('/api/search-advanced/', 3)
+        self.assertEqual(ids, expected)
+
+    def test_ascending_order_and_page_size_cap(self):
+        response = self.client.get('/api/search-advanced/', {'pagination': 'cursor', 'order': 'asc', 'per_page': 500})
+        pagination = response.json()['data']['pagination']
+        self.assertEqual(pagination['per_page'], 50)
+        self.assertIsNone(pagination['next_cursor'])
+        self.assertEqual(
+            [item['id'] for item in response.json()['data']['results']],
+            list(Project.objects.order_by('created_at', 'id').values_list('id', flat=True)),
+        )
+
+    def test_bad_cursors_are_rejected(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            for cursor in ('not-a-cursor', encode_cursor(timezone.now(), 1)[:-3], 'WyJ4IiwxXQ'):
+                response = self.client.get('/api/projects/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400, cursor)
+                self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+            for sort in ('price', 'relevance'):
+                response = self.client.get('/api/search-advanced/', {'pagination': 'cursor', 'q': 'homes', 'sort': sort})
+                self.assertEqual(response.status_code, 400, sort)
+
+    def test_queries_default_to_created_at_order(self):
+        response = self.client.get('/api/search-advanced/', {'pagination': 'cursor', 'q': 'homes', 'per_page': 50})
+        self.assertEqual(
+            [item['id'] for item in response.json()['data']['results']],
+            list(Project.objects.order_by('-created_at', '-id').values_list('id', flat=True)),
+        )
+
+
+@override_settings(SIMILAR_PROJECTS_ASYNC=False)
+class PriceStatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def cube(self):
+        return {
+            row[:3]: tuple(round(value, 6) if isinstance(value, float) else value for value in row[3:])
+            for row in PriceStat.objects.values_list(
+                'location', 'project_type', 'bedrooms', 'count', 'price_sum', 'price_min', 'price_max',
+                'area_count', 'area_sum', 'area_sq_sum', 'area_price_sum', 'area_cross_sum',
+            )
+        }
+
+    def test_incremental_maintenance_matches_a_rebuild(self):
+        projects = [
+            create_project(0, bedrooms='3 BHK'),
+            create_project(
+                1, location='HSR Layout, Bangalore', price='₹1.2 Crores', area_sqft='2200 sq ft', bedrooms='3 BHK',
+            ),
+            create_project(
+                2, price='₹80 Lakhs', area_sqft='1600 sq ft', project_type='apartments', bedrooms='3 BHK',
+            ),
+            create_project(3, price='₹95 Lakhs', area_sqft='', bedrooms='3 BHK'),
+        ]
+        # Moves cells, and removes the current maximum of the Whitefield cells
+        projects[2].location = 'HSR Layout'
+        projects[2].bedrooms = '2 BHK'
+        projects[2].save()
+        projects[3].price = '₹45 Lakhs'
+        projects[3].save()
+        projects[1].delete()
+
+        incremental = self.cube()
+        price_stats.rebuild()
+        self.assertEqual(incremental, self.cube())
+
+    def test_data_migration_runs_on_backfilled_columns(self):
+        # bulk_create skips Project.save, like rows written before migration 0003
+        Project.objects.bulk_create([
+            Project(title='A', slug='a', description='Homes', location='Whitefield', price='₹50 Lakhs',
+                    project_type='villas', area_sqft='1000 sq ft', bedrooms='3 BHK'),
+            Project(title='B', slug='b', description='Homes', location='HSR Layout', price='₹1.2 Crores',
+                    project_type='villas', bedrooms='2 BHK'),
+        ])
+        import_module('website.migrations.0003_project_numeric_fields').backfill_numeric_fields(django_apps, None)
+        import_module('website.migrations.0011_populate_price_stats').populate_price_stats(django_apps, None)
+
+        migrated = self.cube()
+        self.assertEqual(migrated[('', '', 0)][:2], (2, 17_000_000.0))
+        price_stats.rebuild()
+        self.assertEqual(migrated, self.cube())
+
+    def test_price_estimate_uses_the_cell_regression(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_project(0, price='₹50 Lakhs', area_sqft='1000 sq ft', bedrooms='3 BHK')
+            create_project(1, price='₹70 Lakhs', area_sqft='1500 sq ft', bedrooms='3 BHK')
+            create_project(2, price='₹90 Lakhs', area_sqft='2000 sq ft', bedrooms='3 BHK')
+            create_project(
+                3, location='HSR Layout', price='₹3 Crores', area_sqft='1800 sq ft', bedrooms='3 BHK',
+            )
+
+        response = self.client.post('/api/price-estimate/', {
+            'location': 'Whitefield', 'project_type': 'villas', 'bedrooms': '3', 'area_sqft': '1800',
+        }, content_type='application/json')
+        estimate = response.json()['data']['estimate']
+        self.assertEqual(estimate['matched'], {'location': 'whitefield', 'project_type': 'villas', 'bedrooms': 3})
+        self.assertEqual(estimate['count'], 3)
+        self.assertEqual(estimate['method'], 'regression')
+        # price = 10 Lakhs + 4000 per sq ft
+        self.assertAlmostEqual(estimate['estimated_price'], 8_200_000)
+
+
+@override_settings(SIMILAR_PROJECTS_ASYNC=False)
+class SiteConfigTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = CompanyInfo.objects.create(company_name='Harsha Designers')
+        self.banner = Banner.objects.create(title='Welcome')
+
+    def test_warm_snapshot_runs_no_queries(self):
+        config = get_site_config()
+        with self.assertNumQueries(0):
+            self.assertIs(get_site_config(), config)
+        with self.assertRaises(AttributeError):
+            config.company_info = None
+        with self.assertRaises(TypeError):
+            config.social_links['facebook'] = 'https://example.com'
+
+    def test_config_edits_replace_the_snapshot(self):
+        self.assertEqual(get_site_config().company_info.company_name, 'Harsha Designers')
+
+        self.company.company_name = 'Harsha Homes'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.save()
+            SEOSettings.objects.create(page_name='home', meta_title='Homes', meta_description='Homes')
+        config = get_site_config()
+        self.assertEqual(config.company_info.company_name, 'Harsha Homes')
+        self.assertEqual(config.seo_for('home').meta_title, 'Homes')
+        self.assertEqual([banner.pk for banner in config.banners], [self.banner.pk])
+
+        self.banner.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.banner.save()
+        self.assertEqual(get_site_config().banners, ())
+
+    def test_catalog_changes_refresh_the_counts(self):
+        self.assertEqual(get_site_config().total_projects_count, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_project(0, is_featured=True)
+        config = get_site_config()
+        self.assertEqual((config.total_projects_count, config.featured_projects_count), (1, 1))
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+        self.about = AboutUs.objects.create(title='Our Story', description='About us')
+        self.project = create_project(0, title='Lake View', image=self.image())
+
+    def image(self):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'navy').save(buffer, format='JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_pages_are_served_from_cache_until_content_changes(self):
+        # The project page's ETag reads the row's updated_at
+        pages = (('/', 0), ('/about/', 0), ('/projects/', 0), (f'/projects/{self.project.id}/', 1))
+        for url, queries in pages:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            with self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url).status_code, 200, url)
+
+        self.about.title = 'Thirty Years of Homes'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.about.save()
+        self.assertContains(self.client.get('/about/'), 'Thirty Years of Homes')
+
+        self.project.title = 'Lake Shore'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.save()
+        self.assertContains(self.client.get('/projects/'), 'Lake Shore')
+
+    def test_query_strings_are_cached_separately(self):
+        create_project(
+            1, title='Plot Twenty', description='Land', price='₹20 Lakhs', project_type='plots', image=self.image(),
+        )
+        self.assertContains(self.client.get('/projects/'), 'Lake View')
+        response = self.client.get('/projects/?type=plots')
+        self.assertContains(response, 'Plot Twenty')
+        self.assertNotContains(response, 'Lake View')
+
+    def test_only_shareable_get_responses_are_stored(self):
+        calls = []
+
+        def page(request):
+            calls.append(request.method)
+            response = HttpResponse('page')
+            if 'login' in request.GET:
+                response.set_cookie('sessionid', 'secret')
+            return response
+
+        view = versioned_cache_page(page)
+        factory = RequestFactory()
+        for request in (factory.get('/page/'), factory.get('/page/'), factory.post('/page/'),
+                        factory.get('/page/?login=1'), factory.get('/page/?login=1')):
+            view(request)
+        self.assertEqual(calls, ['GET', 'POST', 'GET', 'GET'])
+
+
+@override_settings(SIMILAR_PROJECTS_ASYNC=False)
+class ProjectCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, projects):
+        return [project.id for project in projects]
+
+    def test_lookups_are_cached_including_empty_results(self):
+        project = create_project(0, is_featured=True)
+        ProjectCache.get_project(project.id)
+        ProjectCache.get_project(project.id + 100)
+        ProjectCache.get_projects_by_type('plots')
+        with self.assertNumQueries(0):
+            cached = ProjectCache.get_project(project.id)
+            self.assertEqual(cached.get_amenities_list(), [])
+            self.assertEqual(list(cached.images.all()), [])
+            self.assertIsNone(ProjectCache.get_project(project.id + 100))
+            self.assertEqual(ProjectCache.get_projects_by_type('plots'), [])
+
+    def test_saves_invalidate_the_tags_they_touch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            villa = create_project(0, is_featured=True)
+            other = create_project(1)
+        self.assertEqual(self.ids(ProjectCache.get_featured_projects()), [villa.id])
+        self.assertEqual(self.ids(ProjectCache.get_projects_by_type('villas')), [other.id, villa.id])
+        self.assertEqual(self.ids(ProjectCache.get_projects_by_type('plots')), [])
+        ProjectCache.get_project(other.id)
+
+        villa.project_type = 'plots'
+        villa.is_featured = False
+        with self.captureOnCommitCallbacks(execute=True):
+            villa.save()
+        self.assertEqual(ProjectCache.get_featured_projects(), [])
+        self.assertEqual(self.ids(ProjectCache.get_projects_by_type('villas')), [other.id])
+        self.assertEqual(self.ids(ProjectCache.get_projects_by_type('plots')), [villa.id])
+        # Entries for other projects are untouched
+        with self.assertNumQueries(0):
+            ProjectCache.get_project(other.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            villa.delete()
+        self.assertIsNone(ProjectCache.get_project(villa.id))
+        self.assertEqual(ProjectCache.get_projects_by_type('plots'), [])
+
+        # Nothing is bumped until the transaction commits
+        other.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=False):
+            other.save()
+            self.assertEqual(ProjectCache.get_project(other.id).title, 'Project 1')
+
+    def test_concurrent_misses_compute_once(self):
+        # Seed the tag versions so every caller builds the same key
+        ProjectCache.get_or_compute('warm-up', [], lambda: 'warm')
+        waits = ProjectCache.stats()['waits']
+        calls = []
+        results = []
+
+        def get():
+            results.append(ProjectCache.get_or_compute('single-flight', [], compute))
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                # Callers arriving while the lock is held wait for this value
+                for thread in threads:
+                    thread.start()
+                deadline = time.monotonic() + 5
+                while ProjectCache.stats()['waits'] < waits + len(threads) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            return 'value'
+
+        threads = [threading.Thread(target=get) for _ in range(4)]
+        get()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(SIMILAR_PROJECTS_ASYNC=False)
+class MemoizeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def memoized(self, **options):
+        @memoize(**options)
+        def lookup(project_type, limit=6, **filters):
+            self.calls.append((project_type, limit, filters))
+            return [project_type, limit, filters]
+        return lookup
+
+    def test_keys_follow_the_normalized_arguments(self):
+        lookup = self.memoized()
+        self.assertEqual(lookup('villas'), ['villas', 6, {}])
+        self.assertEqual(lookup('villas', 6), ['villas', 6, {}])
+        self.assertEqual(lookup(project_type='villas', limit=6), ['villas', 6, {}])
+        self.assertEqual(lookup('villas', 3), ['villas', 3, {}])
+        self.assertEqual(lookup('plots'), ['plots', 6, {}])
+        lookup('villas', status='ongoing', featured=True)
+        lookup('villas', featured=True, status='ongoing')
+        self.assertEqual(len(self.calls), 4)
+
+        project = create_project(0)
+        lookup(project)
+        lookup(Project.objects.get(pk=project.pk))
+        self.assertEqual(len(self.calls), 5)
+
+    def test_version_bumps_and_invalidate_drop_cached_calls(self):
+        lookup = self.memoized(versions=(CATALOG_VERSION,))
+        lookup('villas')
+        bump_cache_version(CATALOG_VERSION)
+        lookup('villas')
+        lookup.invalidate()
+        lookup('villas')
+        lookup('villas')
+        self.assertEqual(len(self.calls), 3)
+
+    def test_local_results_skip_the_shared_cache(self):
+        lookup = self.memoized(local=60)
+        lookup('villas')
+        with mock.patch('website.utils.read_through', side_effect=AssertionError('shared cache read')):
+            self.assertEqual(lookup('villas'), ['villas', 6, {}])
+        self.assertEqual(lookup.stats()['hits'], 1)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_memoized_helpers_follow_catalog_changes(self):
+        self.assertEqual(calculate_project_stats()['total_projects'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_project(0)
+        self.assertEqual(calculate_project_stats()['total_projects'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Contact.objects.create(name='Visitor', email='visitor@example.com', mobile='9876543210')
+        self.assertEqual(calculate_project_stats()['total_inquiries'], 1)
+
+    def test_sitemap_entries_do_not_change_between_calls(self):
+        project = create_project(0)
+        urls = {url['loc']: url for url in generate_sitemap_data()}
+        self.assertNotIn('lastmod', urls['/'])
+        self.assertEqual(urls[f'/projects/{project.id}/']['lastmod'], project.updated_at)
@@ -0,0 +1,205 @@
+"""
+Chunked, resumable uploads and bulk gallery creation.
+
+A client starts an upload with the file's name and size, then sends the
+bytes in order as raw request bodies (one Content-Range per chunk). Each
+chunk is streamed straight from the request into a temporary file, so
+neither a chunk nor the whole file is held in memory; an interrupted
+upload resumes from `ChunkedUpload.received`. Finished uploads are turned
+into ProjectImage rows with one bulk_create(). Uploads left unfinished for
+CHUNKED_UPLOAD_EXPIRY are removed by the expire_uploads command.
+"""
+import os
+import re
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+from .models import ChunkedUpload, Project, ProjectImage
+from .utils import ProjectCache, bump_cache_version_on_commit, CATALOG_VERSION
+from . import images
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(ValueError):
+    pass
+
+
+def chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+
+
+def max_upload_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 50 * 1024 * 1024)
+
+
+def expiry():
+    return timedelta(seconds=getattr(settings, 'CHUNKED_UPLOAD_EXPIRY', 24 * 60 * 60))
+
+
+def temp_dir():
+    base = getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None) or tempfile.gettempdir()
+    path = os.path.join(base, 'chunked_uploads')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def temp_path(upload):
+    return os.path.join(temp_dir(), f'{upload.pk}.part')
+
+
+def start(user, filename, size):
+    filename = os.path.basename(filename or '')
+    if not filename:
+        raise UploadError('filename is required')
+    if size <= 0 or size > max_upload_size():
+        raise UploadError(f'size must be between 1 and {max_upload_size()} bytes')
+    upload = ChunkedUpload.objects.create(user=user, filename=filename, size=size)
+    open(temp_path(upload), 'wb').close()
+    return upload
+
+
+def parse_content_range(header, upload):
+    """(start, length) of a chunk from its Content-Range header"""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError('Content-Range: bytes <start>-<end>/<size> is required')
+    first, last, total = (int(value) for value in match.groups())
+    if total != upload.size or last < first or last >= total:
+        raise UploadError('Content-Range does not match the upload')
+    length = last - first + 1
+    if length > chunk_size():
+        raise UploadError(f'Chunks may be at most {chunk_size()} bytes')
+    return first, length
+
+
+def append_chunk(upload, stream, first, length):
+    """Stream one chunk from `stream` into the upload's temporary file.
+
+    Chunks must arrive in order; a chunk that starts anywhere but at
+    `upload.received` is rejected so the client can resume from there.
+    """
+    if first != upload.received:
+        raise UploadError(f'Expected a chunk starting at byte {upload.received}')
+
+    written = 0
+    with open(temp_path(upload), 'r+b') as part:
+        part.seek(first)
+        while written < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            part.write(data)
+            written += len(data)
+        part.truncate()
+    if written != length:
+        raise UploadError(f'Chunk ended after {written} of {length} bytes')
+
+    # Guards against two clients sending the same chunk concurrently
+    if not ChunkedUpload.objects.filter(pk=upload.pk, received=first).update(received=first + written):
+        raise UploadError('Upload changed concurrently')
+    upload.received = first + written
+    return upload
+
+
+def discard(upload_ids):
+    paths = [os.path.join(temp_dir(), f'{upload_id}.part') for upload_id in upload_ids]
+    ChunkedUpload.objects.filter(pk__in=upload_ids).delete()
+
+    def remove_files():
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    transaction.on_commit(remove_files)
+
+
+def expire(now=None):
+    """Remove uploads started more than CHUNKED_UPLOAD_EXPIRY ago, and stray
+    temporary files; returns (uploads removed, bytes freed)"""
+    cutoff = (now or timezone.now()) - expiry()
+    expired = [str(pk) for pk in ChunkedUpload.objects.filter(created_at__lt=cutoff).values_list('pk', flat=True)]
+    ChunkedUpload.objects.filter(pk__in=expired).delete()
+    live = {str(pk) for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+
+    freed = 0
+    with os.scandir(temp_dir()) as entries:
+        for entry in entries:
+            upload_id = entry.name[:-len('.part')]
+            if not entry.name.endswith('.part') or upload_id in live:
+                continue
+            stat = entry.stat()
+            # A part file whose row isn't committed yet is younger than the cutoff
+            if upload_id not in expired and stat.st_mtime >= cutoff.timestamp():
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            freed += stat.st_size
+    return len(expired), freed
+
+
+def add_gallery_images(project, items):
+    """Create ProjectImages for finished uploads, after the project's current gallery.
+
+    `items` is a list of (ChunkedUpload, caption) pairs. All rows are
+    created with one bulk_create(); the work its skipped post_save
+    receivers would have done is done here once for the batch.
+    """
+    for upload, _ in items:
+        if not upload.complete:
+            raise UploadError(f'{upload.filename} is incomplete ({upload.received}/{upload.size} bytes)')
+        try:
+            with Image.open(temp_path(upload)) as img:
+                img.verify()
+        except Exception:
+            raise UploadError(f'{upload.filename} is not a valid image')
+
+    field = ProjectImage._meta.get_field('image')
+    stored = []
+    try:
+        created = _create_gallery_images(project, items, field, stored)
+    except BaseException:
+        # Rolled back: the blobs stored for this batch count no references now
+        for name in stored:
+            if hasattr(field.storage, 'remove_if_unreferenced'):
+                field.storage.remove_if_unreferenced(name)
+            else:
+                field.storage.delete(name)
+        raise
+    return created
+
+
+def _create_gallery_images(project, items, field, stored):
+    with transaction.atomic():
+        # Serialises concurrent batches for the same project
+        Project.objects.select_for_update().filter(pk=project.pk).exists()
+        last = project.images.aggregate(last=Max('order'))['last']
+        next_order = 0 if last is None else last + 1
+
+        gallery = []
+        for position, (upload, caption) in enumerate(items):
+            with open(temp_path(upload), 'rb') as handle:
+                name = field.storage.save(
+                    field.generate_filename(None, upload.filename),
+                    File(handle, name=upload.filename),
+                    max_length=field.max_length,
+                )
+            stored.append(name)
+            gallery.append(ProjectImage(project=project, image=name, caption=caption, order=next_order + position))
+        created = ProjectImage.objects.bulk_create(gallery)
+
+        Project.objects.filter(pk=project.pk).update(updated_at=timezone.now())
+        ProjectCache.invalidate(f'project:{project.pk}')
+        bump_cache_version_on_commit(CATALOG_VERSION)
+        for image in created:
+            images.schedule(image)
+        discard([upload.pk for upload, _ in items])
+    return created
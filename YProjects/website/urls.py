@@ -11,6 +11,7 @@ urlpatterns = [
     path('contact/', views.contact_us, name='contact_us'),
     path('contact-ajax/', views.contact_ajax, name='contact_ajax'),
     path('api/search-projects/', views.search_projects, name='search_projects'),
+    path('renditions/<str:model_name>/<int:pk>/<str:variant>.<str:fmt>', views.image_rendition, name='image_rendition'),
     
     # Core API endpoints
     path('api/projects/', api_views.api_projects, name='api_projects'),
@@ -32,4 +33,9 @@ urlpatterns = [
     path('api/similar-projects/<int:project_id>/', api_views.api_similar_projects, name='api_similar_projects'),
     path('api/price-estimate/', api_views.api_price_estimate, name='api_price_estimate'),
     path('api/health/', api_views.api_health_check, name='api_health_check'),
+    
+    # Chunked gallery uploads (staff only)
+    path('api/uploads/', api_views.api_upload_start, name='api_upload_start'),
+    path('api/uploads/<uuid:upload_id>/', api_views.api_upload_chunk, name='api_upload_chunk'),
+    path('api/projects/<int:project_id>/images/', api_views.api_project_add_images, name='api_project_add_images'),
 ]
\ No newline at end of file
@@ -1,91 +1,98 @@
-from django.core.mail import send_mail, EmailMessage
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils.html import strip_tags
-from .models import Contact, CompanyInfo
+from .models import Contact
 import logging
 import os
 from PIL import Image
 from io import BytesIO
 from django.core.files.base import ContentFile
 from django.core.cache import cache
+from django.db import models, transaction
+import functools
 import hashlib
-import pickle
+import inspect
+import json
+import threading
+import time
 from typing import Any, Optional
 
 logger = logging.getLogger(__name__)
 
-def send_contact_notification(contact_id):
-    """Send email notification when new contact is received"""
+def html_email(subject, html_message, recipient):
+    """Multipart message with a plain-text part stripped from the HTML"""
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=strip_tags(html_message),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+def contact_notification_email(contact_id):
+    """Email telling the company about a new contact"""
+    from .site_config import get_site_config
+    contact = Contact.objects.get(id=contact_id)
+    company_info = get_site_config().company_info
+    
+    html_message = render_to_string('emails/contact_notification.html', {
+        'contact': contact,
+        'company_info': company_info,
+    })
+    admin_email = company_info.email if company_info else settings.DEFAULT_FROM_EMAIL
+    return html_email(f'New Contact Inquiry from {contact.name}', html_message, admin_email)
+
+def contact_auto_reply_email(contact_id):
+    """Auto-reply to the person who sent a contact"""
+    from .site_config import get_site_config
+    contact = Contact.objects.get(id=contact_id)
+    company_info = get_site_config().company_info
+    
+    html_message = render_to_string('emails/contact_auto_reply.html', {
+        'contact': contact,
+        'company_info': company_info,
+    })
+    return html_email('Thank you for contacting Harsha Designers', html_message, contact.email)
+
+def newsletter_welcome_email(email):
+    """Welcome email for a newsletter subscriber"""
+    from .site_config import get_site_config
+    company_info = get_site_config().company_info
+    
+    html_message = render_to_string('emails/newsletter_welcome.html', {
+        'email': email,
+        'company_info': company_info,
+    })
+    return html_email('Welcome to Harsha Designers Newsletter', html_message, email)
+
+def send_emails(messages, connection=None):
+    """Send `messages` through one SMTP connection.
+
+    With a `connection` that is already open (see website.outbox) each
+    message costs one SMTP transaction rather than a new TLS session.
+    """
+    connection = connection or get_connection(fail_silently=False)
+    return connection.send_messages(messages)
+
+def send_contact_notification(contact_id, connection=None):
+    """Send email notification when new contact is received.
+
+    Sends synchronously; the post_save receiver queues these in the
+    EmailOutbox instead (see website.outbox).
+    """
     try:
-        contact = Contact.objects.get(id=contact_id)
-        company_info = CompanyInfo.objects.first()
-        
-        # Email to admin
-        subject = f'New Contact Inquiry from {contact.name}'
-        
-        # Create HTML email content
-        html_message = render_to_string('emails/contact_notification.html', {
-            'contact': contact,
-            'company_info': company_info,
-        })
-        plain_message = strip_tags(html_message)
-        
-        # Send to admin email
-        admin_email = company_info.email if company_info else settings.DEFAULT_FROM_EMAIL
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[admin_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
-        # Send auto-reply to customer
-        customer_subject = 'Thank you for contacting Harsha Designers'
-        customer_html = render_to_string('emails/contact_auto_reply.html', {
-            'contact': contact,
-            'company_info': company_info,
-        })
-        customer_plain = strip_tags(customer_html)
-        
-        send_mail(
-            subject=customer_subject,
-            message=customer_plain,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[contact.email],
-            html_message=customer_html,
-            fail_silently=False,
-        )
-        
+        send_emails([contact_notification_email(contact_id), contact_auto_reply_email(contact_id)], connection)
         return True
     except Exception as e:
         logger.error(f'Error sending contact notification: {str(e)}')
         return False
 
-def send_newsletter_welcome(email):
+def send_newsletter_welcome(email, connection=None):
     """Send welcome email to newsletter subscriber"""
     try:
-        company_info = CompanyInfo.objects.first()
-        
-        subject = 'Welcome to Harsha Designers Newsletter'
-        html_message = render_to_string('emails/newsletter_welcome.html', {
-            'email': email,
-            'company_info': company_info,
-        })
-        plain_message = strip_tags(html_message)
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
+        send_emails([newsletter_welcome_email(email)], connection)
         return True
     except Exception as e:
         logger.error(f'Error sending newsletter welcome: {str(e)}')
@@ -132,35 +139,6 @@ def generate_seo_meta(title, description, project=None):
     
     return meta_data
 
-def create_sitemap_data():
-    """Generate sitemap data for SEO"""
-    from .models import Project
-    from django.urls import reverse
-    
-    urls = []
-    
-    # Static pages
-    static_pages = [
-        {'loc': '/', 'priority': '1.0', 'changefreq': 'weekly'},
-        {'loc': '/about/', 'priority': '0.8', 'changefreq': 'monthly'},
-        {'loc': '/projects/', 'priority': '0.9', 'changefreq': 'weekly'},
-        {'loc': '/contact/', 'priority': '0.7', 'changefreq': 'monthly'},
-    ]
-    
-    urls.extend(static_pages)
-    
-    # Project pages
-    projects = Project.objects.all()
-    for project in projects:
-        urls.append({
-            'loc': f'/projects/{project.id}/',
-            'priority': '0.8',
-            'changefreq': 'monthly',
-            'lastmod': project.updated_at.strftime('%Y-%m-%d') if hasattr(project, 'updated_at') else None
-        })
-    
-    return urls
-
 def backup_database():
     """Create database backup (for SQLite)"""
     import shutil
@@ -188,17 +166,185 @@ def backup_database():
         logger.error(f'Error creating database backup: {str(e)}')
         return None
 
+def get_cache_key(prefix: str, *args, **kwargs) -> str:
+    """Generate a consistent cache key"""
+    key_data = f"{prefix}:{':'.join(map(str, args))}"
+    if kwargs:
+        key_data += f":{hashlib.md5(str(sorted(kwargs.items())).encode()).hexdigest()}"
+    return key_data
+
+# Namespaces for versioned caches; bump the version to invalidate everything in it
+CATALOG_VERSION = 'catalog'
+SITE_CONFIG_VERSION = 'site_config'
+CONTACTS_VERSION = 'contacts'
+
+def _version_key(namespace: str) -> str:
+    return f"cache_version:{namespace}"
+
+def get_cache_version(namespace: str) -> int:
+    """Get the current generation number of a cache namespace"""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+def bump_cache_version(namespace: str) -> int:
+    """Invalidate a cache namespace by moving it to a new version"""
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, None)
+        return version
+
+def bump_cache_version_on_commit(namespace: str) -> None:
+    """Bump a namespace once the current transaction commits.
+
+    Bumping earlier would let a concurrent request cache data that is
+    still uncommitted-old under the new version.
+    """
+    transaction.on_commit(lambda: bump_cache_version(namespace))
+
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 2.0
+CACHE_LOCK_POLL_INTERVAL = 0.05
+
+class CacheCounters:
+    """Thread-safe hit/miss/wait counters for one worker"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'waits': 0}
+    
+    def incr(self, name):
+        with self._lock:
+            self._counts[name] += 1
+    
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+def read_through(cache_key, compute, timeout, negative_timeout=None, counters=None):
+    """Return cache_key's value, computing and storing it on a miss.
+    
+    Misses are single-flight: the first caller takes a short lock with
+    cache.add() and computes the value while concurrent callers poll for
+    it (falling back to computing it themselves after CACHE_LOCK_WAIT).
+    Values are stored wrapped, so None and empty results are cached too;
+    `negative_timeout` applies to those.
+    """
+    entry = cache.get(cache_key)
+    if entry is not None:
+        if counters:
+            counters.incr('hits')
+        return entry['value']
+    if counters:
+        counters.incr('misses')
+    
+    lock_key = f'{cache_key}:lock'
+    if not cache.add(lock_key, 1, CACHE_LOCK_TIMEOUT):
+        if counters:
+            counters.incr('waits')
+        deadline = time.monotonic() + CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(CACHE_LOCK_POLL_INTERVAL)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return entry['value']
+        return compute()
+    
+    try:
+        value = compute()
+        empty = value is None or (isinstance(value, (list, tuple, dict)) and not value)
+        cache.set(cache_key, {'value': value}, negative_timeout if empty and negative_timeout else timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+def _normalize_argument(value):
+    """Stable representation of an argument for use in a cache key"""
+    if isinstance(value, models.Model):
+        return f'{value._meta.label_lower}:{value.pk}'
+    if isinstance(value, dict):
+        return {str(k): _normalize_argument(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_argument(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize_argument(v) for v in value), key=repr)
+    return value
+
+def memoize(timeout: int = 3600, versions=(), local: Optional[int] = None):
+    """Cache a function's result per distinct call.
+    
+    The key is derived from the function's module/qualname and its bound,
+    defaulted and normalized arguments, plus the current version of each
+    namespace in `versions` (bump one to invalidate). Misses go through
+    read_through(), so concurrent identical calls compute once. With
+    `local` set, results are also kept in-process for that many seconds.
+    The wrapper gains `.invalidate()` to drop every cached call.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f'{func.__module__}.{func.__qualname__}'
+        own_namespace = f'memoize:{name}'
+        local_cache = {}
+        local_lock = threading.Lock()
+        counters = CacheCounters()
+        
+        def make_key(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = json.dumps(_normalize_argument(bound.arguments), sort_keys=True, default=str)
+            digest = hashlib.md5(arguments.encode()).hexdigest()
+            generation = '.'.join(str(get_cache_version(ns)) for ns in (own_namespace,) + tuple(versions))
+            return f'memoize:{name}:{digest}:{generation}'
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                cache_key = make_key(args, kwargs)
+            except TypeError as e:
+                logger.warning(f"Cannot memoize call to {name}: {e}")
+                return func(*args, **kwargs)
+            
+            if local:
+                with local_lock:
+                    hit = local_cache.get(cache_key)
+                if hit is not None and hit[0] > time.monotonic():
+                    counters.incr('hits')
+                    return hit[1]
+            
+            value = read_through(cache_key, lambda: func(*args, **kwargs), timeout, counters=counters)
+            
+            if local:
+                with local_lock:
+                    if len(local_cache) > 256:
+                        local_cache.clear()
+                    local_cache[cache_key] = (time.monotonic() + local, value)
+            return value
+        
+        wrapper.invalidate = lambda: bump_cache_version(own_namespace)
+        wrapper.stats = counters.snapshot
+        return wrapper
+    return decorator
+
+@memoize(timeout=1800, versions=(CATALOG_VERSION, CONTACTS_VERSION))
 def get_popular_projects(limit=6):
     """Get popular projects based on inquiries"""
     from django.db.models import Count
     from .models import Project
     
     popular_projects = Project.objects.annotate(
-        inquiry_count=Count('contact_inquiries')
+        inquiry_count=Count('contact')
     ).order_by('-inquiry_count', '-is_featured')[:limit]
     
-    return popular_projects
+    return list(popular_projects)
 
+@memoize(timeout=3600, versions=(CATALOG_VERSION, CONTACTS_VERSION))
 def calculate_project_stats():
     """Calculate various project statistics"""
     from .models import Project, Contact
@@ -223,81 +369,152 @@ def calculate_project_stats():
     
     return stats
 
-def get_cache_key(prefix: str, *args, **kwargs) -> str:
-    """Generate a consistent cache key"""
-    key_data = f"{prefix}:{':'.join(map(str, args))}"
-    if kwargs:
-        key_data += f":{hashlib.md5(str(sorted(kwargs.items())).encode()).hexdigest()}"
-    return key_data
-
-def cached_query(cache_key: str, timeout: int = 3600):
-    """Decorator for caching expensive database queries"""
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            try:
-                # Try to get from cache first
-                result = cache.get(cache_key)
-                if result is not None:
-                    return pickle.loads(result)
-                
-                # Execute function and cache result
-                result = func(*args, **kwargs)
-                cache.set(cache_key, pickle.dumps(result), timeout)
-                return result
-            except Exception as e:
-                logger.warning(f"Cache operation failed: {e}")
-                return func(*args, **kwargs)
-        return wrapper
-    return decorator
+@memoize(timeout=60 * 60 * 6, versions=(CATALOG_VERSION,))
+def create_sitemap_data():
+    """Generate sitemap data for SEO"""
+    from .models import Project
+    from django.urls import reverse
+    
+    urls = []
+    
+    # Static pages
+    static_pages = [
+        {'loc': '/', 'priority': '1.0', 'changefreq': 'weekly'},
+        {'loc': '/about/', 'priority': '0.8', 'changefreq': 'monthly'},
+        {'loc': '/projects/', 'priority': '0.9', 'changefreq': 'weekly'},
+        {'loc': '/contact/', 'priority': '0.7', 'changefreq': 'monthly'},
+    ]
+    
+    urls.extend(static_pages)
+    
+    # Project pages
+    projects = Project.objects.values('id', 'updated_at')
+    for project in projects:
+        urls.append({
+            'loc': f'/projects/{project["id"]}/',
+            'priority': '0.8',
+            'changefreq': 'monthly',
+            'lastmod': project['updated_at'].strftime('%Y-%m-%d') if project['updated_at'] else None
+        })
+    
+    return urls
 
 class ProjectCache:
-    """Centralized caching for project-related data"""
+    """Read-through cache for project queries with tag-based invalidation.
+
+    Every entry is stored under a key that embeds the current version of
+    each of its tags (``project:<id>``, ``type:<project_type>``,
+    ``featured``, ``projects`` and ``all``); bumping a tag version orphans
+    every entry carrying it. Lookups go through read_through(), so misses
+    are single-flight and None/empty results are cached too.
+    """
     
-    @staticmethod
-    def get_featured_projects():
-        cache_key = get_cache_key('featured_projects')
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-            
+    KEY_PREFIX = 'project_cache'
+    TIMEOUT = 1800  # 30 minutes
+    NEGATIVE_TIMEOUT = 300  # missing projects
+    
+    _counters = CacheCounters()
+    
+    @classmethod
+    def stats(cls):
+        """Hit/miss counters for this worker"""
+        return cls._counters.snapshot()
+    
+    @classmethod
+    def _tag_versions(cls, tags):
+        keys = {tag: _version_key(f'{cls.KEY_PREFIX}:tag:{tag}') for tag in tags}
+        found = cache.get_many(list(keys.values()))
+        return [
+            found[keys[tag]] if keys[tag] in found else get_cache_version(f'{cls.KEY_PREFIX}:tag:{tag}')
+            for tag in tags
+        ]
+    
+    @classmethod
+    def get_or_compute(cls, name, tags, compute, timeout=None, negative_timeout=None):
+        """Return the cached value for `name`, computing it once on a miss"""
+        tags = ('all',) + tuple(tags)
+        versions = '.'.join(map(str, cls._tag_versions(tags)))
+        return read_through(
+            f'{cls.KEY_PREFIX}:{name}:{versions}',
+            compute,
+            timeout or cls.TIMEOUT,
+            negative_timeout=negative_timeout or cls.NEGATIVE_TIMEOUT,
+            counters=cls._counters,
+        )
+    
+    @classmethod
+    def get_project(cls, project_id):
+        """Project with amenities and gallery prefetched, or None"""
+        from .models import Project
+        
+        def compute():
+            return Project.objects.with_amenities().prefetch_related('images').filter(id=project_id).first()
+        return cls.get_or_compute(f'project:{project_id}', [f'project:{project_id}'], compute)
+    
+    @classmethod
+    def get_featured_projects(cls, limit=6):
         from .models import Project
-        projects = list(Project.objects.filter(
-            is_featured=True, 
-            status='active'
-        ).select_related().order_by('-created_at')[:6])
         
-        cache.set(cache_key, projects, 1800)  # 30 minutes
-        return projects
+        def compute():
+            return list(Project.objects.filter(is_featured=True).order_by('-created_at')[:limit])
+        return cls.get_or_compute(f'featured:{limit}', ['featured'], compute)
+    
+    @classmethod
+    def get_projects_by_type(cls, project_type, limit=None):
+        from .models import Project
+        
+        def compute():
+            projects = Project.objects.filter(project_type=project_type).order_by('-created_at')
+            return list(projects[:limit] if limit else projects)
+        return cls.get_or_compute(f'type:{project_type}:{limit}', [f'type:{project_type}'], compute)
     
     @staticmethod
     def get_project_stats():
-        cache_key = get_cache_key('project_stats')
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-            
-        stats = calculate_project_stats()
-        cache.set(cache_key, stats, 3600)  # 1 hour
-        return stats
+        # Memoized and versioned on the catalog and contacts
+        return calculate_project_stats()
     
-    @staticmethod
-    def invalidate_project_cache():
+    @classmethod
+    def invalidate(cls, *tags):
+        """Bump tag versions once the current transaction commits"""
+        def bump():
+            for tag in tags:
+                bump_cache_version(f'{cls.KEY_PREFIX}:tag:{tag}')
+        transaction.on_commit(bump)
+    
+    @classmethod
+    def invalidate_project(cls, project, old_values=None):
+        """Invalidate every entry a saved or deleted project can appear in.
+
+        `old_values` are the column values before an update (None on create
+        and delete); missing keys are treated as changed.
+        """
+        tags = {'projects', f'project:{project.pk}', f'type:{project.project_type}'}
+        was_featured = False
+        if old_values is not None:
+            if old_values.get('project_type') != project.project_type:
+                tags.add(f'type:{old_values.get("project_type")}')
+            was_featured = old_values.get('is_featured', True)
+        if project.is_featured or was_featured:
+            tags.add('featured')
+        cls.invalidate(*tags)
+    
+    @classmethod
+    def invalidate_project_cache(cls):
         """Clear all project-related cache"""
-        cache_keys = [
-            get_cache_key('featured_projects'),
-            get_cache_key('project_stats'),
-            get_cache_key('recent_projects'),
-        ]
-        cache.delete_many(cache_keys)
+        cls.invalidate('all')
 
 def rate_limit_check(key: str, limit: int = 60, window: int = 3600) -> bool:
-    """Simple rate limiting using cache"""
-    current = cache.get(key, 0)
-    if current >= limit:
-        return False
-    
-    cache.set(key, current + 1, window)
-    return True
+    """Fixed-window rate limiting using atomic cache operations"""
+    key = f'ratelimit:{key}'
+    if cache.add(key, 1, window):
+        return True
+    try:
+        current = cache.incr(key)
+    except ValueError:
+        # The window expired between add() and incr()
+        cache.add(key, 1, window)
+        return True
+    return current <= limit
 
 def get_client_ip(request) -> str:
     """Get client IP address from request"""
@@ -326,25 +543,27 @@ class BackgroundTaskManager:
         return pending_count
     
     @staticmethod
-    def process_image_optimization():
-        """Schedule image optimization for new uploads"""
-        from .models import Project
+    def process_image_optimization(limit=10):
+        """Process a few uploads whose background job never recorded a hash.
+
+        Bulk (re)processing is done by the optimize_images command.
+        """
+        from .models import Project, ProjectImage, Banner
+        from . import images
         
-        # Find projects with unoptimized images
-        projects = Project.objects.filter(
-            image__isnull=False,
-            image_optimized=False
-        )[:10]  # Process 10 at a time
+        processed = 0
+        for model in (Project, ProjectImage, Banner):
+            pending = model.objects.filter(image_hash='').exclude(image='').values_list('pk', flat=True)
+            for pk in pending[:limit - processed]:
+                try:
+                    images.process(model, pk)
+                    processed += 1
+                except Exception as e:
+                    logger.error(f"Image optimization failed for {model._meta.label} {pk}: {e}")
+            if processed >= limit:
+                break
         
-        for project in projects:
-            try:
-                optimize_project_image(project)
-                project.image_optimized = True
-                project.save(update_fields=['image_optimized'])
-            except Exception as e:
-                logger.error(f"Image optimization failed for project {project.id}: {e}")
-        
-        return len(projects)
+        return processed
     
     @staticmethod
     def cleanup_old_contacts():
@@ -363,15 +582,16 @@ class BackgroundTaskManager:
         logger.info(f"Cleaned up {deleted_count} old contact entries")
         return deleted_count
 
+@memoize(timeout=60 * 60 * 6, versions=(CATALOG_VERSION,))
 def generate_sitemap_data():
     """Generate sitemap data for SEO"""
     from .models import Project
     from django.urls import reverse
-    from django.utils import timezone
     
     urls = []
     
-    # Static pages
+    # Static pages have no modification time of their own (and a generation
+    # time would be frozen by the memoization), so they carry no lastmod
     static_pages = [
         {'url': '/', 'priority': 1.0, 'changefreq': 'daily'},
         {'url': '/about/', 'priority': 0.8, 'changefreq': 'monthly'},
@@ -382,17 +602,16 @@ def generate_sitemap_data():
     for page in static_pages:
         urls.append({
             'loc': page['url'],
-            'lastmod': timezone.now(),
             'priority': page['priority'],
             'changefreq': page['changefreq']
         })
     
     # Project pages
-    projects = Project.objects.filter(status='active')
+    projects = Project.objects.values('id', 'updated_at')
     for project in projects:
         urls.append({
-            'loc': f'/projects/{project.id}/',
-            'lastmod': project.updated_at,
+            'loc': f'/projects/{project["id"]}/',
+            'lastmod': project['updated_at'],
             'priority': 0.8,
             'changefreq': 'weekly'
         })
@@ -3,43 +3,52 @@ from django.contrib import messages
 from django.http import JsonResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView
+from django.apps import apps
+from django.core.cache import cache
 import json
-from .models import Project, Banner, Contact, AboutUs, CompanyInfo
+from .models import Project, Contact
+from .site_config import get_site_config
+from .page_cache import versioned_cache_page
+from .http_cache import conditional, catalog_etag, project_etag
+from .utils import ProjectCache
+from . import search, autocomplete, similarity, images, renditions
 
-# Cache the home page for 15 minutes
-@cache_page(60 * 15)
+# image_rendition: how long one request may hold an image's render lock, and
+# how long before an unprocessed upload may be scheduled again
+RENDITION_LOCK_TIMEOUT = 60
+RENDITION_SCHEDULE_TIMEOUT = 60 * 60
+
+@conditional(catalog_etag)
+@versioned_cache_page
 def home(request):
     """Home page with all sections"""
-    banners = Banner.objects.filter(is_active=True).order_by('order')
-    projects = Project.objects.filter(is_featured=True)[:6]
-    about_us = AboutUs.objects.first()
-    company_info = CompanyInfo.objects.first()
+    config = get_site_config()
+    projects = ProjectCache.get_featured_projects(limit=6)
     
     context = {
-        'banners': banners,
+        'banners': config.banners,
         'projects': projects,
-        'about_us': about_us,
-        'company_info': company_info,
+        'about_us': config.about_us,
+        'company_info': config.company_info,
         'page_title': 'Home'
     }
     return render(request, 'website/home.html', context)
 
+@versioned_cache_page
 def about_us(request):
     """About Us page"""
-    about_us = AboutUs.objects.first()
-    company_info = CompanyInfo.objects.first()
+    config = get_site_config()
     
     context = {
-        'about_us': about_us,
-        'company_info': company_info,
+        'about_us': config.about_us,
+        'company_info': config.company_info,
         'page_title': 'About Us'
     }
     return render(request, 'website/about.html', context)
 
+@versioned_cache_page
 def projects(request):
     """Our Projects page with filtering and pagination"""
     project_type = request.GET.get('type', '')
@@ -49,15 +58,11 @@ def projects(request):
     
     # Filter by project type
     if project_type:
-        all_projects = all_projects.filter(project_type__icontains=project_type)
+        all_projects = all_projects.filter(project_type=project_type)
     
-    # Search functionality
+    # Search functionality (ranked by relevance)
     if search_query:
-        all_projects = all_projects.filter(
-            Q(title__icontains=search_query) |
-            Q(location__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        all_projects = search.search_projects(all_projects, search_query)
     
     # Pagination
     paginator = Paginator(all_projects, 9)  # Show 9 projects per page
@@ -67,7 +72,7 @@ def projects(request):
     # Get unique project types for filter dropdown
     project_types = Project.objects.values_list('project_type', flat=True).distinct()
     
-    company_info = CompanyInfo.objects.first()
+    company_info = get_site_config().company_info
     
     context = {
         'projects': projects_page,
@@ -79,14 +84,14 @@ def projects(request):
     }
     return render(request, 'website/projects.html', context)
 
+@conditional(project_etag)
+@versioned_cache_page
 def project_detail(request, project_id):
     """Individual project detail page"""
     project = get_object_or_404(Project, id=project_id)
-    related_projects = Project.objects.filter(
-        project_type=project.project_type
-    ).exclude(id=project.id)[:3]
+    related_projects = [related for related, _ in similarity.get_similar_projects(project.id, limit=3)]
     
-    company_info = CompanyInfo.objects.first()
+    company_info = get_site_config().company_info
     
     context = {
         'project': project,
@@ -98,7 +103,7 @@ def project_detail(request, project_id):
 
 def contact_us(request):
     """Contact Us page"""
-    company_info = CompanyInfo.objects.first()
+    company_info = get_site_config().company_info
     
     if request.method == 'POST':
         name = request.POST.get('name', '').strip()
@@ -175,33 +180,56 @@ def contact_ajax(request):
     
     return JsonResponse({'status': 'error', 'message': 'Invalid request method.'})
 
+def image_rendition(request, model_name, pk, variant, fmt):
+    """Generate one rendition of a not yet processed image and redirect to it.
+
+    Public and uncached, so the work is single-flight per image: while one
+    request renders, concurrent ones are sent to the original upload, and
+    background processing is scheduled at most once per upload.
+    """
+    if model_name not in renditions.RENDITION_MODELS or variant not in renditions.WIDTHS or fmt not in renditions.FORMATS:
+        raise Http404
+    model = apps.get_model('website', model_name)
+    instance = get_object_or_404(model, pk=pk)
+    if not instance.image:
+        raise Http404
+    
+    storage = instance.image.storage
+    if instance.image_hash and storage.exists(renditions.rendition_name(instance.image_hash, variant, fmt)):
+        return redirect(storage.url(renditions.rendition_name(instance.image_hash, variant, fmt)))
+    
+    lock_key = f'rendition-lock:{model_name}:{pk}'
+    if not cache.add(lock_key, 1, RENDITION_LOCK_TIMEOUT):
+        return redirect(instance.image.url)
+    try:
+        digest = instance.image_hash
+        if not digest:
+            digest = images.content_hash(instance.image)
+            # Record the hash and write the remaining files in the background, once per upload
+            if cache.add(f'rendition-scheduled:{model_name}:{pk}:{instance.image.name}', 1, RENDITION_SCHEDULE_TIMEOUT):
+                images.schedule(instance)
+        renditions.generate(instance.image, digest, variants=(variant,), formats=(fmt,))
+    finally:
+        cache.delete(lock_key)
+    return redirect(storage.url(renditions.rendition_name(digest, variant, fmt)))
+
 def search_projects(request):
-    """AJAX search for projects"""
+    """AJAX typeahead search for projects, served from the in-memory prefix index"""
     query = request.GET.get('q', '').strip()
     
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    projects = Project.objects.filter(
-        Q(title__icontains=query) |
-        Q(location__icontains=query) |
-        Q(project_type__icontains=query)
-    )[:10]
-    
-    results = []
-    for project in projects:
-        results.append({
-            'id': project.id,
-            'title': project.title,
-            'location': project.location,
-            'price': project.price,
-            'image_url': project.image.url if project.image else '',
-            'project_type': project.project_type
-        })
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    sort = request.GET.get('sort', autocomplete.SORT_FEATURED)
+    
+    results = autocomplete.suggest(query, limit=limit, sort=sort)
     
     return JsonResponse({'results': results})
 
-# Class-based views for better structure
 class ProjectListView(ListView):
     model = Project
     template_name = 'website/projects.html'
@@ -214,14 +242,10 @@ class ProjectListView(ListView):
         search_query = self.request.GET.get('search')
         
         if project_type:
-            queryset = queryset.filter(project_type__icontains=project_type)
+            queryset = queryset.filter(project_type=project_type)
         
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(location__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
+            queryset = search.search_projects(queryset, search_query)
         
         return queryset
     
@@ -230,6 +254,6 @@ class ProjectListView(ListView):
         context['project_types'] = Project.objects.values_list('project_type', flat=True).distinct()
         context['current_type'] = self.request.GET.get('type', '')
         context['search_query'] = self.request.GET.get('search', '')
-        context['company_info'] = CompanyInfo.objects.first()
+        context['company_info'] = get_site_config().company_info
         context['page_title'] = 'Our Projects'
         return context